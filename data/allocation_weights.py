@@ -0,0 +1,151 @@
+"""Precomputed regime × risk level × ticker allocation weights.
+
+The weights depend only on the regime templates, user_regime_overrides,
+RISK_MULTIPLIERS and the asset universe, so the full table is built once and
+every rebalance becomes a row lookup. Tables are cached per process and keyed
+by a fingerprint of user_regime_overrides and user_assets plus the asset list,
+so edits in the settings UI are picked up on the next lookup.
+
+Used by: run_backtest.py, backtest_sweep.py, generate_allocation.py
+"""
+
+import hashlib
+import sqlite3
+
+import numpy as np
+
+from config import REGIME_ALLOCATIONS, RISK_MULTIPLIERS
+
+DEFAULT_RISK_LEVEL = 3
+
+_cache: dict[tuple, "WeightTable"] = {}
+
+
+def table_fingerprint(conn: sqlite3.Connection) -> str:
+    """Hash of the user tables that weights depend on."""
+    h = hashlib.sha1()
+    for table, columns in (
+        ("user_regime_overrides", "regime_name, asset_class, weight_pct"),
+        ("user_assets", "ticker, name, asset_class, country, is_active"),
+    ):
+        try:
+            rows = conn.execute(f"SELECT {columns} FROM {table} ORDER BY id").fetchall()
+        except sqlite3.Error:
+            rows = None
+        h.update(table.encode())
+        h.update(repr(rows).encode())
+    return h.hexdigest()
+
+
+def load_overrides(conn: sqlite3.Connection) -> dict[str, dict[str, float]]:
+    """All user regime overrides: {regime_name: {asset_class: weight_pct}}."""
+    overrides: dict[str, dict[str, float]] = {}
+    try:
+        rows = conn.execute(
+            "SELECT regime_name, asset_class, weight_pct FROM user_regime_overrides ORDER BY id"
+        ).fetchall()
+    except sqlite3.Error:
+        return overrides
+    for regime_name, asset_class, weight_pct in rows:
+        overrides.setdefault(regime_name, {})[asset_class] = weight_pct
+    return overrides
+
+
+class WeightTable:
+    """Class and per-ticker weights for every (regime, risk level) pair."""
+
+    def __init__(self, assets: list[dict], overrides: dict[str, dict[str, float]], fingerprint: str = ""):
+        self.assets = assets
+        self.overrides = overrides
+        self.fingerprint = fingerprint
+        self.tickers = [a["ticker"] for a in assets]
+        self.regimes = list(dict.fromkeys([*REGIME_ALLOCATIONS, *overrides]))
+        self.risk_levels = sorted(RISK_MULTIPLIERS)
+
+        # Within-class weight per asset; equal split when not specified
+        class_sizes: dict[str, int] = {}
+        for a in assets:
+            class_sizes[a["asset_class"]] = class_sizes.get(a["asset_class"], 0) + 1
+        self._within = [
+            a.get("weight_within_class", 0) or 1.0 / class_sizes[a["asset_class"]]
+            for a in assets
+        ]
+
+        self._class_weights: dict[tuple[str, int], dict[str, float]] = {}
+        self._weights: dict[tuple[str, int], dict[str, float]] = {}
+        self.matrix = np.zeros((len(self.regimes), len(self.risk_levels), len(assets)))
+        self._regime_index = {r: i for i, r in enumerate(self.regimes)}
+
+        for i, regime in enumerate(self.regimes):
+            for j, risk_level in enumerate(self.risk_levels):
+                self._build(regime, risk_level)
+                weights = self._weights[(regime, risk_level)]
+                self.matrix[i, j] = [weights.get(t, 0.0) for t in self.tickers]
+
+    def _build(self, regime: str, risk_level: int):
+        template = dict(REGIME_ALLOCATIONS.get(regime, REGIME_ALLOCATIONS["goldilocks"]))
+        template.update(self.overrides.get(regime, {}))
+
+        # Apply risk multiplier and normalize to 100%
+        multipliers = RISK_MULTIPLIERS[risk_level]
+        adjusted = {}
+        total_pct = 0
+        for ac, pct in template.items():
+            adj = pct * multipliers.get(ac, 1.0)
+            adjusted[ac] = adj
+            total_pct += adj
+        if total_pct > 0:
+            for ac in adjusted:
+                adjusted[ac] = (adjusted[ac] / total_pct) * 100
+
+        ticker_weights = {}
+        for asset, weight_within in zip(self.assets, self._within):
+            class_pct = adjusted.get(asset["asset_class"], 0)
+            if class_pct == 0:
+                continue
+            ticker_weights[asset["ticker"]] = class_pct * weight_within / 100.0
+
+        self._class_weights[(regime, risk_level)] = adjusted
+        self._weights[(regime, risk_level)] = ticker_weights
+
+    def _key(self, regime: str, risk_level: int) -> tuple[str, int]:
+        if risk_level not in RISK_MULTIPLIERS:
+            risk_level = DEFAULT_RISK_LEVEL
+        key = (regime, risk_level)
+        if key not in self._weights:
+            # Unknown regime name: goldilocks template, built on first use
+            self._build(regime, risk_level)
+        return key
+
+    def weights(self, regime: str, risk_level: int) -> dict[str, float]:
+        """Per-ticker weights as fractions (tickers with a zero class weight omitted)."""
+        return self._weights[self._key(regime, risk_level)]
+
+    def class_weights(self, regime: str, risk_level: int) -> dict[str, float]:
+        """Risk-adjusted asset class weights in percent (sum to 100)."""
+        return self._class_weights[self._key(regime, risk_level)]
+
+    def row(self, regime: str, risk_level: int) -> np.ndarray:
+        """Per-ticker weights aligned with self.tickers."""
+        i = self._regime_index.get(regime)
+        if i is not None and risk_level in RISK_MULTIPLIERS:
+            return self.matrix[i, self.risk_levels.index(risk_level)]
+        weights = self.weights(regime, risk_level)
+        return np.array([weights.get(t, 0.0) for t in self.tickers])
+
+
+def get_weight_table(conn: sqlite3.Connection, assets: list[dict]) -> WeightTable:
+    """Return the weight table for this asset list, rebuilding when user tables change."""
+    fingerprint = table_fingerprint(conn)
+    key = (
+        fingerprint,
+        tuple((a["ticker"], a["asset_class"], a.get("weight_within_class", 0)) for a in assets),
+    )
+    table = _cache.get(key)
+    if table is None:
+        # Drop tables built from stale user data
+        for stale in [k for k in _cache if k[0] != fingerprint]:
+            del _cache[stale]
+        table = WeightTable(assets, load_overrides(conn), fingerprint)
+        _cache[key] = table
+    return table
@@ -0,0 +1,131 @@
+"""Content-addressed cache of completed backtest runs.
+
+A run is keyed by a hash of its parameters and the versions of the data it
+reads:
+- Prices: max date, row count and adj_close sum per ticker within the
+  run's date range (the sum catches in-place price revisions)
+- Regimes: checksum of the country's regime history
+- Allocations: fingerprint of user_regime_overrides and user_assets
+
+Any change to those inputs produces a new key, so stale entries are never
+hit and need no explicit invalidation. Each entry also stores the run's
+result dict (result_json), so a hit returns exactly what the fresh run
+returned. The TS backtest route uses the same
+backtest_cache table with its own "ts-" key prefix.
+"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+from allocation_weights import table_fingerprint
+
+CACHE_VERSION = "py-v1"
+
+
+def init_cache_table(conn: sqlite3.Connection):
+    """Create backtest_cache table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_cache (
+            cache_key TEXT PRIMARY KEY,
+            run_id INTEGER NOT NULL REFERENCES backtest_runs(id),
+            created_at TEXT NOT NULL,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            last_hit_at TEXT,
+            result_json TEXT
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(backtest_cache)")}
+    if "result_json" not in columns:
+        conn.execute("ALTER TABLE backtest_cache ADD COLUMN result_json TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_backtest_cache_run ON backtest_cache(run_id)")
+
+
+def data_version(
+    conn: sqlite3.Connection,
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    country: str,
+) -> dict:
+    """Versions of the prices, regimes and allocation settings a run depends on."""
+    placeholders = ",".join("?" * len(tickers))
+    prices = conn.execute(
+        f"""SELECT ticker, MAX(date), COUNT(*), ROUND(SUM(adj_close), 6) FROM historical_prices
+            WHERE ticker IN ({placeholders}) AND date >= ? AND date <= ?
+            GROUP BY ticker ORDER BY ticker""",
+        (*tickers, start_date, end_date),
+    ).fetchall()
+
+    h = hashlib.sha1()
+    try:
+        for row in conn.execute(
+            "SELECT date, regime_name FROM regimes WHERE country = ? ORDER BY date, id", (country,)
+        ):
+            h.update(repr(row).encode())
+    except sqlite3.OperationalError:
+        pass
+
+    return {
+        "prices": [list(row) for row in prices],
+        "regimes": h.hexdigest(),
+        "allocations": table_fingerprint(conn),
+    }
+
+
+def cache_key(params: dict, version: dict) -> str:
+    """Stable hash of run parameters plus data versions."""
+    payload = json.dumps({"v": CACHE_VERSION, "params": params, "data": version}, sort_keys=True)
+    return f"{CACHE_VERSION}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def lookup_cached_result(conn: sqlite3.Connection, key: str) -> dict | None:
+    """Stored result of the run cached under key, in run_backtest's result shape.
+
+    Entries without a stored result (written before results were kept, or by
+    the TS route) count as misses.
+    """
+    row = conn.execute(
+        """SELECT c.run_id, c.result_json FROM backtest_cache c
+           JOIN backtest_runs r ON r.id = c.run_id
+           WHERE c.cache_key = ? AND r.status = 'completed' AND c.result_json IS NOT NULL""",
+        (key,),
+    ).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "UPDATE backtest_cache SET hit_count = hit_count + 1, last_hit_at = ? WHERE cache_key = ?",
+        (datetime.now().isoformat(), key),
+    )
+    conn.commit()
+    result = json.loads(row[1])
+    # Rolling series are arrays in a fresh result
+    if "rolling" in result:
+        result["rolling"] = {k: np.asarray(v, dtype=np.float64) for k, v in result["rolling"].items()}
+    return {**result, "run_id": row[0], "cached": True}
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def store_cache_entry(conn: sqlite3.Connection, key: str, run_id: int, result: dict):
+    """Point key at run_id with its result (replacing any entry for a deleted run)."""
+    conn.execute(
+        """INSERT OR REPLACE INTO backtest_cache (cache_key, run_id, created_at, hit_count, result_json)
+           VALUES (?, ?, ?, 0, ?)""",
+        (key, run_id, datetime.now().isoformat(), json.dumps(result, default=_json_default)),
+    )
+
+
+def invalidate_run(conn: sqlite3.Connection, run_id: int):
+    """Drop cache entries pointing at a run whose results changed or were deleted."""
+    conn.execute("DELETE FROM backtest_cache WHERE run_id = ?", (run_id,))
+
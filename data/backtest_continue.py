@@ -0,0 +1,180 @@
+"""Extend a completed backtest run to new trading days.
+
+Instead of re-simulating from the start date, the run's saved end state
+(holdings, last prices, benchmark base, running metric aggregates in
+backtest_state) is loaded and only the days after its as_of_date are
+simulated. Snapshots (on the run's snapshot_every grid) and the stored
+series are appended and the run's metrics are updated in place, matching a
+full rerun to the same end date.
+
+Usage:
+    python backtest_continue.py <run_id> [end_date]
+"""
+
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import DB_PATH
+from allocation_weights import get_weight_table
+from backtest_cache import invalidate_run
+from backtest_engine import load_price_matrix, seed_prices, rebalance_mask, simulate_portfolio, benchmark_series
+from backtest_metrics import extend_metrics_state, metrics_from_state
+from backtest_storage import (
+    load_backtest_state,
+    save_backtest_state,
+    store_snapshots,
+    append_backtest_series,
+)
+from regime_timeline import RegimeTimeline
+from run_backtest import init_backtest_tables
+
+
+def continue_backtest(run_id: int, end_date: str | None = None) -> dict:
+    """Simulate run `run_id` from its last date to end_date and update it in place.
+
+    Returns dict with run_id, number of new days and the updated metrics.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    conn = sqlite3.connect(DB_PATH)
+    init_backtest_tables(conn)
+
+    run = conn.execute(
+        """SELECT name, initial_capital, risk_level, rebalance_period, benchmark_ticker
+           FROM backtest_runs WHERE id = ? AND status = 'completed'""",
+        (run_id,),
+    ).fetchone()
+    state = load_backtest_state(conn, run_id)
+    if run is None or state is None:
+        conn.close()
+        raise ValueError(f"Backtest run {run_id} has no saved state to continue from")
+
+    name, initial_capital, risk_level, rebalance_period, benchmark_ticker = run
+    as_of = state["as_of_date"]
+    assets = state["assets"]
+    holdings = state["holdings"]
+
+    tickers = list(dict.fromkeys(
+        [a["ticker"] for a in assets] + [benchmark_ticker] + list(holdings)
+    ))
+    next_day = (datetime.strptime(as_of, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    loaded = load_price_matrix(conn, tickers, next_day, end_date)
+    if len(loaded) == 0:
+        conn.close()
+        print(f"  Run {run_id} is up to date ({as_of})")
+        return {"run_id": run_id, "new_days": 0}
+    matrix = seed_prices(loaded, tickers, state["last_prices"])
+
+    print(f"=== Continuing Backtest {run_id}: {name} ===")
+    print(f"  Period: {matrix.dates[0]} ~ {matrix.dates[-1]} ({len(matrix)} new trading days)")
+
+    # Rebalance dates relative to the last simulated day
+    rebalance_idx = np.flatnonzero(rebalance_mask([as_of] + matrix.dates, rebalance_period)[1:])
+    timeline = RegimeTimeline.load(conn, [state["country"]])
+    daily_regimes = timeline.resolve(matrix.dates, state["country"])
+
+    weight_table = get_weight_table(conn, assets)
+    columns = [matrix.index[t] for t in weight_table.tickers]
+    weights = np.zeros((len(rebalance_idx), len(tickers)))
+    for k, i in enumerate(rebalance_idx):
+        weights[k, columns] = weight_table.row(daily_regimes[i], risk_level)
+
+    shares = np.array([holdings.get(t, 0.0) for t in tickers])
+    daily_values, shares = simulate_portfolio(
+        matrix, rebalance_idx, weights, state["portfolio_value"], shares=shares,
+    )
+    bench = benchmark_series(
+        matrix, benchmark_ticker, initial_capital,
+        base_price=state["benchmark_base_price"], start_value=state["benchmark_value"],
+    )
+
+    metrics_state, drawdowns = extend_metrics_state(state["metrics_state"], daily_values, matrix.dates)
+    benchmark_state, _ = extend_metrics_state(state["benchmark_metrics_state"], bench, matrix.dates)
+    metrics = metrics_from_state(metrics_state, initial_capital)
+    benchmark_metrics = metrics_from_state(benchmark_state, initial_capital)
+
+    # Keep the run's snapshot grid; the old last day was only kept as the final day
+    every = state["snapshot_every"]
+    n_days = state["n_days"]
+    if n_days is None:
+        # States saved before n_days was kept have every = 1: one snapshot per day
+        (n_days,) = conn.execute("SELECT COUNT(*) FROM backtest_snapshots WHERE run_id = ?", (run_id,)).fetchone()
+    if every > 1 and (n_days - 1) % every != 0:
+        conn.execute("DELETE FROM backtest_snapshots WHERE run_id = ? AND date = ?", (run_id, as_of))
+    store_snapshots(
+        conn, run_id, matrix.dates, daily_values.tolist(), bench.tolist(),
+        daily_regimes.tolist(), drawdowns.tolist(), every=every, offset=n_days,
+    )
+    append_backtest_series(
+        conn, run_id, matrix.dates, daily_values, bench, drawdowns, daily_regimes.tolist(),
+    )
+
+    last_prices = dict(state["last_prices"])
+    last_prices.update({t: float(matrix.values[-1, i]) for t, i in matrix.index.items()
+                        if not np.isnan(matrix.values[-1, i])})
+    # The run no longer matches the parameters it was cached under
+    invalidate_run(conn, run_id)
+    save_backtest_state(conn, run_id, {
+        **state,
+        "as_of_date": matrix.dates[-1],
+        "holdings": {t: float(shares[i]) for i, t in enumerate(tickers) if shares[i] != 0},
+        "last_prices": last_prices,
+        "portfolio_value": float(daily_values[-1]),
+        "benchmark_value": float(bench[-1]),
+        "metrics_state": metrics_state,
+        "benchmark_metrics_state": benchmark_state,
+        "n_days": n_days + len(matrix),
+    })
+
+    conn.execute(
+        """UPDATE backtest_runs SET
+           end_date = ?, final_value = ?, total_return_pct = ?, annualized_return_pct = ?,
+           volatility_pct = ?, sharpe_ratio = ?, max_drawdown_pct = ?,
+           max_drawdown_start = ?, max_drawdown_end = ?,
+           benchmark_return_pct = ?, benchmark_sharpe = ?, benchmark_mdd_pct = ?
+           WHERE id = ?""",
+        (
+            matrix.dates[-1],
+            metrics.get("final_value"),
+            metrics.get("total_return_pct"),
+            metrics.get("annualized_return_pct"),
+            metrics.get("volatility_pct"),
+            metrics.get("sharpe_ratio"),
+            metrics.get("max_drawdown_pct"),
+            metrics.get("max_drawdown_start"),
+            metrics.get("max_drawdown_end"),
+            benchmark_metrics.get("total_return_pct"),
+            benchmark_metrics.get("sharpe_ratio"),
+            benchmark_metrics.get("max_drawdown_pct"),
+            run_id,
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+    print(f"  Final Value: {metrics.get('final_value', 0):,.0f}")
+    print(f"  Total Return: {metrics.get('total_return_pct', 0):.2f}%")
+    print(f"  Sharpe Ratio: {metrics.get('sharpe_ratio', 0):.4f}")
+    print(f"  Max Drawdown: {metrics.get('max_drawdown_pct', 0):.2f}%")
+
+    return {
+        "run_id": run_id,
+        "new_days": len(matrix),
+        **metrics,
+        "benchmark_return_pct": benchmark_metrics.get("total_return_pct"),
+        "benchmark_sharpe": benchmark_metrics.get("sharpe_ratio"),
+        "benchmark_mdd_pct": benchmark_metrics.get("max_drawdown_pct"),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python backtest_continue.py <run_id> [end_date]")
+        sys.exit(1)
+
+    result = continue_backtest(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"\nContinued run {result['run_id']}: {result['new_days']} new trading days")
@@ -0,0 +1,230 @@
+"""Vectorized backtest engine: array-based portfolio simulation.
+
+Instead of walking every trading day with per-ticker dict lookups, the
+prices are loaded once into a forward-filled dates × tickers matrix and
+the portfolio is valued with array ops. Holdings only change on rebalance
+dates, so each rebalance segment is a single matrix-vector product.
+
+The simulation reproduces run_backtest's day-by-day loop exactly:
+- Tickers are only bought on a rebalance date when they have a price that day
+- Holdings are valued at the last known price when a ticker has a gap
+- A non-positive valuation keeps the previous portfolio value
+"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+
+class PriceMatrix:
+    """Forward-filled adj_close prices as a dates × tickers float matrix.
+
+    values:   prices, forward-filled; NaN before a ticker's first price
+    observed: True where the ticker actually has a price row on that date
+    """
+
+    def __init__(self, dates: list[str], tickers: list[str], values: np.ndarray, observed: np.ndarray):
+        self.dates = dates
+        self.tickers = tickers
+        self.values = values
+        self.observed = observed
+        self.index = {t: i for i, t in enumerate(tickers)}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def column(self, ticker: str) -> int | None:
+        return self.index.get(ticker)
+
+    def window(self, start_date: str, end_date: str | None = None) -> "PriceMatrix":
+        """Sub-matrix for [start_date, end_date], as if loaded for that range only.
+
+        Tickers without a price in the window are dropped, and prices before a
+        ticker's first in-window observation are reset to NaN.
+        """
+        lo = int(np.searchsorted(self.dates, start_date, side="left"))
+        hi = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, end_date, side="right"))
+
+        observed = self.observed[lo:hi]
+        cols = np.flatnonzero(observed.any(axis=0))
+        observed = observed[:, cols]
+        values = self.values[lo:hi, cols].copy()
+        values[np.cumsum(observed, axis=0) == 0] = np.nan
+
+        return PriceMatrix(self.dates[lo:hi], [self.tickers[c] for c in cols], values, observed)
+
+
+def load_price_matrix(
+    conn: sqlite3.Connection,
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+) -> PriceMatrix:
+    """Load historical prices into a PriceMatrix with one query.
+
+    Columns follow the order of `tickers`; tickers without any price rows are dropped.
+    """
+    placeholders = ",".join("?" * len(tickers))
+    df = pd.read_sql_query(
+        f"""SELECT ticker, date, adj_close FROM historical_prices
+            WHERE ticker IN ({placeholders})
+            AND date >= ? AND date <= ?""",
+        conn,
+        params=(*tickers, start_date, end_date),
+    )
+    if df.empty:
+        return PriceMatrix([], [], np.empty((0, 0)), np.empty((0, 0), dtype=bool))
+
+    wide = df.pivot(index="date", columns="ticker", values="adj_close").sort_index()
+    present = set(wide.columns)
+    columns = [t for t in dict.fromkeys(tickers) if t in present]
+    wide = wide[columns]
+
+    observed = wide.notna().to_numpy()
+    values = wide.ffill().to_numpy(dtype=np.float64)
+    return PriceMatrix(list(wide.index), columns, values, observed)
+
+
+def rebalance_mask(dates: list[str], period: str) -> np.ndarray:
+    """Vectorized is_rebalance_date: True on the first date and on each period change."""
+    n = len(dates)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    if period == "daily":
+        return np.ones(n, dtype=bool)
+
+    dt = pd.to_datetime(pd.Series(dates), format="%Y-%m-%d")
+    if period == "weekly":
+        key = dt.dt.isocalendar().week.to_numpy()
+    elif period == "monthly":
+        key = dt.dt.month.to_numpy()
+    elif period == "quarterly":
+        key = ((dt.dt.month - 1) // 3).to_numpy()
+    elif period == "yearly":
+        key = dt.dt.year.to_numpy()
+    else:
+        key = np.zeros(n, dtype=np.int64)
+
+    mask = np.empty(n, dtype=bool)
+    mask[0] = True
+    mask[1:] = key[1:] != key[:-1]
+    return mask
+
+
+def benchmark_series(
+    matrix: PriceMatrix,
+    ticker: str,
+    initial_capital: float,
+    base_price: float | None = None,
+    start_value: float | None = None,
+) -> np.ndarray:
+    """Benchmark value series: initial capital scaled by price relative to its first price.
+
+    To continue an existing series pass its base_price (first benchmark price)
+    and start_value (last benchmark value), which is carried until the first
+    observed price.
+    """
+    n = len(matrix)
+    start_value = float(initial_capital) if start_value is None else start_value
+    col = matrix.column(ticker)
+    if col is None:
+        return np.full(n, start_value)
+
+    prices = matrix.values[:, col]
+    seen = np.flatnonzero(matrix.observed[:, col])
+    if base_price is None:
+        if seen.size == 0:
+            return np.full(n, start_value)
+        base_price = prices[seen[0]]
+
+    values = initial_capital * (prices / base_price)
+    values[: seen[0] if seen.size else n] = start_value
+    return values
+
+
+def seed_prices(matrix: PriceMatrix, tickers: list[str], last_prices: dict[str, float]) -> PriceMatrix:
+    """Re-index columns to `tickers`, filling each ticker's leading gap with its last known price.
+
+    Used to continue a simulation: held tickers keep their last price until
+    they trade again (observed stays False for the filled rows).
+    """
+    n = len(matrix)
+    values = np.full((n, len(tickers)), np.nan)
+    observed = np.zeros((n, len(tickers)), dtype=bool)
+    for j, ticker in enumerate(tickers):
+        col = matrix.column(ticker)
+        if col is not None:
+            values[:, j] = matrix.values[:, col]
+            observed[:, j] = matrix.observed[:, col]
+        if ticker in last_prices:
+            lead = np.isnan(values[:, j])
+            lead &= np.cumsum(~lead) == 0
+            values[lead, j] = last_prices[ticker]
+    return PriceMatrix(matrix.dates, list(tickers), values, observed)
+
+
+def _carry_forward(values: np.ndarray, seed: float) -> np.ndarray:
+    """Replace non-positive entries with the last positive value (or seed)."""
+    bad = ~(values > 0)
+    if not bad.any():
+        return values
+    idx = np.where(bad, -1, np.arange(len(values)))
+    np.maximum.accumulate(idx, out=idx)
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], seed)
+
+
+def simulate_portfolio(
+    matrix: PriceMatrix,
+    rebalance_idx: np.ndarray,
+    weights: np.ndarray,
+    initial_capital: float,
+    shares: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """Simulate daily portfolio values.
+
+    Args:
+        matrix: Price matrix covering the simulation dates
+        rebalance_idx: Sorted row indices of rebalance dates
+        weights: (len(rebalance_idx), n_tickers) target weights as fractions
+        initial_capital: Starting value (or last value when continuing a run)
+        shares: Holdings carried in from a previous run, aligned with matrix.tickers;
+            without them the first date must be a rebalance date
+
+    Returns (daily portfolio values, shares held at the end).
+    """
+    n = len(matrix)
+    prices = np.nan_to_num(matrix.values, nan=0.0)
+    daily = np.empty(n, dtype=np.float64)
+
+    portfolio_value = float(initial_capital)
+    first = int(rebalance_idx[0]) if len(rebalance_idx) else n
+    if first > 0 and shares is not None:
+        # Carried holdings until the first rebalance
+        segment = _carry_forward(prices[:first] @ shares, portfolio_value)
+        daily[:first] = segment
+        portfolio_value = float(segment[-1])
+    bounds = np.append(rebalance_idx, n)
+
+    for k in range(len(rebalance_idx)):
+        start, stop = bounds[k], bounds[k + 1]
+        row = prices[start]
+
+        # Value current holdings at rebalance date
+        if shares is not None:
+            pv = float(row @ shares)
+            if pv > 0:
+                portfolio_value = pv
+
+        # Buy target weights at today's observed prices
+        w = weights[k]
+        buyable = matrix.observed[start] & (row > 0) & (w != 0)
+        shares = np.zeros_like(w)
+        shares[buyable] = portfolio_value * w[buyable] / row[buyable]
+
+        segment = _carry_forward(prices[start:stop] @ shares, portfolio_value)
+        daily[start:stop] = segment
+        portfolio_value = float(segment[-1])
+
+    return daily, shares
@@ -0,0 +1,269 @@
+"""Vectorized performance metrics for backtest value series.
+
+All metrics come from one pass of array ops over the daily values: returns,
+volatility, Sharpe/Sortino, running-peak drawdowns with their start/trough/
+recovery dates, Calmar, and optional rolling volatility/Sharpe series built
+from cumulative sums (O(N) per window).
+"""
+
+import math
+from datetime import datetime
+
+import numpy as np
+
+TRADING_DAYS = 252
+ROLLING_WINDOWS = (63, 252)
+
+
+def _rolling_stats(returns: np.ndarray, window: int, daily_rf: float) -> tuple[np.ndarray, np.ndarray]:
+    """Rolling annualized volatility (%) and Sharpe over `window` returns.
+
+    Aligned with the value series: entry i covers returns ending at day i,
+    NaN until a full window is available.
+    """
+    n = len(returns) + 1
+    vol = np.full(n, np.nan)
+    sharpe = np.full(n, np.nan)
+    if len(returns) < window:
+        return vol, sharpe
+
+    c1 = np.concatenate(([0.0], np.cumsum(returns)))
+    c2 = np.concatenate(([0.0], np.cumsum(returns * returns)))
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    mean = s1 / window
+    std = np.sqrt(np.maximum(s2 / window - mean * mean, 0.0))
+
+    vol[window:] = std * math.sqrt(TRADING_DAYS) * 100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe[window:] = np.where(std > 0, (mean - daily_rf) / std * math.sqrt(TRADING_DAYS), 0.0)
+    return vol, sharpe
+
+
+def drawdown_series(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Drawdown (%) from the running peak, plus the running peak and its index."""
+    peak = np.maximum.accumulate(values)
+    # Index of the most recent new high (strictly above the previous peak)
+    new_high = np.empty(len(values), dtype=bool)
+    new_high[0] = True
+    new_high[1:] = values[1:] > peak[:-1]
+    peak_idx = np.maximum.accumulate(np.where(new_high, np.arange(len(values)), 0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peak > 0, (peak - values) / peak * 100, 0.0)
+    return dd, peak, peak_idx
+
+
+def compute_metrics(
+    daily_values,
+    dates: list[str],
+    initial_capital: float,
+    risk_free_rate: float = 0.04,
+    rolling_windows: tuple[int, ...] = (),
+) -> dict:
+    """Compute performance metrics from daily portfolio values.
+
+    Set rolling_windows (e.g. ROLLING_WINDOWS) to also get rolling volatility
+    and Sharpe series under "rolling".
+    """
+    values = np.asarray(daily_values, dtype=np.float64)
+    if len(values) < 2:
+        return {}
+
+    final_value = float(values[-1])
+    total_return = (final_value / initial_capital - 1) * 100
+
+    # Annualized return
+    first = datetime.strptime(dates[0], "%Y-%m-%d")
+    last = datetime.strptime(dates[-1], "%Y-%m-%d")
+    years = max((last - first).days / 365.25, 0.01)
+    annualized_return = ((final_value / initial_capital) ** (1 / years) - 1) * 100
+
+    # Daily returns (skip days following a non-positive value)
+    prev = values[:-1]
+    valid = prev > 0
+    returns = values[1:][valid] / prev[valid] - 1
+
+    if returns.size == 0:
+        return {
+            "final_value": final_value,
+            "total_return_pct": total_return,
+            "annualized_return_pct": annualized_return,
+        }
+
+    # Volatility, Sharpe, Sortino
+    daily_rf = risk_free_rate / TRADING_DAYS
+    mean_daily = float(returns.mean())
+    daily_vol = math.sqrt(np.mean((returns - mean_daily) ** 2))
+    annualized_vol = daily_vol * math.sqrt(TRADING_DAYS) * 100
+
+    excess = returns - daily_rf
+    mean_excess = float(excess.mean())
+    sharpe = (mean_excess / daily_vol * math.sqrt(TRADING_DAYS)) if daily_vol > 0 else 0
+    downside_dev = math.sqrt(np.mean(np.minimum(excess, 0.0) ** 2))
+    sortino = (mean_excess / downside_dev * math.sqrt(TRADING_DAYS)) if downside_dev > 0 else 0
+
+    # Drawdowns
+    dd, peak, peak_idx = drawdown_series(values)
+    trough = int(np.argmax(dd))
+    max_dd = float(dd[trough])
+    dd_start = int(peak_idx[trough]) if max_dd > 0 else 0
+    dd_end = trough if max_dd > 0 else 0
+
+    # Recovery: first day after the trough back at or above the prior peak
+    recovery_date = None
+    recovery_days = None
+    if max_dd > 0:
+        recovered = np.flatnonzero(values[trough:] >= peak[trough])
+        if recovered.size:
+            recovery_date = dates[trough + int(recovered[0])]
+            recovery_days = (
+                datetime.strptime(recovery_date, "%Y-%m-%d") - datetime.strptime(dates[trough], "%Y-%m-%d")
+            ).days
+
+    # Longest underwater period (calendar days from peak to recovery or series end)
+    underwater = dd > 0
+    longest_dd_days = 0
+    if underwater.any():
+        edges = np.diff(np.concatenate(([0], underwater.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)  # first underwater day
+        stops = np.flatnonzero(edges == -1)  # first day back at peak (or len)
+        ordinals = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+        ordinals = np.append(ordinals, ordinals[-1])
+        longest_dd_days = int(np.max(ordinals[stops] - ordinals[starts - 1]))
+
+    calmar = (annualized_return / max_dd) if max_dd > 0 else 0
+
+    metrics = {
+        "final_value": round(final_value, 2),
+        "total_return_pct": round(total_return, 2),
+        "annualized_return_pct": round(annualized_return, 2),
+        "volatility_pct": round(annualized_vol, 2),
+        "sharpe_ratio": round(sharpe, 4),
+        "sortino_ratio": round(sortino, 4),
+        "calmar_ratio": round(calmar, 4),
+        "max_drawdown_pct": round(max_dd, 2),
+        "max_drawdown_start": dates[dd_start],
+        "max_drawdown_end": dates[dd_end],
+        "max_drawdown_recovery_date": recovery_date,
+        "max_drawdown_recovery_days": recovery_days,
+        "longest_drawdown_days": longest_dd_days,
+        "drawdowns": dd.tolist(),
+    }
+
+    if rolling_windows:
+        all_returns = np.zeros(len(values) - 1)
+        all_returns[valid] = returns
+        rolling = {}
+        for window in rolling_windows:
+            vol, rs = _rolling_stats(all_returns, window, daily_rf)
+            rolling[f"volatility_{window}d"] = vol
+            rolling[f"sharpe_{window}d"] = rs
+        metrics["rolling"] = rolling
+
+    return metrics
+
+
+def extend_metrics_state(
+    state: dict | None,
+    values,
+    dates: list[str],
+    risk_free_rate: float = 0.04,
+) -> tuple[dict, np.ndarray]:
+    """Fold new daily values into running metric aggregates (O(new days)).
+
+    The state holds return sums, the running peak and the max drawdown so far,
+    which is enough to recompute the metrics stored on backtest_runs without
+    re-reading the history. Pass state=None to start a new series.
+
+    Returns (new state, drawdown % for the new days).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if state is None:
+        state = {
+            "first_date": dates[0],
+            "last_date": dates[0],
+            "last_value": float(values[0]),
+            "risk_free_rate": risk_free_rate,
+            "count": 0,
+            "sum": 0.0,
+            "sumsq": 0.0,
+            "downside_sumsq": 0.0,
+            "peak": float(values[0]),
+            "peak_date": dates[0],
+            "max_dd": 0.0,
+            "max_dd_start": dates[0],
+            "max_dd_end": dates[0],
+        }
+        head_dd = np.zeros(1)
+        values, dates = values[1:], dates[1:]
+    else:
+        state = dict(state)
+        head_dd = np.zeros(0)
+    if len(values) == 0:
+        return state, head_dd
+
+    # Returns (skip days following a non-positive value)
+    prev = np.concatenate(([state["last_value"]], values[:-1]))
+    valid = prev > 0
+    returns = values[valid] / prev[valid] - 1
+    excess = returns - state["risk_free_rate"] / TRADING_DAYS
+    state["count"] += int(returns.size)
+    state["sum"] += float(returns.sum())
+    state["sumsq"] += float(np.sum(returns * returns))
+    state["downside_sumsq"] += float(np.sum(np.minimum(excess, 0.0) ** 2))
+
+    # Drawdowns continuing from the running peak
+    dd, peak, peak_idx = drawdown_series(np.concatenate(([state["peak"]], values)))
+    dd, peak, peak_idx = dd[1:], peak[1:], peak_idx[1:]
+    peak_dates = [state["peak_date"], *dates]
+    trough = int(np.argmax(dd))
+    if dd[trough] > state["max_dd"]:
+        state["max_dd"] = float(dd[trough])
+        state["max_dd_start"] = peak_dates[int(peak_idx[trough])]
+        state["max_dd_end"] = dates[trough]
+    state["peak"] = float(peak[-1])
+    state["peak_date"] = peak_dates[int(peak_idx[-1])]
+
+    state["last_value"] = float(values[-1])
+    state["last_date"] = dates[-1]
+    return state, np.concatenate((head_dd, dd))
+
+
+def metrics_from_state(state: dict, initial_capital: float) -> dict:
+    """Headline metrics (as stored on backtest_runs) from running aggregates."""
+    final_value = state["last_value"]
+    total_return = (final_value / initial_capital - 1) * 100
+    first = datetime.strptime(state["first_date"], "%Y-%m-%d")
+    last = datetime.strptime(state["last_date"], "%Y-%m-%d")
+    years = max((last - first).days / 365.25, 0.01)
+    annualized_return = ((final_value / initial_capital) ** (1 / years) - 1) * 100
+
+    n = state["count"]
+    if n == 0:
+        return {
+            "final_value": final_value,
+            "total_return_pct": total_return,
+            "annualized_return_pct": annualized_return,
+        }
+
+    mean_daily = state["sum"] / n
+    daily_vol = math.sqrt(max(state["sumsq"] / n - mean_daily * mean_daily, 0.0))
+    mean_excess = mean_daily - state["risk_free_rate"] / TRADING_DAYS
+    sharpe = (mean_excess / daily_vol * math.sqrt(TRADING_DAYS)) if daily_vol > 0 else 0
+    downside_dev = math.sqrt(state["downside_sumsq"] / n)
+    sortino = (mean_excess / downside_dev * math.sqrt(TRADING_DAYS)) if downside_dev > 0 else 0
+    max_dd = state["max_dd"]
+
+    return {
+        "final_value": round(final_value, 2),
+        "total_return_pct": round(total_return, 2),
+        "annualized_return_pct": round(annualized_return, 2),
+        "volatility_pct": round(daily_vol * math.sqrt(TRADING_DAYS) * 100, 2),
+        "sharpe_ratio": round(sharpe, 4),
+        "sortino_ratio": round(sortino, 4),
+        "calmar_ratio": round(annualized_return / max_dd, 4) if max_dd > 0 else 0,
+        "max_drawdown_pct": round(max_dd, 2),
+        "max_drawdown_start": state["max_dd_start"],
+        "max_drawdown_end": state["max_dd_end"],
+    }
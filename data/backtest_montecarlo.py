@@ -0,0 +1,314 @@
+"""Monte Carlo block-bootstrap backtests on the historical return matrix.
+
+Resamples contiguous blocks of trading days from historical_prices, keeping
+each day's asset returns together with its regime label, so cross-asset
+correlation, short-term autocorrelation and regime persistence survive the
+resampling. Thousands of paths are simulated at once as a
+(paths × days × assets) array computation:
+- Log growth per asset is a cumulative sum along the day axis
+- Rebalancing resets growth at segment starts; segment end values chain
+  with a cumulative product
+- Paths are processed in chunks sized to a memory budget
+
+Reports percentile bands for final value, annualized return, Sharpe and max
+drawdown, stored in backtest_montecarlo / backtest_montecarlo_bands.
+
+Usage:
+    python backtest_montecarlo.py 2012-01-01 --paths 5000 --years 10 --block-days 21
+"""
+
+import argparse
+import math
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config import DB_PATH
+from allocation_weights import get_weight_table
+from backtest_engine import load_price_matrix
+from backtest_metrics import TRADING_DAYS
+from regime_timeline import RegimeTimeline
+from run_backtest import init_backtest_tables, load_assets, select_available_assets
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Rebalance interval in trading days of the resampled path
+REBALANCE_DAYS = {"daily": 1, "weekly": 5, "monthly": 21, "quarterly": 63, "yearly": TRADING_DAYS}
+
+# Float64 arrays of shape (paths × days × assets) alive at once per chunk
+_ARRAYS_PER_PATH = 4
+
+
+def init_montecarlo_tables(conn: sqlite3.Connection):
+    """Create backtest_montecarlo and backtest_montecarlo_bands tables if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_montecarlo (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            sample_start TEXT NOT NULL,
+            sample_end TEXT NOT NULL,
+            initial_capital REAL NOT NULL,
+            risk_level INTEGER NOT NULL,
+            rebalance_period TEXT NOT NULL,
+            country TEXT NOT NULL,
+            regime_filter TEXT,
+            n_paths INTEGER NOT NULL,
+            horizon_days INTEGER NOT NULL,
+            block_days INTEGER NOT NULL,
+            seed INTEGER,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_montecarlo_bands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mc_id INTEGER REFERENCES backtest_montecarlo(id),
+            metric TEXT NOT NULL,
+            mean REAL,
+            p5 REAL,
+            p25 REAL,
+            p50 REAL,
+            p75 REAL,
+            p95 REAL
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_backtest_montecarlo_bands_mc ON backtest_montecarlo_bands(mc_id)"
+    )
+    conn.commit()
+
+
+def block_indices(
+    rng: np.random.Generator,
+    n_paths: int,
+    horizon: int,
+    block_days: int,
+    candidates: np.ndarray,
+) -> np.ndarray:
+    """(n_paths, horizon) historical day indices built from random contiguous blocks.
+
+    candidates: allowed block start indices (each followed by block_days - 1 days).
+    """
+    n_blocks = -(-horizon // block_days)
+    starts = candidates[rng.integers(0, len(candidates), size=(n_paths, n_blocks))]
+    idx = starts[:, :, None] + np.arange(block_days)
+    return idx.reshape(n_paths, -1)[:, :horizon]
+
+
+def simulate_paths(
+    log_growth: np.ndarray,
+    weight_rows: np.ndarray,
+    idx: np.ndarray,
+    rebalance_days: int,
+    initial_capital: float,
+) -> np.ndarray:
+    """Portfolio values for resampled paths.
+
+    Args:
+        log_growth: (days, assets) historical log(1 + daily return)
+        weight_rows: (days, assets) target weights for a rebalance on each historical day
+        idx: (paths, horizon) historical day index for every simulated day
+        rebalance_days: rebalance every N simulated days (to that day's regime weights)
+
+    Returns (paths, horizon + 1) values, starting at initial_capital.
+    Weight not allocated to any asset is held as cash.
+    """
+    n_paths, horizon = idx.shape
+    seg_starts = np.arange(0, horizon, rebalance_days)
+    seg_of_day = np.arange(horizon) // rebalance_days
+
+    # Cumulative log growth, reset at each segment start
+    cum = np.cumsum(log_growth[idx], axis=1)
+    base = np.concatenate((np.zeros((n_paths, 1, cum.shape[2])), cum[:, seg_starts[1:] - 1]), axis=1)
+    cum -= base[:, seg_of_day]
+    np.exp(cum, out=cum)
+
+    # Value relative to the segment start, per day
+    weights = weight_rows[idx[:, seg_starts]]
+    cash = 1.0 - weights.sum(axis=2)
+    rel = np.einsum("pda,pda->pd", cum, weights[:, seg_of_day]) + cash[:, seg_of_day]
+
+    # Chain segments: each starts from the previous segment's end value
+    seg_ends = np.append(seg_starts[1:], horizon) - 1
+    chain = np.cumprod(rel[:, seg_ends], axis=1)
+    chain = np.concatenate((np.ones((n_paths, 1)), chain[:, :-1]), axis=1)
+
+    values = np.empty((n_paths, horizon + 1))
+    values[:, 0] = initial_capital
+    values[:, 1:] = initial_capital * chain[:, seg_of_day] * rel
+    return values
+
+
+def path_metrics(values: np.ndarray, risk_free_rate: float = 0.04) -> dict[str, np.ndarray]:
+    """Per-path final value, annualized return, Sharpe and max drawdown (%)."""
+    final = values[:, -1]
+    years = (values.shape[1] - 1) / TRADING_DAYS
+    annualized = ((final / values[:, 0]) ** (1 / max(years, 0.01)) - 1) * 100
+
+    returns = values[:, 1:] / values[:, :-1] - 1
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, (mean - risk_free_rate / TRADING_DAYS) / std * math.sqrt(TRADING_DAYS), 0.0)
+
+    peak = np.maximum.accumulate(values, axis=1)
+    max_dd = np.max((peak - values) / peak, axis=1) * 100
+
+    return {
+        "final_value": final,
+        "annualized_return_pct": annualized,
+        "sharpe_ratio": sharpe,
+        "max_drawdown_pct": max_dd,
+    }
+
+
+def run_montecarlo(
+    start_date: str = "2012-01-01",
+    end_date: str | None = None,
+    n_paths: int = 5000,
+    horizon_years: float = 10,
+    block_days: int = 21,
+    initial_capital: float = 100_000_000,
+    risk_level: int = 3,
+    rebalance_period: str = "monthly",
+    country: str = "US",
+    regime: str | None = None,
+    seed: int | None = None,
+    memory_mb: float = 512,
+    store: bool = True,
+) -> dict:
+    """Bootstrap n_paths paths of horizon_years from [start_date, end_date] history.
+
+    regime: only draw blocks that start in this regime (stress scenario).
+    memory_mb: budget for the per-chunk path arrays; sets the chunk size.
+    Returns dict with mc_id (if stored) and {metric: {mean, p5, ..., p95}} bands.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    if rebalance_period not in REBALANCE_DAYS:
+        raise ValueError(f"Unknown rebalance period: {rebalance_period}")
+
+    conn = sqlite3.connect(DB_PATH)
+    init_backtest_tables(conn)
+    init_montecarlo_tables(conn)
+
+    assets = load_assets(conn)
+    matrix = load_price_matrix(conn, [a["ticker"] for a in assets], start_date, end_date)
+    assets = select_available_assets(assets, set(matrix.tickers))
+    if not assets or len(matrix) < 2:
+        conn.close()
+        raise ValueError("No price data available for any portfolio asset")
+
+    # Historical daily returns (0 before an asset's first price) and the regime of each day
+    prices = matrix.values
+    with np.errstate(invalid="ignore"):
+        log_growth = np.nan_to_num(np.log(prices[1:] / prices[:-1]), nan=0.0)
+    day_dates = matrix.dates[1:]
+    labels = RegimeTimeline.load(conn, [country]).resolve(day_dates, country)
+
+    # Target weights if rebalancing on each historical day; assets not yet listed stay in cash
+    weight_table = get_weight_table(conn, assets)
+    columns = [matrix.index[t] for t in weight_table.tickers]
+    regime_names, label_codes = np.unique(labels.astype(str), return_inverse=True)
+    regime_rows = np.zeros((len(regime_names), len(matrix.tickers)))
+    for k, name in enumerate(regime_names):
+        regime_rows[k, columns] = weight_table.row(name, risk_level)
+    weight_rows = regime_rows[label_codes] * ~np.isnan(prices[:-1])
+
+    n_days = len(day_dates)
+    horizon = int(round(horizon_years * TRADING_DAYS))
+    block_days = max(1, min(block_days, n_days))
+    candidates = np.arange(n_days - block_days + 1)
+    if regime is not None:
+        candidates = candidates[labels[candidates] == regime]
+        if candidates.size == 0:
+            conn.close()
+            raise ValueError(f"No {regime} days in {country} history to sample from")
+
+    bytes_per_path = _ARRAYS_PER_PATH * horizon * len(matrix.tickers) * 8
+    chunk = max(1, min(n_paths, int(memory_mb * 2**20 // bytes_per_path)))
+    rebalance_days = REBALANCE_DAYS[rebalance_period]
+
+    print(f"=== Monte Carlo: {n_paths} paths × {horizon} days × {len(matrix.tickers)} assets ===")
+    print(f"  Sample: {day_dates[0]} ~ {day_dates[-1]} ({n_days} days), block {block_days} days")
+    print(f"  Chunk: {chunk} paths (~{chunk * bytes_per_path / 2**20:.0f} MB)")
+
+    rng = np.random.default_rng(seed)
+    results: dict[str, list[np.ndarray]] = {}
+    t0 = time.perf_counter()
+    for done in range(0, n_paths, chunk):
+        size = min(chunk, n_paths - done)
+        idx = block_indices(rng, size, horizon, block_days, candidates)
+        values = simulate_paths(log_growth, weight_rows, idx, rebalance_days, initial_capital)
+        for metric, v in path_metrics(values).items():
+            results.setdefault(metric, []).append(v)
+    elapsed = time.perf_counter() - t0
+    print(f"  Simulated in {elapsed:.2f}s ({n_paths / max(elapsed, 1e-9):,.0f} paths/s)")
+
+    bands = {}
+    for metric, parts in results.items():
+        v = np.concatenate(parts)
+        bands[metric] = {"mean": float(v.mean())}
+        bands[metric].update({f"p{q}": float(x) for q, x in zip(PERCENTILES, np.percentile(v, PERCENTILES))})
+        print(f"  {metric}: " + ", ".join(f"p{q}={bands[metric][f'p{q}']:,.2f}" for q in PERCENTILES))
+
+    mc_id = None
+    if store:
+        name = f"Monte Carlo {day_dates[0]} ~ {day_dates[-1]} ({horizon_years:g}y, risk {risk_level}, {rebalance_period})"
+        with conn:
+            cursor = conn.execute(
+                """INSERT INTO backtest_montecarlo
+                   (name, sample_start, sample_end, initial_capital, risk_level, rebalance_period,
+                    country, regime_filter, n_paths, horizon_days, block_days, seed, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (name, day_dates[0], day_dates[-1], initial_capital, risk_level, rebalance_period,
+                 country, regime, n_paths, horizon, block_days, seed, datetime.now().isoformat()),
+            )
+            mc_id = cursor.lastrowid
+            conn.executemany(
+                """INSERT INTO backtest_montecarlo_bands (mc_id, metric, mean, p5, p25, p50, p75, p95)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (mc_id, metric, b["mean"], *(b[f"p{q}"] for q in PERCENTILES))
+                    for metric, b in bands.items()
+                ],
+            )
+    conn.close()
+
+    return {"mc_id": mc_id, "bands": bands}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo block-bootstrap backtest")
+    parser.add_argument("start", nargs="?", default="2012-01-01", help="History sample start (YYYY-MM-DD)")
+    parser.add_argument("end", nargs="?", default=None, help="History sample end (default: today)")
+    parser.add_argument("--paths", type=int, default=5000)
+    parser.add_argument("--years", type=float, default=10, help="Simulated horizon in years")
+    parser.add_argument("--block-days", type=int, default=21)
+    parser.add_argument("--risk-level", type=int, default=3)
+    parser.add_argument("--rebalance", default="monthly", choices=list(REBALANCE_DAYS))
+    parser.add_argument("--country", default="US")
+    parser.add_argument("--regime", default=None, help="Only sample blocks starting in this regime")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--memory-mb", type=float, default=512)
+    parser.add_argument("--no-store", action="store_true")
+    args = parser.parse_args()
+
+    result = run_montecarlo(
+        start_date=args.start,
+        end_date=args.end,
+        n_paths=args.paths,
+        horizon_years=args.years,
+        block_days=args.block_days,
+        risk_level=args.risk_level,
+        rebalance_period=args.rebalance,
+        country=args.country,
+        regime=args.regime,
+        seed=args.seed,
+        memory_mb=args.memory_mb,
+        store=not args.no_store,
+    )
+    if result["mc_id"] is not None:
+        print(f"\nMonte Carlo run ID: {result['mc_id']}")
@@ -0,0 +1,342 @@
+"""Backtest result storage: bulk snapshot writes, compact per-run series, end state.
+
+Snapshots go to backtest_snapshots with one executemany. Optionally the full
+daily curves are also stored as a backtest_series row: dates as int32 day
+offsets and values as float64, each little-endian and zlib-compressed, plus
+run-length encoded regimes. Days appended later (continue_backtest) go to
+backtest_series_chunks as one row per append in the same encoding, so an
+append costs O(new days); the full curves are the base row followed by its
+chunks in order.
+
+backtest_state keeps each run's end state (holdings, last prices, benchmark
+base, running metric aggregates, days simulated and the snapshot interval)
+so continue_backtest can extend it.
+"""
+
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+SERIES_ENCODING = "zlib-le-v1"
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def init_series_table(conn: sqlite3.Connection):
+    """Create backtest_series table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_series (
+            run_id INTEGER PRIMARY KEY REFERENCES backtest_runs(id),
+            n_days INTEGER NOT NULL,
+            encoding TEXT NOT NULL,
+            dates BLOB NOT NULL,
+            portfolio_values BLOB NOT NULL,
+            benchmark_values BLOB,
+            drawdowns BLOB,
+            regimes TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_series_chunks (
+            run_id INTEGER NOT NULL REFERENCES backtest_runs(id),
+            chunk INTEGER NOT NULL,
+            n_days INTEGER NOT NULL,
+            dates BLOB NOT NULL,
+            portfolio_values BLOB NOT NULL,
+            benchmark_values BLOB,
+            drawdowns BLOB,
+            regimes TEXT,
+            PRIMARY KEY (run_id, chunk)
+        )
+    """)
+
+
+def init_state_table(conn: sqlite3.Connection):
+    """Create backtest_state table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_state (
+            run_id INTEGER PRIMARY KEY REFERENCES backtest_runs(id),
+            as_of_date TEXT NOT NULL,
+            country TEXT NOT NULL,
+            assets_json TEXT NOT NULL,
+            holdings_json TEXT NOT NULL,
+            last_prices_json TEXT NOT NULL,
+            portfolio_value REAL NOT NULL,
+            benchmark_base_price REAL,
+            benchmark_value REAL NOT NULL,
+            metrics_state_json TEXT NOT NULL,
+            benchmark_metrics_state_json TEXT NOT NULL,
+            n_days INTEGER,
+            snapshot_every INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(backtest_state)")}
+    if "n_days" not in columns:
+        conn.execute("ALTER TABLE backtest_state ADD COLUMN n_days INTEGER")
+    if "snapshot_every" not in columns:
+        conn.execute("ALTER TABLE backtest_state ADD COLUMN snapshot_every INTEGER NOT NULL DEFAULT 1")
+
+
+def save_backtest_state(conn: sqlite3.Connection, run_id: int, state: dict):
+    """Insert or replace a run's end state.
+
+    n_days is the number of days simulated so far and snapshot_every the
+    run's snapshot interval, so appended snapshots stay on the same grid.
+    """
+    conn.execute(
+        """INSERT OR REPLACE INTO backtest_state
+           (run_id, as_of_date, country, assets_json, holdings_json, last_prices_json,
+            portfolio_value, benchmark_base_price, benchmark_value,
+            metrics_state_json, benchmark_metrics_state_json, n_days, snapshot_every, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            run_id,
+            state["as_of_date"],
+            state["country"],
+            json.dumps(state["assets"]),
+            json.dumps(state["holdings"]),
+            json.dumps(state["last_prices"]),
+            state["portfolio_value"],
+            state["benchmark_base_price"],
+            state["benchmark_value"],
+            json.dumps(state["metrics_state"]),
+            json.dumps(state["benchmark_metrics_state"]),
+            state.get("n_days"),
+            state.get("snapshot_every", 1),
+            datetime.now().isoformat(),
+        ),
+    )
+
+
+def load_backtest_state(conn: sqlite3.Connection, run_id: int) -> dict | None:
+    """Load a run's end state, or None if the run has none."""
+    row = conn.execute(
+        """SELECT as_of_date, country, assets_json, holdings_json, last_prices_json,
+                  portfolio_value, benchmark_base_price, benchmark_value,
+                  metrics_state_json, benchmark_metrics_state_json, n_days, snapshot_every
+           FROM backtest_state WHERE run_id = ?""",
+        (run_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "as_of_date": row[0],
+        "country": row[1],
+        "assets": json.loads(row[2]),
+        "holdings": json.loads(row[3]),
+        "last_prices": json.loads(row[4]),
+        "portfolio_value": row[5],
+        "benchmark_base_price": row[6],
+        "benchmark_value": row[7],
+        "metrics_state": json.loads(row[8]),
+        "benchmark_metrics_state": json.loads(row[9]),
+        "n_days": row[10],
+        "snapshot_every": row[11],
+    }
+
+
+def store_snapshots(
+    conn: sqlite3.Connection,
+    run_id: int,
+    dates: list[str],
+    portfolio_values: list[float],
+    benchmark_values: list[float],
+    regimes: list[str],
+    drawdowns: list[float],
+    every: int = 1,
+    offset: int = 0,
+) -> int:
+    """Insert daily snapshots (every `every`-th day, always including the last) in one batch.
+
+    offset is the run's day index of dates[0], so appended days keep the
+    run's snapshot grid.
+    """
+    n = len(dates)
+    if n == 0:
+        return 0
+    every = max(every, 1)
+    indices = list(range(-offset % every, n, every))
+    if not indices or indices[-1] != n - 1:
+        indices.append(n - 1)
+
+    rows = [
+        (
+            run_id,
+            dates[i],
+            portfolio_values[i],
+            benchmark_values[i] if i < len(benchmark_values) else None,
+            regimes[i],
+            drawdowns[i] if i < len(drawdowns) else 0,
+        )
+        for i in indices
+    ]
+    conn.executemany(
+        """INSERT INTO backtest_snapshots
+           (run_id, date, portfolio_value, benchmark_value, regime_name, drawdown_pct)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+    return len(rows)
+
+
+def _pack(values, dtype: str) -> bytes:
+    return zlib.compress(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+def _unpack(blob: bytes | None, dtype: str) -> np.ndarray | None:
+    if blob is None:
+        return None
+    return np.frombuffer(zlib.decompress(blob), dtype=dtype)
+
+
+def encode_regimes(regimes: list[str]) -> str:
+    """Run-length encode daily regimes as JSON [[start_index, regime], ...]."""
+    runs = []
+    for i, regime in enumerate(regimes):
+        if not runs or runs[-1][1] != regime:
+            runs.append([i, regime])
+    return json.dumps(runs)
+
+
+def decode_regimes(encoded: str | None, n_days: int) -> list[str] | None:
+    if encoded is None:
+        return None
+    runs = json.loads(encoded)
+    regimes = []
+    for k, (start, regime) in enumerate(runs):
+        stop = runs[k + 1][0] if k + 1 < len(runs) else n_days
+        regimes.extend([regime] * (stop - start))
+    return regimes
+
+
+def _encode_days(dates, portfolio_values, benchmark_values, drawdowns, regimes) -> tuple:
+    """Blob columns (dates, portfolio_values, benchmark_values, drawdowns, regimes) of a series row."""
+    day_offsets = (np.array(dates, dtype="datetime64[D]") - _EPOCH).astype("<i4")
+    return (
+        zlib.compress(day_offsets.tobytes()),
+        _pack(portfolio_values, "<f8"),
+        _pack(benchmark_values, "<f8") if benchmark_values is not None else None,
+        _pack(drawdowns, "<f8") if drawdowns is not None else None,
+        encode_regimes(regimes) if regimes is not None else None,
+    )
+
+
+def _decode_days(row: tuple) -> dict:
+    """Decode (n_days, dates, portfolio_values, benchmark_values, drawdowns, regimes) of a series row."""
+    n_days, dates, portfolio_values, benchmark_values, drawdowns, regimes = row
+    return {
+        "dates": _EPOCH + _unpack(dates, "<i4").astype("timedelta64[D]"),
+        "portfolio_values": _unpack(portfolio_values, "<f8"),
+        "benchmark_values": _unpack(benchmark_values, "<f8"),
+        "drawdowns": _unpack(drawdowns, "<f8"),
+        "regimes": decode_regimes(regimes, n_days),
+    }
+
+
+def store_backtest_series(
+    conn: sqlite3.Connection,
+    run_id: int,
+    dates: list[str],
+    portfolio_values: list[float],
+    benchmark_values: list[float] | None = None,
+    drawdowns: list[float] | None = None,
+    regimes: list[str] | None = None,
+):
+    """Store full-resolution daily curves for a run as one compressed row (replacing any appended days)."""
+    conn.execute("DELETE FROM backtest_series_chunks WHERE run_id = ?", (run_id,))
+    conn.execute(
+        """INSERT OR REPLACE INTO backtest_series
+           (run_id, n_days, encoding, dates, portfolio_values, benchmark_values, drawdowns, regimes)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            run_id,
+            len(dates),
+            SERIES_ENCODING,
+            *_encode_days(dates, portfolio_values, benchmark_values, drawdowns, regimes),
+        ),
+    )
+
+
+def load_backtest_series(conn: sqlite3.Connection, run_id: int) -> dict | None:
+    """Load a run's full-resolution curves (base row plus appended chunks), or None if it has none."""
+    row = conn.execute(
+        """SELECT n_days, encoding, dates, portfolio_values, benchmark_values, drawdowns, regimes
+           FROM backtest_series WHERE run_id = ?""",
+        (run_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    if row[1] != SERIES_ENCODING:
+        raise ValueError(f"Unsupported backtest series encoding: {row[1]}")
+
+    parts = [_decode_days((row[0], *row[2:]))]
+    parts += [
+        _decode_days(chunk)
+        for chunk in conn.execute(
+            """SELECT n_days, dates, portfolio_values, benchmark_values, drawdowns, regimes
+               FROM backtest_series_chunks WHERE run_id = ? ORDER BY chunk""",
+            (run_id,),
+        )
+    ]
+
+    def join(key):
+        if parts[0][key] is None:
+            return None
+        return np.concatenate([p[key] for p in parts]) if len(parts) > 1 else parts[0][key]
+
+    return {
+        "dates": [str(d) for d in join("dates")],
+        "portfolio_values": join("portfolio_values"),
+        "benchmark_values": join("benchmark_values"),
+        "drawdowns": join("drawdowns"),
+        "regimes": None if parts[0]["regimes"] is None else [r for p in parts for r in p["regimes"]],
+    }
+
+
+def append_backtest_series(
+    conn: sqlite3.Connection,
+    run_id: int,
+    dates: list[str],
+    portfolio_values: list[float],
+    benchmark_values: list[float],
+    drawdowns: list[float],
+    regimes: list[str],
+) -> bool:
+    """Append days to a run's stored series as a new chunk, if it has one. Returns True if updated.
+
+    Only the new days are encoded and written; the stored rows are not read.
+    Columns the base row doesn't store stay empty.
+    """
+    base = conn.execute(
+        """SELECT benchmark_values IS NOT NULL, drawdowns IS NOT NULL, regimes IS NOT NULL
+           FROM backtest_series WHERE run_id = ?""",
+        (run_id,),
+    ).fetchone()
+    if base is None or len(dates) == 0:
+        return False
+
+    has_benchmark, has_drawdowns, has_regimes = base
+    (last_chunk,) = conn.execute(
+        "SELECT COALESCE(MAX(chunk), 0) FROM backtest_series_chunks WHERE run_id = ?", (run_id,)
+    ).fetchone()
+    conn.execute(
+        """INSERT INTO backtest_series_chunks
+           (run_id, chunk, n_days, dates, portfolio_values, benchmark_values, drawdowns, regimes)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            run_id,
+            last_chunk + 1,
+            len(dates),
+            *_encode_days(
+                dates,
+                portfolio_values,
+                benchmark_values if has_benchmark else None,
+                drawdowns if has_drawdowns else None,
+                regimes if has_regimes else None,
+            ),
+        ),
+    )
+    return True
@@ -0,0 +1,234 @@
+"""Parallel parameter sweep for backtests.
+
+Runs every combination of risk level × rebalance period × start date with
+the vectorized engine. Prices are loaded once into a PriceMatrix, placed in
+shared memory, and attached zero-copy by each worker in a process pool.
+Workers return metrics only; the parent bulk-writes them into backtest_runs.
+
+Usage:
+    python backtest_sweep.py --starts 2015-01-01 2018-01-01 --risk-levels 1 2 3 4 5
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import DB_PATH
+from backtest_engine import PriceMatrix, load_price_matrix
+from regime_timeline import RegimeTimeline
+from run_backtest import (
+    init_backtest_tables,
+    load_assets,
+    select_available_assets,
+    simulate_vectorized,
+    compute_metrics,
+)
+
+REBALANCE_PERIODS = ["daily", "weekly", "monthly", "quarterly", "yearly"]
+RISK_LEVELS = [1, 2, 3, 4, 5]
+
+# Per-worker state, set once by _init_worker
+_worker = {}
+
+
+def _to_shared(array: np.ndarray) -> shared_memory.SharedMemory:
+    """Copy an array into a new shared memory block."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm
+
+
+def _init_worker(values_spec, observed_spec, dates, tickers, assets, timeline, country, benchmark_ticker):
+    """Attach the shared price matrix and open a DB connection for this worker."""
+    blocks = []
+    arrays = []
+    for name, shape, dtype in (values_spec, observed_spec):
+        shm = shared_memory.SharedMemory(name=name)
+        blocks.append(shm)
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+    _worker.update(
+        blocks=blocks,  # keep mappings alive for the worker's lifetime
+        matrix=PriceMatrix(dates, tickers, arrays[0], arrays[1]),
+        assets=assets,
+        timeline=timeline,
+        country=country,
+        benchmark_ticker=benchmark_ticker,
+        conn=sqlite3.connect(DB_PATH),
+    )
+
+
+def _run_combination(params: dict) -> dict:
+    """Simulate one parameter combination on the shared matrix; returns metrics."""
+    matrix = _worker["matrix"].window(params["start_date"], params["end_date"])
+    assets = select_available_assets(_worker["assets"], set(matrix.tickers))
+    if not assets or len(matrix) < 2:
+        return {**params, "status": "failed"}
+
+    daily_values, benchmark_values, _, _ = simulate_vectorized(
+        _worker["conn"], matrix, assets, params["initial_capital"], params["risk_level"],
+        params["rebalance_period"], _worker["benchmark_ticker"], _worker["timeline"], _worker["country"],
+    )
+    metrics = compute_metrics(daily_values, matrix.dates, params["initial_capital"])
+    benchmark_metrics = compute_metrics(benchmark_values, matrix.dates, params["initial_capital"])
+    metrics.pop("drawdowns", None)
+
+    return {
+        **params,
+        **metrics,
+        "start_date": matrix.dates[0],
+        "end_date": matrix.dates[-1],
+        "benchmark_return_pct": benchmark_metrics.get("total_return_pct"),
+        "benchmark_sharpe": benchmark_metrics.get("sharpe_ratio"),
+        "benchmark_mdd_pct": benchmark_metrics.get("max_drawdown_pct"),
+        "status": "completed",
+    }
+
+
+def store_sweep_results(conn: sqlite3.Connection, results: list[dict], benchmark_ticker: str):
+    """Bulk-insert sweep results into backtest_runs in one transaction."""
+    now = datetime.now().isoformat()
+    rows = [
+        (
+            r["name"], r["start_date"], r["end_date"], r["initial_capital"], r["risk_level"],
+            r["rebalance_period"], r.get("final_value"), r.get("total_return_pct"),
+            r.get("annualized_return_pct"), r.get("volatility_pct"), r.get("sharpe_ratio"),
+            r.get("max_drawdown_pct"), r.get("max_drawdown_start"), r.get("max_drawdown_end"),
+            benchmark_ticker, r.get("benchmark_return_pct"), r.get("benchmark_sharpe"),
+            r.get("benchmark_mdd_pct"), r["status"], now,
+        )
+        for r in results
+    ]
+    with conn:
+        conn.executemany(
+            """INSERT INTO backtest_runs
+               (name, start_date, end_date, initial_capital, risk_level, rebalance_period,
+                final_value, total_return_pct, annualized_return_pct, volatility_pct,
+                sharpe_ratio, max_drawdown_pct, max_drawdown_start, max_drawdown_end,
+                benchmark_ticker, benchmark_return_pct, benchmark_sharpe, benchmark_mdd_pct,
+                status, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+
+
+def run_sweep(
+    start_dates: list[str],
+    end_date: str | None = None,
+    risk_levels: list[int] | None = None,
+    rebalance_periods: list[str] | None = None,
+    initial_capital: float = 100_000_000,
+    benchmark_ticker: str = "SPY",
+    country: str = "US",
+    workers: int | None = None,
+    store: bool = True,
+) -> list[dict]:
+    """Run all parameter combinations in a process pool.
+
+    Returns one metrics dict per combination, in combination order.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    risk_levels = risk_levels or RISK_LEVELS
+    rebalance_periods = rebalance_periods or REBALANCE_PERIODS
+    workers = workers or os.cpu_count() or 1
+
+    conn = sqlite3.connect(DB_PATH)
+    init_backtest_tables(conn)
+
+    assets = load_assets(conn)
+    tickers = [a["ticker"] for a in assets]
+    if benchmark_ticker not in tickers:
+        tickers.append(benchmark_ticker)
+
+    # Load once over the widest range; each combination takes a window
+    matrix = load_price_matrix(conn, tickers, min(start_dates), end_date)
+    if len(matrix) == 0:
+        conn.close()
+        raise ValueError("No price data available for any portfolio asset")
+    timeline = RegimeTimeline.load(conn, [country])
+
+    combinations = [
+        {
+            "name": f"Sweep {start} ~ {end_date} (risk {risk}, {period})",
+            "start_date": start,
+            "end_date": end_date,
+            "initial_capital": initial_capital,
+            "risk_level": risk,
+            "rebalance_period": period,
+        }
+        for start, risk, period in itertools.product(start_dates, risk_levels, rebalance_periods)
+    ]
+
+    print(f"=== Backtest Sweep: {len(combinations)} combinations on {workers} workers ===")
+    print(f"  Price matrix: {len(matrix)} days × {len(matrix.tickers)} tickers")
+
+    values_shm = _to_shared(matrix.values)
+    observed_shm = _to_shared(matrix.observed)
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(
+                (values_shm.name, matrix.values.shape, matrix.values.dtype),
+                (observed_shm.name, matrix.observed.shape, matrix.observed.dtype),
+                matrix.dates, matrix.tickers, assets, timeline, country, benchmark_ticker,
+            ),
+        ) as pool:
+            chunksize = max(1, len(combinations) // (workers * 4))
+            results = list(pool.map(_run_combination, combinations, chunksize=chunksize))
+    finally:
+        values_shm.close()
+        values_shm.unlink()
+        observed_shm.close()
+        observed_shm.unlink()
+    elapsed = time.perf_counter() - t0
+
+    print(f"  Completed in {elapsed:.2f}s ({len(combinations) / max(elapsed, 1e-9):.1f} runs/s)")
+
+    if store:
+        store_sweep_results(conn, results, benchmark_ticker)
+        print(f"  Stored {len(results)} runs in backtest_runs")
+    conn.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parallel backtest parameter sweep")
+    parser.add_argument("--starts", nargs="+", default=["2015-01-01"], help="Start dates (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="End date (default: today)")
+    parser.add_argument("--risk-levels", nargs="+", type=int, default=RISK_LEVELS)
+    parser.add_argument("--periods", nargs="+", default=REBALANCE_PERIODS, choices=REBALANCE_PERIODS)
+    parser.add_argument("--capital", type=float, default=100_000_000)
+    parser.add_argument("--benchmark", default="SPY")
+    parser.add_argument("--country", default="US")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-store", action="store_true", help="Do not write results to backtest_runs")
+    args = parser.parse_args()
+
+    results = run_sweep(
+        start_dates=args.starts,
+        end_date=args.end,
+        risk_levels=args.risk_levels,
+        rebalance_periods=args.periods,
+        initial_capital=args.capital,
+        benchmark_ticker=args.benchmark,
+        country=args.country,
+        workers=args.workers,
+        store=not args.no_store,
+    )
+
+    print("\n  === Top 5 by Sharpe ===")
+    completed = [r for r in results if r["status"] == "completed"]
+    for r in sorted(completed, key=lambda r: r.get("sharpe_ratio", 0), reverse=True)[:5]:
+        print(f"  {r['name']}: return={r.get('total_return_pct', 0):.2f}% sharpe={r.get('sharpe_ratio', 0):.4f} "
+              f"mdd={r.get('max_drawdown_pct', 0):.2f}%")
@@ -0,0 +1,294 @@
+"""Rolling-window (walk-forward) backtest results from a single simulation.
+
+Simulates the full history once with the vectorized engine, then derives
+every window's return, volatility, Sharpe and max drawdown from the one
+value path:
+- Returns: ratio of the path values at the window bounds
+- Volatility/Sharpe: differences of cumulative sums of daily returns
+- Max drawdown: range queries on a sparse table of (max, min, drawdown) over
+  power-of-two blocks, O(N log N) to build and O(1) per window
+
+Windows are slices of the one full-history path (its asset selection and
+rebalance schedule), not independent backtests started at each window date.
+
+Usage:
+    python backtest_walkforward.py 2012-01-01 --horizon-years 3 --step monthly
+"""
+
+import argparse
+import math
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+from config import DB_PATH
+from backtest_engine import load_price_matrix, rebalance_mask, benchmark_series
+from backtest_metrics import compute_metrics, TRADING_DAYS
+from regime_timeline import RegimeTimeline
+from run_backtest import (
+    init_backtest_tables,
+    load_assets,
+    select_available_assets,
+    simulate_vectorized,
+)
+
+
+def init_window_table(conn: sqlite3.Connection):
+    """Create backtest_windows table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_windows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER REFERENCES backtest_runs(id),
+            window_start TEXT NOT NULL,
+            window_end TEXT NOT NULL,
+            total_return_pct REAL,
+            annualized_return_pct REAL,
+            volatility_pct REAL,
+            sharpe_ratio REAL,
+            max_drawdown_pct REAL,
+            benchmark_return_pct REAL
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_backtest_windows_run ON backtest_windows(run_id, window_start)"
+    )
+    conn.commit()
+
+
+def window_bounds(dates: list[str], horizon_years: float, step: str) -> tuple[np.ndarray, np.ndarray]:
+    """Start/end row indices of every full window.
+
+    Windows start on the first trading day of each `step` period and end on
+    the last trading day within `horizon_years` of the start.
+    """
+    days = np.array(dates, dtype="datetime64[D]")
+    starts = np.flatnonzero(rebalance_mask(dates, step))
+    horizon = np.timedelta64(int(round(horizon_years * 365.25)), "D")
+    ends = np.searchsorted(days, days[starts] + horizon, side="right") - 1
+
+    # Only keep windows that span the full horizon
+    full = days[starts] + horizon <= days[-1]
+    return starts[full], ends[full]
+
+
+def window_max_drawdowns(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Max drawdown (%) of values[s..e] for every (s, e) window.
+
+    Level k of the sparse table holds max, min and max drawdown of every
+    block [i, i + 2^k); two halves combine as max(left, right, drop from
+    the left max to the right min). A window is covered by its two
+    (overlapping) blocks A = [s, s + 2^k) and B = [e - 2^k + 1, e]: pairs
+    inside either block are in their drawdowns, and a peak before B
+    (in [s, e - 2^k]) with a trough in B is max(peak) → min(B).
+    Values below 0 count as 0 (a 100% drawdown).
+    """
+    v = np.maximum(np.asarray(values, dtype=np.float64), 0.0)
+
+    def drop(peak: np.ndarray, trough: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(peak > 0, (peak - trough) / peak * 100, 0.0)
+
+    highs, lows, dds = [v], [v], [np.zeros(len(v))]
+    while 2 ** len(highs) <= len(v):
+        half = 2 ** (len(highs) - 1)
+        hi, lo, dd = highs[-1], lows[-1], dds[-1]
+        highs.append(np.maximum(hi[:-half], hi[half:]))
+        lows.append(np.minimum(lo[:-half], lo[half:]))
+        dds.append(np.maximum(np.maximum(dd[:-half], dd[half:]), drop(hi[:-half], lo[half:])))
+
+    length = ends - starts + 1
+    level = np.floor(np.log2(length)).astype(int)
+    b_start = ends - (1 << level) + 1
+    result = np.empty(len(starts))
+    for k in np.unique(level):
+        rows = np.flatnonzero(level == k)
+        s, b = starts[rows], b_start[rows]
+        best = np.maximum(dds[k][s], dds[k][b])
+        # Peak in [s, b - 1] (empty when the blocks coincide), trough in B
+        gap = b > s
+        if gap.any():
+            span = b[gap] - s[gap]
+            j = np.floor(np.log2(span)).astype(int)
+            peak = np.empty(len(span))
+            for level_j in np.unique(j):
+                m = j == level_j
+                peak[m] = np.maximum(highs[level_j][s[gap][m]], highs[level_j][b[gap][m] - (1 << level_j)])
+            best[gap] = np.maximum(best[gap], drop(peak, lows[k][b[gap]]))
+        result[rows] = best
+    return result
+
+
+def window_metrics(
+    values: np.ndarray,
+    dates: list[str],
+    starts: np.ndarray,
+    ends: np.ndarray,
+    risk_free_rate: float = 0.04,
+) -> dict[str, np.ndarray]:
+    """Per-window metrics derived from one value path (all windows at once)."""
+    if len(starts) == 0:
+        return {key: np.empty(0) for key in (
+            "total_return_pct", "annualized_return_pct", "volatility_pct", "sharpe_ratio", "max_drawdown_pct",
+        )}
+    total_return = (values[ends] / values[starts] - 1) * 100
+
+    days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+    years = np.maximum((days[ends] - days[starts]) / 365.25, 0.01)
+    with np.errstate(invalid="ignore"):
+        annualized = ((values[ends] / values[starts]) ** (1 / years) - 1) * 100
+
+    # Daily returns; days following a non-positive value count as 0
+    prev = values[:-1]
+    returns = np.zeros(len(values) - 1)
+    np.divide(values[1:], prev, out=returns, where=prev > 0)
+    returns = np.where(prev > 0, returns - 1, 0.0)
+    c1 = np.concatenate(([0.0], np.cumsum(returns)))
+    c2 = np.concatenate(([0.0], np.cumsum(returns * returns)))
+
+    # Returns in window (start, end]: indices start .. end-1 of `returns`
+    count = np.maximum(ends - starts, 1)
+    mean = (c1[ends] - c1[starts]) / count
+    std = np.sqrt(np.maximum((c2[ends] - c2[starts]) / count - mean * mean, 0.0))
+    volatility = std * math.sqrt(TRADING_DAYS) * 100
+    daily_rf = risk_free_rate / TRADING_DAYS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, (mean - daily_rf) / std * math.sqrt(TRADING_DAYS), 0.0)
+
+    max_dd = window_max_drawdowns(values, starts, ends)
+
+    return {
+        "total_return_pct": total_return,
+        "annualized_return_pct": annualized,
+        "volatility_pct": volatility,
+        "sharpe_ratio": sharpe,
+        "max_drawdown_pct": max_dd,
+    }
+
+
+def run_walk_forward(
+    start_date: str = "2012-01-01",
+    end_date: str | None = None,
+    horizon_years: float = 3,
+    step: str = "monthly",
+    initial_capital: float = 100_000_000,
+    risk_level: int = 3,
+    rebalance_period: str = "monthly",
+    benchmark_ticker: str = "SPY",
+    country: str = "US",
+    name: str | None = None,
+) -> dict:
+    """Simulate once and store per-window results in backtest_windows.
+
+    Returns dict with run_id, full-period metrics and window count.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    if name is None:
+        name = f"Walk-forward {start_date} ~ {end_date} ({horizon_years:g}y windows, {step})"
+
+    conn = sqlite3.connect(DB_PATH)
+    init_backtest_tables(conn)
+    init_window_table(conn)
+
+    assets = load_assets(conn)
+    tickers = [a["ticker"] for a in assets]
+    if benchmark_ticker not in tickers:
+        tickers.append(benchmark_ticker)
+
+    matrix = load_price_matrix(conn, tickers, start_date, end_date)
+    assets = select_available_assets(assets, set(matrix.tickers))
+    if not assets or len(matrix) < 2:
+        conn.close()
+        raise ValueError("No price data available for any portfolio asset")
+
+    timeline = RegimeTimeline.load(conn, [country])
+    daily_values, _, _, _ = simulate_vectorized(
+        conn, matrix, assets, initial_capital, risk_level, rebalance_period, benchmark_ticker,
+        timeline, country,
+    )
+    values = np.asarray(daily_values)
+    bench = benchmark_series(matrix, benchmark_ticker, initial_capital)
+
+    starts, ends = window_bounds(matrix.dates, horizon_years, step)
+    windows = window_metrics(values, matrix.dates, starts, ends)
+    bench_return = (bench[ends] / bench[starts] - 1) * 100
+
+    print(f"=== Walk-forward: {name} ===")
+    print(f"  Trading days: {len(matrix)}, windows: {len(starts)}")
+
+    metrics = compute_metrics(values, matrix.dates, initial_capital)
+    benchmark_metrics = compute_metrics(bench, matrix.dates, initial_capital)
+
+    now = datetime.now().isoformat()
+    with conn:
+        cursor = conn.execute(
+            """INSERT INTO backtest_runs
+               (name, start_date, end_date, initial_capital, risk_level, rebalance_period,
+                final_value, total_return_pct, annualized_return_pct, volatility_pct,
+                sharpe_ratio, max_drawdown_pct, max_drawdown_start, max_drawdown_end,
+                benchmark_ticker, benchmark_return_pct, benchmark_sharpe, benchmark_mdd_pct,
+                status, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'completed', ?)""",
+            (
+                name, matrix.dates[0], matrix.dates[-1], initial_capital, risk_level, rebalance_period,
+                metrics.get("final_value"), metrics.get("total_return_pct"),
+                metrics.get("annualized_return_pct"), metrics.get("volatility_pct"),
+                metrics.get("sharpe_ratio"), metrics.get("max_drawdown_pct"),
+                metrics.get("max_drawdown_start"), metrics.get("max_drawdown_end"),
+                benchmark_ticker, benchmark_metrics.get("total_return_pct"),
+                benchmark_metrics.get("sharpe_ratio"), benchmark_metrics.get("max_drawdown_pct"), now,
+            ),
+        )
+        run_id = cursor.lastrowid
+
+        rows = [
+            (
+                run_id, matrix.dates[s], matrix.dates[e],
+                *(round(float(windows[k][i]), 4) for k in (
+                    "total_return_pct", "annualized_return_pct", "volatility_pct",
+                    "sharpe_ratio", "max_drawdown_pct",
+                )),
+                round(float(bench_return[i]), 4),
+            )
+            for i, (s, e) in enumerate(zip(starts, ends))
+        ]
+        conn.executemany(
+            """INSERT INTO backtest_windows
+               (run_id, window_start, window_end, total_return_pct, annualized_return_pct,
+                volatility_pct, sharpe_ratio, max_drawdown_pct, benchmark_return_pct)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+    conn.close()
+
+    if len(starts):
+        print(f"  Window return: median {np.median(windows['total_return_pct']):.2f}%, "
+              f"min {np.min(windows['total_return_pct']):.2f}%, max {np.max(windows['total_return_pct']):.2f}%")
+        print(f"  Window MDD: median {np.median(windows['max_drawdown_pct']):.2f}%, "
+              f"worst {np.max(windows['max_drawdown_pct']):.2f}%")
+
+    return {"run_id": run_id, "name": name, "windows": len(starts), **metrics}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest over rolling start dates")
+    parser.add_argument("start", nargs="?", default="2012-01-01")
+    parser.add_argument("end", nargs="?", default=None)
+    parser.add_argument("--horizon-years", type=float, default=3)
+    parser.add_argument("--step", default="monthly", choices=["daily", "weekly", "monthly", "quarterly", "yearly"])
+    parser.add_argument("--risk-level", type=int, default=3)
+    parser.add_argument("--rebalance", default="monthly")
+    parser.add_argument("--country", default="US")
+    args = parser.parse_args()
+
+    result = run_walk_forward(
+        start_date=args.start,
+        end_date=args.end,
+        horizon_years=args.horizon_years,
+        step=args.step,
+        risk_level=args.risk_level,
+        rebalance_period=args.rebalance,
+        country=args.country,
+    )
+    print(f"\nWalk-forward run ID: {result['run_id']}")
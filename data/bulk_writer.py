@@ -0,0 +1,67 @@
+"""Bulk SQLite writes for ingested DataFrames.
+
+Frames are turned into per-column Python lists (one .tolist() per column,
+NaN → NULL) and written with executemany in chunked transactions, on a
+connection tuned for bulk writes (WAL, synchronous=NORMAL, in-memory temp
+storage, larger page cache).
+
+Used by: fetch_fred.py, fetch_prices.py
+"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 20_000
+
+# Connection-level settings for ingestion; WAL matches the Next.js side (db/index.ts)
+WRITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -65536,  # KiB (64 MiB)
+    "busy_timeout": 5000,
+}
+
+
+def tune_for_writes(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply WRITE_PRAGMAS to an open connection."""
+    for name, value in WRITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def column_lists(df: pd.DataFrame, columns: list[str]) -> list[list]:
+    """Each column as a list of Python values, NaN/NaT as None."""
+    out = []
+    for column in columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind == "f":
+            nulls = np.isnan(values)
+            out.append(np.where(nulls, None, values).tolist() if nulls.any() else values.tolist())
+        elif values.dtype.kind == "O":
+            out.append(df[column].where(df[column].notna(), None).tolist())
+        else:
+            out.append(values.tolist())
+    return out
+
+
+def write_frame(
+    conn: sqlite3.Connection,
+    table: str,
+    df: pd.DataFrame,
+    columns: list[str] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    verb: str = "INSERT OR REPLACE",
+) -> int:
+    """Write df's columns into table, one transaction per chunk; returns rows written."""
+    columns = columns or list(df.columns)
+    if df.empty:
+        return 0
+    rows = list(zip(*column_lists(df, columns)))
+    sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for start in range(0, len(rows), chunk_size):
+        with conn:
+            conn.executemany(sql, rows[start:start + chunk_size])
+    return len(rows)
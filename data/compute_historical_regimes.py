@@ -1,189 +1,214 @@
 """Compute historical regimes from FRED economic data for backtesting.
 
-Walks through historical economic data month-by-month and determines
-what the regime would have been at each point in time using the same
-3-axis model (Growth x Inflation x Liquidity).
+Determines what the regime would have been at the start of each month
+using the same 3-axis model (Growth x Inflation x Liquidity), with only
+the data available at that point (no look-ahead bias).
+
+Every series is loaded once from the cached macro panel (macro_panel), YoY growth/inflation and liquidity signals
+(liquidity_engine) are computed over its whole history, and the results are as-of joined onto the
+monthly grid with a binary search. All rows are written with one executemany.
+
+Runs are incremental: regime_watermarks keeps the last computed month per
+country, and only later months plus a revision window are recomputed and
+upserted. --full recomputes all months.
+
+Rows written here have regimes.source = 'historical'; rows from
+determine_regime keep the default 'live'. Live rows are never overwritten
+or deleted, so a live row on the first of a month takes that month's place.
+
+--point-in-time evaluates GDP and CPI from economic_data_vintages, i.e.
+with the values as published on each month rather than as revised today.
+Series without stored vintages fall back to economic_data. Switching mode
+only affects recomputed months, so combine it with --full.
 
 This populates the `regimes` table with historical entries so the
 backtest can use realistic regime transitions instead of defaulting
 to a single regime.
 """
 
+import argparse
 import sqlite3
-import pandas as pd
 from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
 from config import DB_PATH
+from economic_vintages import VintageStore
+from liquidity_engine import LiquidityEngine
+from macro_panel import YOY_PERIODS, compute_yoy, detect_frequency, load_panel
 from regime_utils import (
-    REGIME_NAMES,
     derive_regime_name,
     GROWTH_SERIES,
     CPI_SERIES,
     GROWTH_RATE_SERIES,
+    INFLATION_RATE_SERIES,
     GROWTH_THRESHOLDS,
     INFLATION_THRESHOLDS,
+    LIQUIDITY_SIGNALS,
     COUNTRIES,
 )
 
+# Months before each country's watermark recomputed on an incremental run
+REVISION_MONTHS = 6
 
-def load_series(conn, series_id):
-    """Load a time series from economic_data as a DataFrame."""
-    df = pd.read_sql_query(
-        "SELECT date, value FROM economic_data WHERE series_id = ? ORDER BY date ASC",
-        conn,
-        params=(series_id,),
-    )
-    if not df.empty:
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.set_index("date")
-    return df
 
+def load_all_series(conn, series_ids) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """Observations of several series from the cached macro panel.
 
-def compute_growth_at_date(conn, country, target_date):
+    Returns {series_id: (dates as datetime64[D], values)}, sorted by date.
+    Series without any rows are omitted.
     """
-    Determine growth state at a given date.
-    Uses GDP growth data available up to that date.
-    """
-    series_id = GROWTH_SERIES.get(country)
-    if not series_id:
-        return "low"  # default: conservative when data missing
+    return load_panel(conn).series(sorted(set(series_ids)))
 
-    df = load_series(conn, series_id)
-    if df.empty:
-        return "low"
 
-    # Filter to data available at this date
-    available = df[df.index <= target_date]
-    if len(available) < 2:
-        return "low"
+def _asof(series, grid: np.ndarray) -> np.ndarray:
+    """Number of observations available on each grid date (date <= grid date)."""
+    return np.searchsorted(series[0], grid, side="right")
 
-    threshold = GROWTH_THRESHOLDS.get(country, 2.0)
 
-    if series_id in GROWTH_RATE_SERIES:
-        # Already a growth rate (%) — use directly
-        latest_val = available.iloc[-1]["value"]
-        return "high" if latest_val > threshold else "low"
-    else:
-        # GDP level — compute YoY growth (4 quarters back)
-        if len(available) < 5:
-            return "low"
-        vals = available["value"]
-        yoy = vals.pct_change(periods=4) * 100
-        latest_growth = yoy.iloc[-1]
-        if pd.isna(latest_growth):
-            return "low"
-        return "high" if latest_growth > threshold else "low"
-
-
-def compute_inflation_at_date(conn, country, target_date):
-    """
-    Determine inflation state at a given date.
-    Uses CPI data available up to that date to compute YoY inflation.
-    """
-    series_id = CPI_SERIES.get(country)
-    if not series_id:
-        return "low"
+def _latest_asof(series, grid: np.ndarray, yoy: bool) -> tuple[np.ndarray, np.ndarray]:
+    """Observations available and latest value or YoY % on each grid date."""
+    n = _asof(series, grid)
+    latest = compute_yoy(series[0], series[1]) if yoy else series[1]
+    return n, np.where(n > 0, latest[np.maximum(n - 1, 0)], np.nan)
+
+
+def _latest_vintage(vintages, grid: np.ndarray, yoy: bool) -> tuple[np.ndarray, np.ndarray]:
+    """Same as _latest_asof, using only the values published by each grid date."""
+    k, latest = vintages.latest_as_of(grid)
+    if yoy:
+        prev_k = k - YOY_PERIODS.get(detect_frequency(vintages.obs_dates.astype("datetime64[D]")), 12)
+        ok = prev_k >= 0
+        prev = np.full(len(grid), np.nan)
+        prev[ok] = vintages.values_as_of(vintages.obs_dates[prev_k[ok]], grid[ok])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            latest = (latest / prev - 1) * 100
+    return k + 1, latest
 
-    df = load_series(conn, series_id)
-    if df.empty:
-        return "low"
 
-    # Filter to data available at this date
-    available = df[df.index <= target_date]
-    if len(available) < 13:
-        return "low"  # Need at least 13 months for YoY
+def _latest(series, vintages, series_id: str, grid: np.ndarray, yoy: bool):
+    if vintages is not None and series_id in vintages:
+        return _latest_vintage(vintages[series_id], grid, yoy)
+    return _latest_asof(series[series_id], grid, yoy)
 
-    # Compute YoY CPI
-    vals = available["value"]
-    yoy = vals.pct_change(periods=12) * 100
 
-    latest_yoy = yoy.iloc[-1]
-    if pd.isna(latest_yoy):
-        return "low"
+def growth_metric(series, country: str, grid: np.ndarray, vintages: VintageStore | None = None):
+    """GDP growth (%) available on each grid date, and whether there is enough data.
 
-    threshold = INFLATION_THRESHOLDS.get(country, 2.5)
+    Returns (ok, growth); None when the country's series has no data.
+    """
+    series_id = GROWTH_SERIES.get(country)
+    if series_id not in series and (vintages is None or series_id not in vintages):
+        return None
+
+    if series_id in GROWTH_RATE_SERIES:
+        # Already a growth rate (%) — use directly
+        n, latest = _latest(series, vintages, series_id, grid, False)
+        return n >= 2, latest
+    # GDP level — YoY growth at the series' frequency (NaN until a year of data)
+    n, latest = _latest(series, vintages, series_id, grid, True)
+    return n >= 2, latest
 
-    return "high" if latest_yoy > threshold else "low"
 
+def inflation_metric(series, country: str, grid: np.ndarray, vintages: VintageStore | None = None):
+    """YoY CPI inflation (%) available on each grid date, and whether there is enough data.
 
-def compute_liquidity_at_date(conn, target_date):
+    Returns (ok, inflation); None when the country's series has no data.
     """
-    Assess liquidity state at a given date using the "3-of-5" rule.
-    Uses only data available up to that date (no look-ahead bias).
-
-    5 signals:
-    1. Fed Balance Sheet (WALCL): expanding if growing or flat over trailing window
-    2. Reverse Repo (RRPONTSYD): easing if declining
-    3. NFCI: easing if < 0
-    4. HY Spread (BAMLH0A0HYM2): easing if narrowing
-    5. SOFR: easing if stable/declining
+    series_id = CPI_SERIES.get(country)
+    if series_id not in series and (vintages is None or series_id not in vintages):
+        return None
+
+    if series_id in INFLATION_RATE_SERIES:
+        # Already an inflation rate (%) — use directly
+        n, latest = _latest(series, vintages, series_id, grid, False)
+        return n >= 1, latest
+    # CPI index — YoY at the series' frequency (NaN until a year of data)
+    n, yoy = _latest(series, vintages, series_id, grid, True)
+    return n >= 2, yoy
+
+
+def growth_states(series, country: str, grid: np.ndarray, vintages: VintageStore | None = None) -> np.ndarray:
+    """Growth state ("high"/"low") on each grid date from the GDP data available then."""
+    states = np.full(len(grid), "low", dtype=object)
+    metric = growth_metric(series, country, grid, vintages)
+    if metric is None:
+        return states  # default: conservative when data missing
+
+    ok, growth = metric
+    states[ok & (growth > GROWTH_THRESHOLDS.get(country, 2.0))] = "high"
+    return states
+
+
+def inflation_states(series, country: str, grid: np.ndarray, vintages: VintageStore | None = None) -> np.ndarray:
+    """Inflation state ("high"/"low") on each grid date from YoY CPI available then."""
+    states = np.full(len(grid), "low", dtype=object)
+    metric = inflation_metric(series, country, grid, vintages)
+    if metric is None:
+        return states
+
+    ok, inflation = metric
+    states[ok & (inflation > INFLATION_THRESHOLDS.get(country, 2.5))] = "high"
+    return states
+
+
+def init_watermark_table(conn: sqlite3.Connection):
+    """Create regime_watermarks table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regime_watermarks (
+            country TEXT PRIMARY KEY,
+            last_month TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+
+
+def init_regime_source_column(conn: sqlite3.Connection):
+    """Add regimes.source ('live' or 'historical') if it doesn't exist.
+
+    The column may also have been added by start.mjs. Until this script has
+    marked any row, month-start rows up to each country's watermark (all of
+    them without one) were written by it and are marked historical.
     """
-    easing_count = 0
-    total_signals = 0
-
-    # Load all liquidity series once
-    series_configs = [
-        ("WALCL", "fed_balance_sheet", 12),
-        ("RRPONTSYD", "reverse_repo", 12),
-        ("NFCI", "nfci", 4),
-        ("BAMLH0A0HYM2", "hy_spread", 12),
-        ("SOFR", "sofr", 12),
-    ]
-
-    for series_id, signal_name, lookback in series_configs:
-        df = load_series(conn, series_id)
-        if df.empty:
-            continue
-
-        available = df[df.index <= target_date]
-        if len(available) < 2:
-            continue
-
-        # Get the most recent 'lookback' observations
-        window = available.tail(lookback)
-        recent = window.iloc[-1]["value"]
-        older = window.iloc[0]["value"]
-
-        if signal_name == "nfci":
-            # NFCI: negative = easing
-            direction = "easing" if recent < 0 else "tightening"
-        elif signal_name == "reverse_repo":
-            # Declining RRP = liquidity releasing
-            direction = "easing" if recent <= older else "tightening"
-        elif signal_name == "fed_balance_sheet":
-            # Growing or flat (within 1%) = easing
-            direction = "easing" if recent >= older * 0.99 else "tightening"
-        elif signal_name == "hy_spread":
-            # Narrowing spread = easing
-            direction = "easing" if recent <= older else "tightening"
-        elif signal_name == "sofr":
-            # Stable/declining = easing
-            direction = "easing" if recent <= older else "tightening"
-        else:
-            continue
-
-        total_signals += 1
-        if direction == "easing":
-            easing_count += 1
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(regimes)")}
+    if "source" not in columns:
+        conn.execute("ALTER TABLE regimes ADD COLUMN source TEXT NOT NULL DEFAULT 'live'")
+    if conn.execute("SELECT 1 FROM regimes WHERE source = 'historical' LIMIT 1").fetchone():
+        return
+    conn.execute("""
+        UPDATE regimes SET source = 'historical'
+        WHERE substr(date, 9, 2) = '01'
+          AND date <= COALESCE(
+              (SELECT last_month FROM regime_watermarks w WHERE w.country = regimes.country), '9999-12-31')
+    """)
 
-    if total_signals == 0:
-        return "expanding"  # default fallback
 
-    # 3-of-5 rule (or majority if fewer signals available)
-    threshold = max(3, (total_signals + 1) // 2)
-    return "expanding" if easing_count >= threshold else "contracting"
+def load_watermarks(conn: sqlite3.Connection) -> dict[str, str]:
+    """Last computed month per country."""
+    return dict(conn.execute("SELECT country, last_month FROM regime_watermarks").fetchall())
 
 
-def compute_historical_regimes():
+def compute_historical_regimes(
+    full_rebuild: bool = False,
+    revision_months: int = REVISION_MONTHS,
+    point_in_time: bool = False,
+):
     """
-    Walk through history month-by-month and compute regimes for each country.
+    Compute regimes for each country on the first of every month.
     Stores results in the regimes table.
+
+    Incremental by default: per country, only months after its watermark are
+    computed, plus the last `revision_months` before it so FRED revisions are
+    picked up. full_rebuild recomputes every month and first removes all
+    historical rows. Rows written by determine_regime (source 'live') are
+    never replaced, including ones dated on the first of a month.
+    point_in_time uses GDP/CPI vintages as published on each month.
     """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-
-    # Clear existing historical regimes (keep running fresh)
-    cursor.execute("DELETE FROM regimes")
-    print("Cleared existing regime data.")
+    init_watermark_table(conn)
+    init_regime_source_column(conn)
 
     # Determine date range from available economic data
     cursor.execute("SELECT MIN(date), MAX(date) FROM economic_data")
@@ -199,58 +224,114 @@ def compute_historical_regimes():
     # Start from 13 months after data start (need 12 months for YoY CPI)
     regime_start = data_start + pd.DateOffset(months=13)
     # Generate monthly dates (first of each month)
-    dates = pd.date_range(start=regime_start, end=data_end, freq="MS")
-
-    total_entries = 0
-    regime_counts = {}
+    all_dates = pd.date_range(start=regime_start, end=data_end, freq="MS")
 
-    print(f"Computing regimes from {regime_start.strftime('%Y-%m-%d')} to {data_end.strftime('%Y-%m-%d')}")
-    print(f"Total months to process: {len(dates)}")
-    print()
+    # First month to compute per country
+    watermarks = {} if full_rebuild else load_watermarks(conn)
+    first_month = {}
+    for country in COUNTRIES:
+        if country in watermarks:
+            first_month[country] = max(
+                pd.Timestamp(watermarks[country]) - pd.DateOffset(months=revision_months),
+                all_dates[0] if len(all_dates) else regime_start,
+            )
+        else:
+            first_month[country] = regime_start
 
-    for dt in dates:
-        # Compute liquidity (US-based, shared across countries)
-        liquidity = compute_liquidity_at_date(conn, dt)
+    dates = all_dates[all_dates >= min(first_month.values())]
+    grid = dates.to_numpy(dtype="datetime64[D]")
+    date_strs = [d.strftime("%Y-%m-%d") for d in dates]
 
-        for country in COUNTRIES:
-            growth = compute_growth_at_date(conn, country, dt)
-            inflation = compute_inflation_at_date(conn, country, dt)
+    if full_rebuild:
+        # Clear historical regimes; keep live rows from determine_regime
+        cursor.execute("DELETE FROM regimes WHERE source = 'historical'")
+        cursor.execute("DELETE FROM regime_watermarks")
+        print("Cleared existing historical regime data.")
 
-            regime_name = derive_regime_name(growth, inflation, liquidity)
+    mode = "Full rebuild" if full_rebuild else f"Incremental (revision window {revision_months} months)"
+    print(f"{mode}: computing regimes from {dates[0].strftime('%Y-%m-%d') if len(dates) else '-'} "
+          f"to {data_end.strftime('%Y-%m-%d')}")
+    print(f"Total months to process: {len(dates)}")
+    print()
+    if len(dates) == 0:
+        conn.close()
+        return
 
-            date_str = dt.strftime("%Y-%m-%d")
-            cursor.execute(
-                """INSERT INTO regimes (date, growth_state, inflation_state, liquidity_state, regime_name, country)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (date_str, growth, inflation, liquidity, regime_name, country),
-            )
-            total_entries += 1
+    series = load_all_series(
+        conn,
+        [*GROWTH_SERIES.values(), *CPI_SERIES.values(), *(s["series_id"] for s in LIQUIDITY_SIGNALS)],
+    )
 
-            # Track regime counts
-            key = f"{country}:{regime_name}"
-            regime_counts[key] = regime_counts.get(key, 0) + 1
+    vintages = None
+    if point_in_time:
+        vintages = VintageStore.load(conn, [*GROWTH_SERIES.values(), *CPI_SERIES.values()])
+        print(f"Point-in-time mode: vintages for {len(vintages.series)} series\n")
 
-        # Print progress every quarter
-        if dt.month in (1, 4, 7, 10):
-            us_growth = compute_growth_at_date(conn, "US", dt)
-            us_inflation = compute_inflation_at_date(conn, "US", dt)
-            us_regime = derive_regime_name(us_growth, us_inflation, liquidity)
-            print(f"  {date_str}: US regime={us_regime} (G={us_growth}, I={us_inflation}, L={liquidity})")
+    # Liquidity is US-based, shared across countries; its signal history is refreshed too
+    engine = LiquidityEngine(series)
+    liquidity, _, _ = engine.states(grid)
+    engine.store(conn, since=None if full_rebuild else date_strs[0])
 
+    rows = []
+    regime_counts = {}
+    now = datetime.now().isoformat()
+    for country in COUNTRIES:
+        k0 = int(np.searchsorted(grid, np.datetime64(first_month[country].date())))
+        growth = growth_states(series, country, grid[k0:], vintages)
+        inflation = inflation_states(series, country, grid[k0:], vintages)
+        names = [derive_regime_name(g, i, l) for g, i, l in zip(growth, inflation, liquidity[k0:])]
+        rows.extend(zip(date_strs[k0:], growth, inflation, liquidity[k0:], names, [country] * len(names)))
+        counts = {}
+        for name in names:
+            counts[name] = counts.get(name, 0) + 1
+        regime_counts[country] = counts
+
+        if country == "US":
+            # Quarterly progress
+            for k, dt in enumerate(dates[k0:]):
+                if dt.month in (1, 4, 7, 10):
+                    print(f"  {date_strs[k0 + k]}: US regime={names[k]} "
+                          f"(G={growth[k]}, I={inflation[k]}, L={liquidity[k0 + k]})")
+
+    # Months that already have a live row keep it
+    live = set(cursor.execute(
+        "SELECT date, country FROM regimes WHERE source = 'live' AND substr(date, 9, 2) = '01'"
+    ).fetchall())
+    rows = [r for r in rows if (r[0], r[5]) not in live]
+    cursor.executemany(
+        """INSERT OR REPLACE INTO regimes
+           (date, growth_state, inflation_state, liquidity_state, regime_name, country, source)
+           VALUES (?, ?, ?, ?, ?, ?, 'historical')""",
+        rows,
+    )
+    cursor.executemany(
+        "INSERT OR REPLACE INTO regime_watermarks (country, last_month, updated_at) VALUES (?, ?, ?)",
+        [(country, date_strs[-1], now) for country in COUNTRIES],
+    )
     conn.commit()
     conn.close()
 
-    print(f"\nTotal regime entries created: {total_entries}")
-    print(f"\n=== Regime Distribution ===")
+    print(f"\nTotal regime entries written: {len(rows)}")
+    print(f"\n=== Regime Distribution (computed months) ===")
     for country in COUNTRIES:
         print(f"\n  {country}:")
-        country_regimes = {k.split(":")[1]: v for k, v in regime_counts.items() if k.startswith(f"{country}:")}
-        for regime, count in sorted(country_regimes.items(), key=lambda x: -x[1]):
-            pct = count / len(dates) * 100
+        months = sum(regime_counts[country].values())
+        for regime, count in sorted(regime_counts[country].items(), key=lambda x: -x[1]):
+            pct = count / months * 100
             print(f"    {regime}: {count} months ({pct:.0f}%)")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute historical monthly regimes")
+    parser.add_argument("--full", action="store_true", help="Recompute every month from the start of the data")
+    parser.add_argument("--revision-months", type=int, default=REVISION_MONTHS,
+                        help="Months before each watermark to recompute (FRED revisions)")
+    parser.add_argument("--point-in-time", action="store_true",
+                        help="Use GDP/CPI values as first published (economic_data_vintages); use with --full")
+    args = parser.parse_args()
+
     print("=== Computing Historical Regimes ===\n")
-    compute_historical_regimes()
+    compute_historical_regimes(
+        full_rebuild=args.full, revision_months=args.revision_months, point_in_time=args.point_in_time,
+    )
     print("\nDone! Run the backtest again to see regime variation.")
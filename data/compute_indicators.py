@@ -1,9 +1,11 @@
 """Compute derived indicators (YoY, moving averages, thresholds) from raw economic data."""
 
 import sqlite3
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from config import DB_PATH
+from macro_panel import load_panel
 from regime_utils import (
     GROWTH_RATE_SERIES,
     INFLATION_RATE_SERIES,
@@ -15,150 +17,189 @@ from regime_utils import (
 )
 
 
-def compute_yoy(values: pd.Series) -> pd.Series:
-    """Compute Year-over-Year percentage change."""
-    return values.pct_change(periods=12) * 100  # Monthly data, 12 months back
-
-
-def compute_growth_indicator(conn, country: str):
-    """Compute growth state (high/low) for a country."""
-    cursor = conn.cursor()
-
-    series_id = GROWTH_SERIES.get(country)
-    if not series_id:
-        print(f"  {country}: No growth series configured")
-        return None
-
-    cursor.execute(
-        """SELECT date, value FROM economic_data
-           WHERE series_id = ? AND country = ?
-           ORDER BY date ASC""",
-        (series_id, country),
-    )
-    rows = cursor.fetchall()
-
-    if not rows:
-        # Fallback: try fetching without country filter (some series are not tagged)
-        cursor.execute(
-            """SELECT date, value FROM economic_data
-               WHERE series_id = ?
-               ORDER BY date ASC""",
-            (series_id,),
+# axis → (indicator name, series per country, thresholds, default threshold)
+INDICATORS = {
+    "growth": ("gdp_growth", GROWTH_SERIES, GROWTH_THRESHOLDS, 2.0),
+    "inflation": ("cpi_yoy", CPI_SERIES, INFLATION_THRESHOLDS, 2.5),
+}
+
+
+def init_indicator_history_table(conn: sqlite3.Connection):
+    """Create indicator_history table if it doesn't exist.
+
+    computed_indicators keeps the latest value per (country, axis); this table
+    holds every derived point, indexed for per-(country, axis) date range reads.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indicator_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            indicator_name TEXT NOT NULL,
+            country TEXT NOT NULL,
+            axis TEXT NOT NULL,
+            date TEXT NOT NULL,
+            value REAL NOT NULL,
+            updated_at TEXT NOT NULL
         )
-        rows = cursor.fetchall()
-
-    if len(rows) < 2:
-        print(f"  {country}: Insufficient growth data for {series_id} ({len(rows)} rows)")
-        return None
-
-    df = pd.DataFrame(rows, columns=["date", "value"])
-    threshold = GROWTH_THRESHOLDS.get(country, 2.0)
-
-    if series_id in GROWTH_RATE_SERIES:
-        # Already a growth rate (%) — use directly
-        latest_value = df.iloc[-1]["value"]
-        latest_date = df.iloc[-1]["date"]
-    else:
-        # GDP level — compute QoQ annualized growth
-        df["growth"] = df["value"].pct_change(periods=4) * 100
-        valid = df.dropna(subset=["growth"])
-        if valid.empty:
-            print(f"  {country}: Cannot compute QoQ growth for {series_id}")
-            return None
-        latest_value = valid.iloc[-1]["growth"]
-        latest_date = valid.iloc[-1]["date"]
-
-    state = "high" if latest_value > threshold else "low"
-
-    cursor.execute(
-        """INSERT OR REPLACE INTO computed_indicators
-           (indicator_name, date, value, country, axis)
-           VALUES (?, ?, ?, ?, ?)""",
-        ("gdp_growth", latest_date, float(latest_value), country, "growth"),
+    """)
+    conn.execute(
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_indicator_history_unique
+           ON indicator_history (country, axis, date)"""
     )
 
-    print(f"  {country}: GDP growth = {latest_value:.2f}% (threshold={threshold}%) → {state}")
-    return state
-
 
-def compute_inflation_indicator(conn, country: str):
-    """Compute inflation state (high/low) for a country."""
-    cursor = conn.cursor()
+def store_indicator_history(conn: sqlite3.Connection, history: pd.DataFrame) -> int:
+    """Upsert derived points (columns: indicator_name, country, axis, date, value).
+
+    Each point is matched against its stored row through the unique
+    (country, axis, date) index; only new points and points whose value
+    changed are written, without reading the table. Returns the number of
+    rows written.
+    """
+    init_indicator_history_table(conn)
+    now = datetime.now().isoformat()
+    before = conn.total_changes
+    conn.executemany(
+        """INSERT INTO indicator_history (indicator_name, country, axis, date, value, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT (country, axis, date) DO UPDATE SET
+               indicator_name = excluded.indicator_name,
+               value = excluded.value,
+               updated_at = excluded.updated_at
+           WHERE abs(excluded.value - indicator_history.value) > 1e-12 * abs(indicator_history.value)""",
+        [
+            (*row, now)
+            for row in history[["indicator_name", "country", "axis", "date", "value"]].itertuples(index=False)
+        ],
+    )
+    return conn.total_changes - before
+
+
+def load_indicator_history(
+    conn: sqlite3.Connection,
+    country: str,
+    axis: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> pd.DataFrame:
+    """Indicator history (date, value) for one country and axis within [start_date, end_date]."""
+    return pd.read_sql_query(
+        """SELECT date, value FROM indicator_history
+           WHERE country = ? AND axis = ? AND date >= ? AND date <= ?
+           ORDER BY date""",
+        conn,
+        params=(country, axis, start_date or "", end_date or "9999-12-31"),
+    )
 
-    series_id = CPI_SERIES.get(country)
-    if not series_id:
-        print(f"  {country}: No CPI series configured")
-        return None
 
-    cursor.execute(
-        """SELECT date, value FROM economic_data
-           WHERE series_id = ? AND country = ?
-           ORDER BY date ASC""",
-        (series_id, country),
+def load_indicator_data(conn) -> pd.DataFrame:
+    """Observations of every configured growth and CPI series, from the macro panel.
+
+    Returns columns target (country the indicator is for), axis, series_id,
+    date (YYYY-MM-DD), value and yoy (the panel's YoY at the series' detected
+    frequency); sorted by date within each (target, axis). Each configured
+    series belongs to one country, so the country tag of economic_data rows
+    isn't needed to pick them.
+    """
+    panel = load_panel(conn)
+    frames = []
+    for axis, (_, series_map, _, _) in INDICATORS.items():
+        for country in COUNTRIES:
+            series_id = series_map.get(country)
+            if not series_id or series_id not in panel.index:
+                continue
+            dates, values, yoy = panel.observations(series_id)
+            frames.append(pd.DataFrame({
+                "target": country,
+                "axis": axis,
+                "series_id": series_id,
+                "date": np.datetime_as_string(dates, unit="D"),
+                "value": values,
+                "yoy": yoy,
+            }))
+    if not frames:
+        return pd.DataFrame(columns=["target", "axis", "series_id", "date", "value", "yoy"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def compute_indicator_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the indicator value of every row: growth rate (%) or CPI YoY (%).
+
+    Rate series are used directly; GDP levels and CPI indices use the panel's
+    YoY change. Also adds n_obs (rows in the group) and min_obs (rows needed
+    for a valid indicator).
+    """
+    is_growth = (df["axis"] == "growth").to_numpy()
+    is_rate = np.where(
+        is_growth,
+        df["series_id"].isin(GROWTH_RATE_SERIES),
+        df["series_id"].isin(INFLATION_RATE_SERIES),
     )
-    rows = cursor.fetchall()
-
-    if not rows:
-        # Fallback: try without country filter
-        cursor.execute(
-            """SELECT date, value FROM economic_data
-               WHERE series_id = ?
-               ORDER BY date ASC""",
-            (series_id,),
-        )
-        rows = cursor.fetchall()
-
-    threshold = INFLATION_THRESHOLDS.get(country, 2.5)
-
-    if series_id in INFLATION_RATE_SERIES:
-        # Already inflation rate (%) — use directly, no YoY computation needed
-        if len(rows) < 1:
-            print(f"  {country}: No inflation data for {series_id}")
-            return None
-        df = pd.DataFrame(rows, columns=["date", "value"])
-        latest_value = df.iloc[-1]["value"]
-        latest_date = df.iloc[-1]["date"]
-    else:
-        # CPI index — compute YoY
-        if len(rows) < 13:
-            print(f"  {country}: Insufficient CPI data for {series_id} ({len(rows)} rows, need 13+)")
-            return None
-
-        df = pd.DataFrame(rows, columns=["date", "value"])
-        df["yoy"] = compute_yoy(df["value"])
-
-        valid = df.dropna(subset=["yoy"])
-        if valid.empty:
-            print(f"  {country}: Cannot compute CPI YoY for {series_id}")
-            return None
-
-        latest_value = valid.iloc[-1]["yoy"]
-        latest_date = valid.iloc[-1]["date"]
-
-    state = "high" if latest_value > threshold else "low"
-
-    cursor.execute(
-        """INSERT OR REPLACE INTO computed_indicators
-           (indicator_name, date, value, country, axis)
-           VALUES (?, ?, ?, ?, ?)""",
-        ("cpi_yoy", latest_date, float(latest_value), country, "inflation"),
+    values = df["value"].to_numpy(dtype=np.float64)
+    groups = df.groupby(["target", "axis"], sort=False)
+
+    return df.assign(
+        indicator=np.where(is_rate, values, df["yoy"].to_numpy(dtype=np.float64)),
+        n_obs=groups["value"].transform("size").to_numpy(),
+        # Growth needs 2+ rows, CPI rates 1+; YoY is NaN until a year of data
+        min_obs=np.where(is_growth, 2, np.where(is_rate, 1, 2)),
     )
 
-    print(f"  {country}: CPI YoY = {latest_value:.2f}% (threshold={threshold}%) → {state}")
-    return state
-
 
 def compute_all():
-    """Compute all indicators for all countries."""
+    """Compute all indicators for all countries.
+
+    Reads every series from the cached macro panel, takes growth/YoY per
+    series and upserts the latest value per (country, axis) in one executemany.
+    Every valid point is also kept in indicator_history (new/changed rows only).
+    Returns {country: {"growth": state, "inflation": state}}.
+    """
     conn = sqlite3.connect(DB_PATH)
-    results = {}
 
     print("=== Computing Indicators ===")
-    for country in COUNTRIES:
-        growth = compute_growth_indicator(conn, country)
-        inflation = compute_inflation_indicator(conn, country)
-        results[country] = {"growth": growth, "inflation": inflation}
+    df = compute_indicator_values(load_indicator_data(conn))
+    valid = df[(df["n_obs"] >= df["min_obs"]) & df["indicator"].notna()]
+    latest = valid.groupby(["target", "axis"], sort=False).tail(1).set_index(["target", "axis"])
+    counts = df.groupby(["target", "axis"]).size()
 
+    results = {}
+    rows = []
+    for country in COUNTRIES:
+        results[country] = {}
+        for axis, (indicator_name, series_map, thresholds, default) in INDICATORS.items():
+            results[country][axis] = None
+            series_id = series_map.get(country)
+            label = "GDP growth" if axis == "growth" else "CPI YoY"
+            if not series_id:
+                print(f"  {country}: No {'growth' if axis == 'growth' else 'CPI'} series configured")
+                continue
+            if (country, axis) not in latest.index:
+                n = int(counts.get((country, axis), 0))
+                print(f"  {country}: Cannot compute {label} for {series_id} ({n} rows)")
+                continue
+
+            row = latest.loc[(country, axis)]
+            threshold = thresholds.get(country, default)
+            state = "high" if row["indicator"] > threshold else "low"
+            rows.append((indicator_name, row["date"], float(row["indicator"]), country, axis))
+            results[country][axis] = state
+            print(f"  {country}: {label} = {row['indicator']:.2f}% (threshold={threshold}%) → {state}")
+
+    history = pd.DataFrame({
+        "indicator_name": valid["axis"].map({axis: spec[0] for axis, spec in INDICATORS.items()}),
+        "country": valid["target"],
+        "axis": valid["axis"],
+        "date": valid["date"],
+        "value": valid["indicator"].astype(float),
+    })
+    written = store_indicator_history(conn, history)
+    print(f"  Indicator history: {written} new/changed of {len(history)} points")
+
+    conn.executemany(
+        """INSERT OR REPLACE INTO computed_indicators
+           (indicator_name, date, value, country, axis)
+           VALUES (?, ?, ?, ?, ?)""",
+        rows,
+    )
     conn.commit()
     conn.close()
     return results
@@ -104,3 +104,13 @@ REGIME_ALLOCATIONS = {
     # Low growth + Low inflation + Contracting liquidity → safety, long bonds + cash
     "deflation_crisis":        {"stocks": 5,  "bonds": 40, "realestate": 2,  "commodities": 8,  "crypto": 2,  "cash": 43},
 }
+
+# Risk adjustment (1=conservative, 5=aggressive): per-class multipliers applied
+# to the regime template before re-normalizing to 100%
+RISK_MULTIPLIERS = {
+    1: {"stocks": 0.6, "bonds": 1.4, "realestate": 0.7, "commodities": 0.8, "crypto": 0.3, "cash": 1.5},
+    2: {"stocks": 0.8, "bonds": 1.2, "realestate": 0.85, "commodities": 0.9, "crypto": 0.6, "cash": 1.3},
+    3: {"stocks": 1.0, "bonds": 1.0, "realestate": 1.0, "commodities": 1.0, "crypto": 1.0, "cash": 1.0},
+    4: {"stocks": 1.2, "bonds": 0.8, "realestate": 1.15, "commodities": 1.1, "crypto": 1.4, "cash": 0.7},
+    5: {"stocks": 1.4, "bonds": 0.6, "realestate": 1.3, "commodities": 1.2, "crypto": 1.8, "cash": 0.5},
+}
@@ -2,12 +2,12 @@
 
 import sqlite3
 from datetime import datetime
+import numpy as np
 from config import DB_PATH
+from liquidity_engine import LiquidityEngine, last_stored_date
 from regime_utils import (
     REGIME_NAMES,
     derive_regime_name,
-    LIQUIDITY_SIGNALS,
-    MIN_EASING_FOR_EXPANDING,
     COUNTRIES,
 )
 
@@ -17,102 +17,20 @@ def assess_liquidity(conn) -> str:
     Assess liquidity state using "3-of-5" rule.
     Returns 'expanding' or 'contracting'.
 
-    5 signals:
-    1. Fed Balance Sheet: expanding if growing or QT slowing
-    2. Reserves/Repo: stable if reverse repo declining normally
-    3. NFCI: easing if < 0 and moving more negative
-    4. Credit Spreads: easing if HY spread narrowing
-    5. SOFR: normal if stable, not spiking
+    Signals and their easing rules come from LIQUIDITY_SIGNALS (see
+    liquidity_engine). Snapshots since the last stored date, plus today's,
+    are written to liquidity_signals.
     """
-    cursor = conn.cursor()
-    easing_count = 0
-    signals = []
+    engine = LiquidityEngine.load(conn)
+    today = np.datetime64(datetime.now().strftime("%Y-%m-%d"), "D")
+    engine.store(conn, since=last_stored_date(conn), extra_dates=[today])
 
-    # Signal 1: Fed Balance Sheet (WALCL) - expanding if recent trend up or flat
-    cursor.execute(
-        """SELECT value FROM economic_data
-           WHERE series_id = 'WALCL' ORDER BY date DESC LIMIT 12""",
-    )
-    rows = cursor.fetchall()
-    if len(rows) >= 2:
-        recent = rows[0][0]
-        older = rows[-1][0]
-        direction = "easing" if recent >= older * 0.99 else "tightening"
-        if direction == "easing":
-            easing_count += 1
-        signals.append(("fed_balance_sheet", direction, recent))
-
-    # Signal 2: Reverse Repo (RRPONTSYD) - declining RRP = liquidity releasing
-    cursor.execute(
-        """SELECT value FROM economic_data
-           WHERE series_id = 'RRPONTSYD' ORDER BY date DESC LIMIT 12""",
-    )
-    rows = cursor.fetchall()
-    if len(rows) >= 2:
-        recent = rows[0][0]
-        older = rows[-1][0]
-        direction = "easing" if recent <= older else "tightening"
-        if direction == "easing":
-            easing_count += 1
-        signals.append(("reverse_repo", direction, recent))
-
-    # Signal 3: NFCI - negative = easing, positive = tightening
-    cursor.execute(
-        """SELECT value FROM economic_data
-           WHERE series_id = 'NFCI' ORDER BY date DESC LIMIT 4""",
-    )
-    rows = cursor.fetchall()
-    if rows:
-        latest_nfci = rows[0][0]
-        direction = "easing" if latest_nfci < 0 else "tightening"
-        if direction == "easing":
-            easing_count += 1
-        signals.append(("nfci", direction, latest_nfci))
-
-    # Signal 4: HY Spread (BAMLH0A0HYM2) - narrowing = easing
-    cursor.execute(
-        """SELECT value FROM economic_data
-           WHERE series_id = 'BAMLH0A0HYM2' ORDER BY date DESC LIMIT 12""",
-    )
-    rows = cursor.fetchall()
-    if len(rows) >= 2:
-        recent = rows[0][0]
-        older = rows[-1][0]
-        direction = "easing" if recent <= older else "tightening"
-        if direction == "easing":
-            easing_count += 1
-        signals.append(("hy_spread", direction, recent))
-
-    # Signal 5: SOFR - stable/declining = normal
-    cursor.execute(
-        """SELECT value FROM economic_data
-           WHERE series_id = 'SOFR' ORDER BY date DESC LIMIT 12""",
-    )
-    rows = cursor.fetchall()
-    if len(rows) >= 2:
-        recent = rows[0][0]
-        older = rows[-1][0]
-        direction = "easing" if recent <= older else "tightening"
-        if direction == "easing":
-            easing_count += 1
-        signals.append(("sofr", direction, recent))
-
-    # Store signals
-    now = datetime.now().strftime("%Y-%m-%d")
-    for signal_name, direction, value in signals:
-        cursor.execute(
-            """INSERT OR REPLACE INTO liquidity_signals (date, signal_name, direction, raw_value)
-               VALUES (?, ?, ?, ?)""",
-            (now, signal_name, direction, value),
-        )
-
-    # 3-of-5 rule
-    total_signals = len(signals)
-    if total_signals == 0:
+    states, easing_count, total_signals = engine.states([today])
+    if total_signals[0] == 0:
         return "expanding"  # Default fallback
 
-    liquidity_state = "expanding" if easing_count >= MIN_EASING_FOR_EXPANDING else "contracting"
-    print(f"  Liquidity: {easing_count}/{total_signals} easing signals -> {liquidity_state}")
+    liquidity_state = states[0]
+    print(f"  Liquidity: {easing_count[0]}/{total_signals[0]} easing signals -> {liquidity_state}")
     return liquidity_state
 
 
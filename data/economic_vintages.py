@@ -0,0 +1,194 @@
+"""Vintage (bitemporal) storage for economic data.
+
+economic_data keeps only the latest value per observation date. Revised
+series (GDP, CPI, ...) also get every published value in
+economic_data_vintages, each valid for [realtime_start, realtime_end] as
+in FRED/ALFRED. Vintages come from ALFRED (get_series_all_releases) or from
+regular fetches, where a changed value opens a new vintage dated the fetch day.
+
+VintageStore answers "value of series X for observation date d as known on
+date D" for whole vectors of (d, D) with one searchsorted over a composite
+(date, realtime_start) key, and "latest observation known on D" with a
+running max over first-release dates.
+"""
+
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+OPEN_END = "9999-12-31"
+
+
+def init_vintage_table(conn: sqlite3.Connection):
+    """Create economic_data_vintages table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS economic_data_vintages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            series_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            value REAL NOT NULL,
+            realtime_start TEXT NOT NULL,
+            realtime_end TEXT NOT NULL DEFAULT '9999-12-31',
+            country TEXT NOT NULL,
+            category TEXT NOT NULL,
+            fetched_at TEXT NOT NULL
+        )
+    """)
+    conn.execute(
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_economic_data_vintages_unique
+           ON economic_data_vintages (series_id, date, realtime_start)"""
+    )
+
+
+def _days(dates) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+class SeriesVintages:
+    """All vintages of one series, sorted by (date, realtime_start)."""
+
+    def __init__(self, dates: np.ndarray, starts: np.ndarray, ends: np.ndarray, values: np.ndarray):
+        self.dates = dates  # int days since epoch
+        self.starts = starts
+        self.ends = ends
+        self.values = values
+        # Composite key: observation date, then vintage start
+        self._span = int(max(ends.max(initial=0), starts.max(initial=0))) + 2
+        self._key = dates * self._span + starts
+
+        # First release of each observation date, and the latest date released by then
+        self.obs_dates, first = np.unique(dates, return_index=True)
+        order = np.argsort(starts[first], kind="stable")
+        self._release = starts[first][order]
+        self._latest = np.maximum.accumulate(self.obs_dates[order])
+
+    def values_as_of(self, dates, known_on) -> np.ndarray:
+        """Value for each observation date as known on the matching known_on date (NaN if unknown)."""
+        dates, known_on = np.broadcast_arrays(_days(dates), _days(known_on))
+        i = np.searchsorted(self._key, dates * self._span + known_on, side="right") - 1
+        j = np.maximum(i, 0)
+        hit = (i >= 0) & (self.dates[j] == dates) & (self.starts[j] <= known_on) & (self.ends[j] >= known_on)
+        return np.where(hit, self.values[j], np.nan)
+
+    def count_as_of(self, known_on) -> np.ndarray:
+        """Number of observation dates released on or before each known_on date."""
+        return np.searchsorted(self._release, _days(known_on), side="right")
+
+    def latest_as_of(self, known_on) -> tuple[np.ndarray, np.ndarray]:
+        """Latest released observation date on each known_on date and its value then.
+
+        Returns (index into obs_dates, value); index -1 / NaN when nothing was released yet.
+        """
+        known_on = _days(known_on)
+        n = np.searchsorted(self._release, known_on, side="right")
+        latest = np.where(n > 0, self._latest[np.maximum(n - 1, 0)], -1)
+        idx = np.where(n > 0, np.searchsorted(self.obs_dates, latest), -1)
+        values = np.where(n > 0, self.values_as_of(latest, known_on), np.nan)
+        return idx, values
+
+
+class VintageStore:
+    """Vintages of several series, loaded with one query."""
+
+    def __init__(self, series: dict[str, SeriesVintages]):
+        self.series = series
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, series_ids: list[str]) -> "VintageStore":
+        init_vintage_table(conn)
+        placeholders = ",".join("?" * len(series_ids))
+        df = pd.read_sql_query(
+            f"""SELECT series_id, date, realtime_start, realtime_end, value
+                FROM economic_data_vintages WHERE series_id IN ({placeholders})
+                ORDER BY series_id, date, realtime_start""",
+            conn,
+            params=list(series_ids),
+        )
+        series = {}
+        for series_id, g in df.groupby("series_id", sort=False):
+            series[series_id] = SeriesVintages(
+                _days(g["date"].to_numpy(dtype=str)),
+                _days(g["realtime_start"].to_numpy(dtype=str)),
+                _days(g["realtime_end"].to_numpy(dtype=str)),
+                g["value"].to_numpy(dtype=np.float64),
+            )
+        return cls(series)
+
+    def __contains__(self, series_id: str) -> bool:
+        return series_id in self.series
+
+    def __getitem__(self, series_id: str) -> SeriesVintages:
+        return self.series[series_id]
+
+
+def _refresh_realtime_end(conn: sqlite3.Connection, series_id: str):
+    """Close each vintage the day before the next vintage of the same observation starts."""
+    df = pd.read_sql_query(
+        """SELECT id, date, realtime_start, realtime_end FROM economic_data_vintages
+           WHERE series_id = ? ORDER BY date, realtime_start""",
+        conn,
+        params=(series_id,),
+    )
+    if df.empty:
+        return
+    next_start = df.groupby("date")["realtime_start"].shift(-1)
+    ends = (pd.to_datetime(next_start) - pd.Timedelta(days=1)).dt.strftime("%Y-%m-%d").fillna(OPEN_END)
+    changed = ends != df["realtime_end"]
+    conn.executemany(
+        "UPDATE economic_data_vintages SET realtime_end = ? WHERE id = ?",
+        list(zip(ends[changed], df["id"][changed].astype(int).tolist())),
+    )
+
+
+def store_vintages(
+    conn: sqlite3.Connection,
+    series_id: str,
+    observations: pd.DataFrame,
+    country: str,
+    category: str,
+) -> int:
+    """Store observations (columns: date, realtime_start, value) as vintages.
+
+    Rows whose value equals the vintage already in effect on their
+    realtime_start are skipped, so re-fetching unrevised data adds nothing.
+    Returns the number of new vintages.
+    """
+    init_vintage_table(conn)
+    obs = observations.dropna(subset=["value"])
+    if obs.empty:
+        return 0
+    obs = pd.DataFrame({
+        "date": obs["date"].astype(str).str[:10],
+        "realtime_start": obs["realtime_start"].astype(str).str[:10],
+        "value": obs["value"].astype(np.float64),
+    }).sort_values(["date", "realtime_start"], kind="stable")
+    # Consecutive vintages of the same observation with an unchanged value add nothing
+    same = (obs["date"] == obs["date"].shift()) & (obs["value"] == obs["value"].shift())
+    obs = obs[~same]
+    dates = obs["date"].to_numpy()
+    starts = obs["realtime_start"].to_numpy()
+    values = obs["value"].to_numpy()
+
+    current = VintageStore.load(conn, [series_id])
+    if series_id in current:
+        known = current[series_id].values_as_of(dates, starts)
+        new = ~np.isclose(known, values, rtol=1e-12, atol=0.0) | np.isnan(known)
+    else:
+        new = np.ones(len(values), dtype=bool)
+    if not new.any():
+        return 0
+
+    now = datetime.now().isoformat()
+    conn.executemany(
+        """INSERT OR REPLACE INTO economic_data_vintages
+           (series_id, date, value, realtime_start, country, category, fetched_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (series_id, d, float(v), s, country, category, now)
+            for d, s, v in zip(dates[new], starts[new], values[new])
+        ],
+    )
+    _refresh_realtime_end(conn, series_id)
+    return int(new.sum())
@@ -1,66 +1,242 @@
-"""Fetch economic data from FRED API and store in SQLite."""
+"""Fetch economic data from FRED API and store in SQLite.
 
+Ingestion is incremental: fred_watermarks keeps the last observation date of
+each series, and a run only requests observations from that date minus a
+revision lookback (so recent revisions are picked up). Only new or changed
+values are written. Series without a watermark, and explicit backfills, pull
+the full history.
+
+Usage:
+    python fetch_fred.py                          # incremental update
+    python fetch_fred.py --lookback 365           # wider revision window
+    python fetch_fred.py --backfill               # full history of every series
+    python fetch_fred.py --backfill CPIAUCSL SOFR # full history of some series
+    python fetch_fred.py --vintages               # also fetch ALFRED release history
+"""
+
+import argparse
 import sqlite3
 from datetime import datetime, timedelta
-from fredapi import Fred
+import numpy as np
+import pandas as pd
 from config import FRED_API_KEY, DB_PATH, FRED_SERIES
+from bulk_writer import tune_for_writes, write_frame
+from economic_vintages import init_vintage_table, store_vintages
+from fred_client import FredClient, cache_stats, fetch_many, store_fetch_log
+
+# Categories whose values get revised after release; their history is kept as vintages
+VINTAGE_CATEGORIES = ("growth", "inflation")
+
+# Days before the watermark that are re-requested to pick up revisions
+REVISION_LOOKBACK_DAYS = 180
+
+
+def init_watermark_table(conn: sqlite3.Connection):
+    """Create fred_watermarks table if it doesn't exist.
+
+    Series already in economic_data (from before watermarks existed) are
+    seeded with their latest stored date.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fred_watermarks (
+            series_id TEXT PRIMARY KEY,
+            last_observation TEXT NOT NULL,
+            last_fetched_at TEXT NOT NULL,
+            backfilled_at TEXT
+        )
+    """)
+    conn.execute(
+        """INSERT OR IGNORE INTO fred_watermarks (series_id, last_observation, last_fetched_at)
+           SELECT series_id, MAX(substr(date, 1, 10)), MAX(fetched_at) FROM economic_data GROUP BY series_id"""
+    )
+    conn.commit()
+
+
+def observation_starts(
+    conn: sqlite3.Connection,
+    series_ids: list[str],
+    lookback_days: int = REVISION_LOOKBACK_DAYS,
+    backfill: set[str] | None = None,
+) -> dict[str, str | None]:
+    """observation_start per series: watermark minus lookback, None for full history."""
+    watermarks = dict(conn.execute("SELECT series_id, last_observation FROM fred_watermarks").fetchall())
+    starts = {}
+    for series_id in series_ids:
+        mark = watermarks.get(series_id)
+        if not mark or (backfill is not None and (not backfill or series_id in backfill)):
+            starts[series_id] = None
+        else:
+            start = datetime.strptime(mark, "%Y-%m-%d") - timedelta(days=lookback_days)
+            starts[series_id] = start.strftime("%Y-%m-%d")
+    return starts
+
+
+def changed_observations(conn: sqlite3.Connection, series_id: str, data: pd.Series) -> pd.Series:
+    """Observations that are not yet stored or whose stored value differs."""
+    data = data.dropna()
+    if data.empty:
+        return data
+    dates = data.index.strftime("%Y-%m-%d")
+    stored = pd.read_sql_query(
+        "SELECT substr(date, 1, 10) AS date, value FROM economic_data WHERE series_id = ? AND date >= ?",
+        conn,
+        params=(series_id, dates.min()),
+    ).set_index("date")["value"]
+    previous = stored.reindex(dates).to_numpy(dtype=float)
+    changed = np.isnan(previous) | ~np.isclose(data.to_numpy(dtype=float), previous, rtol=1e-12, atol=0.0)
+    return data[changed]
 
 
-def fetch_all_series():
-    """Fetch all configured FRED series and store in DB."""
+def update_watermark(conn: sqlite3.Connection, series_id: str, data: pd.Series, backfilled: bool, now: str):
+    """Advance the series' watermark to its latest fetched observation."""
+    data = data.dropna()
+    last = data.index.max().strftime("%Y-%m-%d") if len(data) else None
+    conn.execute(
+        """INSERT INTO fred_watermarks (series_id, last_observation, last_fetched_at, backfilled_at)
+           VALUES (?, COALESCE(?, ''), ?, ?)
+           ON CONFLICT (series_id) DO UPDATE SET
+               last_observation = MAX(last_observation, COALESCE(excluded.last_observation, '')),
+               last_fetched_at = excluded.last_fetched_at,
+               backfilled_at = COALESCE(excluded.backfilled_at, backfilled_at)""",
+        (series_id, last, now, now if backfilled else None),
+    )
+
+
+def fetch_all_series(
+    vintages: bool = False,
+    workers: int = 8,
+    backfill: list[str] | None = None,
+    lookback_days: int = REVISION_LOOKBACK_DAYS,
+):
+    """Fetch all configured FRED series and store in DB.
+
+    Each series is requested from its watermark minus lookback_days; series
+    without a watermark get their full history, as do all series (backfill=[])
+    or the listed ones with backfill. Only new or changed values are written.
+
+    Series are fetched concurrently (fred_client.fetch_many) under a shared
+    rate limit, with retries on 429/5xx; per-series latency and retries go to
+    fred_fetch_log. Results are written from this thread as they arrive.
+
+    Values of revised categories are also recorded in economic_data_vintages
+    (a changed value opens a vintage dated today; observations older than the
+    series' first captured one are dated by observation). With vintages=True
+    their full release history is fetched from ALFRED first.
+    """
     if not FRED_API_KEY:
         print("ERROR: FRED_API_KEY not set. Please set it in .env.local")
         return 0
 
-    fred = Fred(api_key=FRED_API_KEY)
-    conn = sqlite3.connect(DB_PATH)
+    client = FredClient(FRED_API_KEY)
+    conn = tune_for_writes(sqlite3.connect(DB_PATH))
     cursor = conn.cursor()
+    init_vintage_table(conn)
+    init_watermark_table(conn)
     total_records = 0
     now = datetime.now().isoformat()
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    configured = {
+        series_info["id"]: (country, category, series_info)
+        for country, categories in FRED_SERIES.items()
+        for category, series_list in categories.items()
+        for series_info in series_list
+    }
+    backfill_ids = None if backfill is None else set(backfill)
+    starts = observation_starts(conn, list(configured), lookback_days, backfill_ids)
+    jobs = [
+        (series_id, starts[series_id], vintages and category in VINTAGE_CATEGORIES)
+        for series_id, (_, category, _) in configured.items()
+    ]
+    full = sum(start is None for start in starts.values())
+    print(f"  Fetching {len(jobs)} series ({full} full history, {workers} workers)...")
 
-    # Fetch data for last 5 years
-    start_date = (datetime.now() - timedelta(days=5 * 365)).strftime("%Y-%m-%d")
-
-    for country, categories in FRED_SERIES.items():
-        for category, series_list in categories.items():
-            for series_info in series_list:
-                series_id = series_info["id"]
-                try:
-                    print(f"  Fetching {series_id} ({series_info['name']}) for {country}...")
-                    data = fred.get_series(series_id, observation_start=start_date)
-
-                    if data is None or data.empty:
-                        print(f"  WARNING: No data for {series_id}")
-                        continue
-
-                    # Insert data
-                    for date, value in data.items():
-                        if value is not None and str(value) != "nan":
-                            cursor.execute(
-                                """INSERT OR REPLACE INTO economic_data
-                                   (series_id, date, value, country, category, fetched_at)
-                                   VALUES (?, ?, ?, ?, ?, ?)""",
-                                (series_id, str(date.date()), float(value), country, category, now),
-                            )
-                            total_records += 1
-
-                    # Also insert/update series_config
-                    cursor.execute(
-                        """INSERT OR REPLACE INTO series_config
-                           (series_id, name, country, category, axis, is_active)
-                           VALUES (?, ?, ?, ?, ?, 1)""",
-                        (series_id, series_info["name"], country, category, category),
-                    )
-
-                except Exception as e:
-                    print(f"  ERROR fetching {series_id}: {e}")
+    results = []
+    for result in fetch_many(client, jobs, workers=workers):
+        results.append(result)
+        series_id = result.series_id
+        country, category, series_info = configured[series_id]
+        if not result.ok:
+            print(f"  ERROR fetching {series_id}: {result.error}")
+            continue
+        data = result.data
+        retries = f", {result.retries} retries" if result.retries else ""
+        since = f"since {starts[series_id]}" if starts[series_id] else "full history"
+        print(f"  {series_id} ({series_info['name']}) for {country}: "
+              f"{len(data)} obs {since} in {result.latency_ms:.0f}ms{retries}")
 
+        if data.empty:
+            print(f"  WARNING: No data for {series_id}")
+            continue
+
+        if category in VINTAGE_CATEGORIES:
+            if result.releases is not None:
+                added = store_vintages(conn, series_id, result.releases, country, category)
+                print(f"    {added} vintages from ALFRED")
+            # Observations before the first captured one (first capture or backfill,
+            # without ALFRED history): treat values as known on their date
+            first = conn.execute(
+                "SELECT MIN(date) FROM economic_data_vintages WHERE series_id = ?", (series_id,)
+            ).fetchone()[0]
+            dates = data.index.strftime("%Y-%m-%d")
+            store_vintages(
+                conn,
+                series_id,
+                pd.DataFrame({
+                    "date": dates,
+                    "realtime_start": np.where((dates < first) if first else True, dates, today),
+                    "value": data.values,
+                }),
+                country,
+                category,
+            )
+
+        # Insert new or revised values only
+        changed = changed_observations(conn, series_id, data)
+        total_records += write_frame(conn, "economic_data", pd.DataFrame({
+            "series_id": series_id,
+            "date": changed.index.strftime("%Y-%m-%d"),
+            "value": changed.to_numpy(dtype=float),
+            "country": country,
+            "category": category,
+            "fetched_at": now,
+        }))
+        update_watermark(conn, series_id, data, starts[series_id] is None, now)
+
+        # Also insert/update series_config
+        cursor.execute(
+            """INSERT OR REPLACE INTO series_config
+               (series_id, name, country, category, axis, is_active)
+               VALUES (?, ?, ?, ?, ?, 1)""",
+            (series_id, series_info["name"], country, category, category),
+        )
+
+    store_fetch_log(conn, results)
     conn.commit()
     conn.close()
-    print(f"  Total records fetched: {total_records}")
+    failed = sum(not r.ok for r in results)
+    retried = sum(r.retries for r in results)
+    print(f"  Total new/revised records: {total_records} ({failed} series failed, {retried} retries)")
+    cached = cache_stats("fred")
+    print(f"  HTTP cache: {cached['hit']} hits, {cached['revalidated']} revalidated, {cached['fetched']} fetched")
     return total_records
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch FRED series incrementally")
+    parser.add_argument("--vintages", action="store_true",
+                        help="Also fetch the ALFRED release history of growth/inflation series")
+    parser.add_argument("--backfill", nargs="*", default=None, metavar="SERIES",
+                        help="Pull full history (all series, or only those listed)")
+    parser.add_argument("--lookback", type=int, default=REVISION_LOOKBACK_DAYS,
+                        help="Days before each watermark to re-request for revisions")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
     print("=== Fetching FRED Data ===")
-    fetch_all_series()
+    fetch_all_series(
+        vintages=args.vintages,
+        workers=args.workers,
+        backfill=args.backfill,
+        lookback_days=args.lookback,
+    )
@@ -4,18 +4,23 @@ import sqlite3
 from datetime import datetime
 import feedparser
 from config import DB_PATH, RSS_FEEDS
+from http_cache import CachedSession, cache_stats
 
 
 def fetch_all_news():
     """Fetch news from all configured RSS feeds."""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
+    session = CachedSession("rss")
+    session.headers["User-Agent"] = feedparser.USER_AGENT
     total = 0
 
     for feed_config in RSS_FEEDS:
         try:
             print(f"  Fetching from {feed_config['source']}...")
-            feed = feedparser.parse(feed_config["url"])
+            response = session.get(feed_config["url"], timeout=30)
+            response.raise_for_status()
+            feed = feedparser.parse(response.content)
 
             for entry in feed.entries[:20]:  # Max 20 per source
                 title = entry.get("title", "")
@@ -57,6 +62,8 @@ def fetch_all_news():
     conn.commit()
     conn.close()
     print(f"  Total new articles: {total}")
+    cached = cache_stats("rss")
+    print(f"  HTTP cache: {cached['hit']} hits, {cached['revalidated']} revalidated, {cached['fetched']} fetched")
     return total
 
 
@@ -1,9 +1,14 @@
 """Fetch historical ETF prices from Yahoo Finance and store in SQLite."""
 
+import io
 import sqlite3
 import time
 from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
 from config import DB_PATH
+from bulk_writer import tune_for_writes, write_frame
+from http_cache import CacheMiss, ResponseCache, cache_stats, count_outcome, request_key
 
 try:
     import yfinance as yf
@@ -23,6 +28,9 @@ DEFAULT_TICKERS = [
 # Benchmark tickers
 BENCHMARK_TICKERS = ["SPY"]
 
+# Tickers per yf.download call in fetch_all_prices
+BATCH_SIZE = 50
+
 
 def init_price_table(conn: sqlite3.Connection):
     """Create historical_prices table if it doesn't exist."""
@@ -49,13 +57,157 @@ def init_price_table(conn: sqlite3.Connection):
     conn.commit()
 
 
+PRICE_COLUMNS = ["ticker", "date", "open", "high", "low", "close", "adj_close", "volume"]
+
+
+def price_frame(data: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
+    """yf.download output as historical_prices rows (one per ticker and date).
+
+    (field, ticker) multi-level columns, from one or many tickers, are split
+    by reshaping each field's (date × ticker) block; flat columns belong to
+    `ticker`. Adj Close falls back to Close when missing; rows without a
+    close (e.g. dates another ticker in the batch traded on) are dropped.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        tickers = list(dict.fromkeys(data.columns.get_level_values(-1)))
+
+        def field(name: str) -> np.ndarray:
+            block = data.xs(name, axis=1, level=0).reindex(columns=tickers)
+            return block.to_numpy(dtype=float).ravel()
+
+        fields = data.columns.get_level_values(0)
+        dates = np.repeat(data.index.strftime("%Y-%m-%d").to_numpy(), len(tickers))
+        names = np.tile(np.array(tickers, dtype=object), len(data))
+    else:
+
+        def field(name: str) -> np.ndarray:
+            return pd.to_numeric(data[name], errors="coerce").to_numpy(dtype=float)
+
+        fields = data.columns
+        dates = data.index.strftime("%Y-%m-%d").to_numpy()
+        names = np.full(len(data), ticker, dtype=object)
+
+    close = field("Close")
+    adj_close = field("Adj Close") if "Adj Close" in fields else close
+    volume = field("Volume")
+    frame = pd.DataFrame({
+        "ticker": names,
+        "date": dates,
+        "open": field("Open"),
+        "high": field("High"),
+        "low": field("Low"),
+        "close": close,
+        "adj_close": np.where(np.isnan(adj_close), close, adj_close),
+        "volume": np.where(np.isnan(volume), None, np.nan_to_num(volume).astype(np.int64)),
+    })
+    return frame[~np.isnan(close)][PRICE_COLUMNS].reset_index(drop=True)
+
+
+def _price_cache_key(ticker: str) -> str:
+    return request_key("GET", "yahoo/prices", {"ticker": ticker})
+
+
+def _read_price_rows(body: bytes) -> pd.DataFrame:
+    return pd.read_csv(
+        io.BytesIO(body),
+        dtype={"ticker": str, "date": str, "volume": "Int64"},
+        float_precision="round_trip",
+    )
+
+
+def _store_price_rows(cache: ResponseCache, ticker: str, rows: pd.DataFrame, start: str, end: str):
+    """Cache a ticker's rows for [start, end), extending its entry when the ranges meet."""
+    key = _price_cache_key(ticker)
+    old = cache.load(key)
+    if old is not None and old[0]["start"] <= start <= old[0]["end"]:
+        kept = _read_price_rows(old[1])
+        rows = pd.concat([kept[kept["date"] < start], rows], ignore_index=True)
+        start = old[0]["start"]
+    cache.store(key, {"url": f"yahoo:{ticker}", "status": 200, "start": start, "end": end},
+                rows[PRICE_COLUMNS].to_csv(index=False).encode())
+
+
+def download_prices(tickers: list[str], start: str, end: str) -> pd.DataFrame:
+    """historical_prices rows of tickers for [start, end), through the "yahoo" response cache.
+
+    yfinance does its own HTTP, so each ticker's rows are cached as CSV under
+    a key of the ticker alone, with the date range they cover in the entry's
+    metadata. A fresh entry serves any request inside that range, so the start
+    date read from the DB doesn't change the key; in replay mode the end date
+    is ignored, so a recording replays on any later day. Tickers without a
+    usable entry are downloaded together (one threaded yf.download) and merged
+    into their entries; tickers without data are not cached.
+    """
+    cache = ResponseCache("yahoo")
+    frames, pending = [], []
+    for ticker in tickers:
+        entry = cache.lookup(_price_cache_key(ticker)) if cache.mode != "off" else None
+        meta = entry[0] if entry is not None else {}
+        if entry is not None and meta["start"] <= start and (cache.mode == "replay" or meta["end"] >= end):
+            rows = _read_price_rows(entry[1])
+            frames.append(rows[(rows["date"] >= start) & (rows["date"] < end)])
+            count_outcome("yahoo", "hit")
+        elif cache.mode == "replay":
+            raise CacheMiss(f"yahoo: no cached prices for {ticker} from {start} (replay mode)")
+        else:
+            pending.append(ticker)
+
+    if pending:
+        data = yf.download(
+            pending if len(pending) > 1 else pending[0],
+            start=start,
+            end=end,
+            progress=False,
+            auto_adjust=False,
+            group_by="column",
+            threads=True,
+        )
+        count_outcome("yahoo", "fetched")
+        if data is not None and not data.empty:
+            rows = price_frame(data, pending[0])
+            if cache.mode != "off":
+                for ticker, ticker_rows in rows.groupby("ticker", sort=False):
+                    _store_price_rows(cache, ticker, ticker_rows, start, end)
+            frames.append(rows)
+
+    if not frames:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_latest_dates(conn: sqlite3.Connection, tickers: list[str]) -> dict[str, str]:
+    """Latest stored date per ticker (tickers without rows are omitted), in one query."""
+    placeholders = ",".join("?" * len(tickers))
+    return dict(conn.execute(
+        f"SELECT ticker, MAX(date) FROM historical_prices WHERE ticker IN ({placeholders}) GROUP BY ticker",
+        tickers,
+    ).fetchall())
+
+
 def get_latest_date(conn: sqlite3.Connection, ticker: str) -> str | None:
     """Get the latest date for a ticker in DB."""
-    row = conn.execute(
-        "SELECT MAX(date) FROM historical_prices WHERE ticker = ?",
-        (ticker,),
-    ).fetchone()
-    return row[0] if row and row[0] else None
+    return get_latest_dates(conn, [ticker]).get(ticker)
+
+
+def group_by_start(
+    conn: sqlite3.Connection,
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+) -> dict[str, list[str]]:
+    """Tickers grouped by the first date they need (the day after their latest row).
+
+    Tickers already up to date are left out.
+    """
+    latest = get_latest_dates(conn, tickers)
+    groups: dict[str, list[str]] = {}
+    for ticker in tickers:
+        start = start_date
+        if latest.get(ticker):
+            start = (datetime.strptime(latest[ticker][:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        if start < end_date:
+            groups.setdefault(start, []).append(ticker)
+    return groups
 
 
 def fetch_ticker_prices(
@@ -69,61 +221,22 @@ def fetch_ticker_prices(
         end_date = datetime.now().strftime("%Y-%m-%d")
 
     # Check for existing data - only fetch new dates
-    latest = get_latest_date(conn, ticker)
-    if latest:
-        # Start from next day after latest
-        next_day = (datetime.strptime(latest, "%Y-%m-%d") + timedelta(days=1)).strftime(
-            "%Y-%m-%d"
-        )
-        if next_day >= end_date:
-            print(f"  {ticker}: Already up-to-date (latest: {latest})")
-            return 0
-        start_date = next_day
+    groups = group_by_start(conn, [ticker], start_date, end_date)
+    if not groups:
+        print(f"  {ticker}: Already up-to-date (latest: {get_latest_date(conn, ticker)})")
+        return 0
+    start_date = next(iter(groups))
 
     print(f"  {ticker}: Fetching from {start_date} to {end_date}...")
 
     try:
-        data = yf.download(
-            ticker,
-            start=start_date,
-            end=end_date,
-            progress=False,
-            auto_adjust=False,
-        )
+        rows = download_prices([ticker], start_date, end_date)
 
-        if data.empty:
+        if rows.empty:
             print(f"  {ticker}: No data returned")
             return 0
 
-        count = 0
-        for date_idx, row in data.iterrows():
-            date_str = date_idx.strftime("%Y-%m-%d")
-            try:
-                # Handle both single and multi-level columns
-                open_val = float(row["Open"].iloc[0]) if hasattr(row["Open"], "iloc") else float(row["Open"])
-                high_val = float(row["High"].iloc[0]) if hasattr(row["High"], "iloc") else float(row["High"])
-                low_val = float(row["Low"].iloc[0]) if hasattr(row["Low"], "iloc") else float(row["Low"])
-                close_val = float(row["Close"].iloc[0]) if hasattr(row["Close"], "iloc") else float(row["Close"])
-                volume_val = int(row["Volume"].iloc[0]) if hasattr(row["Volume"], "iloc") else int(row["Volume"])
-
-                # Use Close as adj_close (yfinance auto_adjust=False gives Adj Close separately)
-                try:
-                    adj_close = float(row["Adj Close"].iloc[0]) if hasattr(row["Adj Close"], "iloc") else float(row["Adj Close"])
-                except (KeyError, Exception):
-                    adj_close = close_val
-
-                conn.execute(
-                    """INSERT OR REPLACE INTO historical_prices
-                       (ticker, date, open, high, low, close, adj_close, volume)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (ticker, date_str, open_val, high_val, low_val, close_val, adj_close, volume_val),
-                )
-                count += 1
-            except Exception as e:
-                print(f"  {ticker}: Error on {date_str}: {e}")
-                continue
-
-        conn.commit()
+        count = write_frame(conn, "historical_prices", rows)
         print(f"  {ticker}: Saved {count} rows")
         return count
 
@@ -136,23 +249,53 @@ def fetch_all_prices(
     start_date: str = "2010-01-01",
     end_date: str | None = None,
     tickers: list[str] | None = None,
+    batch_size: int = BATCH_SIZE,
 ):
-    """Fetch prices for all portfolio tickers."""
+    """Fetch prices for all portfolio tickers.
+
+    Tickers needing the same start date are downloaded together (one
+    threaded yf.download per batch of up to batch_size tickers) and written
+    with one bulk insert per batch.
+    """
     if tickers is None:
-        tickers = list(set(DEFAULT_TICKERS + BENCHMARK_TICKERS))
+        tickers = sorted(set(DEFAULT_TICKERS + BENCHMARK_TICKERS))
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = tune_for_writes(sqlite3.connect(DB_PATH))
     init_price_table(conn)
 
     total = 0
     print(f"=== Fetching prices for {len(tickers)} tickers ===")
 
-    for ticker in tickers:
-        count = fetch_ticker_prices(conn, ticker, start_date, end_date)
-        total += count
-        time.sleep(0.5)  # Rate limit
+    groups = group_by_start(conn, tickers, start_date, end_date)
+    pending = sum(len(group) for group in groups.values())
+    if pending < len(tickers):
+        print(f"  {len(tickers) - pending} tickers already up-to-date")
+
+    for start, group in sorted(groups.items()):
+        for i in range(0, len(group), batch_size):
+            batch = group[i:i + batch_size]
+            print(f"  {len(batch)} tickers from {start} to {end_date}: {', '.join(batch)}")
+            try:
+                rows = download_prices(batch, start, end_date)
+            except Exception as e:
+                print(f"  Download error: {e}")
+                continue
+            if rows.empty:
+                print("  No data returned")
+                continue
+            count = write_frame(conn, "historical_prices", rows)
+            missing = sorted(set(batch) - set(rows["ticker"]))
+            if missing:
+                print(f"  No data for: {', '.join(missing)}")
+            print(f"  Saved {count} rows")
+            total += count
+            time.sleep(0.5)  # Rate limit between batches
 
     conn.close()
+    cached = cache_stats("yahoo")
+    print(f"  HTTP cache: {cached['hit']} hits, {cached['fetched']} fetched")
     print(f"\n=== Total: {total} price rows saved ===")
     return total
 
@@ -0,0 +1,258 @@
+"""Concurrent FRED API client with a shared rate limiter and retry budget.
+
+- TokenBucket: thread-safe token bucket shared by all worker threads, sized
+  to FRED's limit of 120 requests per minute per API key
+- FredClient: series observations (latest values or the full ALFRED release
+  history) from the FRED JSON API; 429 and 5xx responses and connection
+  errors are retried with exponential backoff (Retry-After is honoured)
+- fetch_many: fetches many series on a thread pool and records per-series
+  latency and retry counts (FetchResult), stored in fred_fetch_log
+
+Responses go through the "fred" HTTP cache (http_cache.py); cache hits
+don't take a rate-limit token.
+
+FRED_API_URL overrides the API root, e.g. to point at a local stand-in server.
+
+Used by: fetch_fred.py
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+import requests
+
+from http_cache import CacheMiss, CachedSession, cache_stats
+
+FRED_API_URL = os.getenv("FRED_API_URL", "https://api.stlouisfed.org/fred")
+
+# FRED allows 120 requests per minute per API key
+FRED_RATE_PER_SEC = 2.0
+FRED_BURST = 5
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds; doubles per retry, with jitter
+BACKOFF_MAX = 60.0
+
+# ALFRED's full realtime range: every release and revision
+EARLIEST_REALTIME = "1776-07-04"
+LATEST_REALTIME = "9999-12-31"
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FredRequestError(Exception):
+    """A FRED request failed (non-retryable status or retries exhausted)."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one series (latency includes rate-limit and backoff waits)."""
+
+    series_id: str
+    data: pd.Series | None = None
+    releases: pd.DataFrame | None = None
+    latency_ms: float = 0.0
+    retries: int = 0
+    error: str | None = None
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class FredClient:
+    """Minimal FRED observations client; safe to share across threads."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = FRED_API_URL,
+        limiter: TokenBucket | None = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        timeout: float = 30.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter or TokenBucket(FRED_RATE_PER_SEC, FRED_BURST)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # requests.Session is not thread-safe: one per worker thread
+        if not hasattr(self._local, "session"):
+            self._local.session = CachedSession("fred", before_network=self.limiter.acquire)
+        return self._local.session
+
+    def _backoff(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+        delay = self.backoff_base * 2 ** attempt
+        return min(delay * (0.5 + random.random() / 2), BACKOFF_MAX)
+
+    def request(self, path: str, params: dict) -> tuple[dict, int]:
+        """GET a FRED endpoint as JSON; returns (payload, retries used)."""
+        params = {**params, "api_key": self.api_key, "file_type": "json"}
+        url = f"{self.base_url}/{path}"
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = self._session().get(url, params=params, timeout=self.timeout)
+            except CacheMiss as e:
+                raise FredRequestError(str(e))
+            except requests.RequestException as e:
+                failure = FredRequestError(f"{type(e).__name__}: {e}")
+            else:
+                if response.status_code == 200:
+                    return response.json(), attempt
+                failure = FredRequestError(
+                    f"HTTP {response.status_code}: {_error_message(response)}", response.status_code
+                )
+                if response.status_code not in RETRY_STATUS:
+                    raise failure
+                retry_after = response.headers.get("Retry-After")
+            if attempt == self.max_retries:
+                raise failure
+            time.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+    def get_series(self, series_id: str, observation_start: str | None = None) -> tuple[pd.Series, int]:
+        """Latest values indexed by observation date; returns (series, retries)."""
+        params = {"series_id": series_id}
+        if observation_start:
+            params["observation_start"] = observation_start
+        payload, retries = self.request("series/observations", params)
+        obs = _observations(payload)
+        return pd.Series(obs["value"].to_numpy(), index=pd.DatetimeIndex(obs["date"]), name=series_id), retries
+
+    def get_series_all_releases(self, series_id: str) -> tuple[pd.DataFrame, int]:
+        """Every release and revision (columns: date, realtime_start, value); returns (frame, retries)."""
+        payload, retries = self.request("series/observations", {
+            "series_id": series_id,
+            "realtime_start": EARLIEST_REALTIME,
+            "realtime_end": LATEST_REALTIME,
+        })
+        obs = _observations(payload)
+        return obs[["date", "realtime_start", "value"]], retries
+
+
+def _error_message(response: requests.Response) -> str:
+    try:
+        return response.json().get("error_message", response.reason)
+    except ValueError:
+        return response.reason
+
+
+def _observations(payload: dict) -> pd.DataFrame:
+    """Observations payload as (date, realtime_start, value); "." (missing) becomes NaN."""
+    obs = pd.DataFrame(payload.get("observations", []), columns=["realtime_start", "date", "value"])
+    return pd.DataFrame({
+        "date": pd.to_datetime(obs["date"]),
+        "realtime_start": pd.to_datetime(obs["realtime_start"]),
+        "value": pd.to_numeric(obs["value"], errors="coerce"),
+    })
+
+
+def _fetch_one(client: FredClient, series_id: str, observation_start: str | None, releases: bool) -> FetchResult:
+    result = FetchResult(series_id)
+    start = time.perf_counter()
+    try:
+        result.data, result.retries = client.get_series(series_id, observation_start)
+        if releases:
+            result.releases, retries = client.get_series_all_releases(series_id)
+            result.retries += retries
+    except (FredRequestError, ValueError, KeyError) as e:
+        result.error = str(e)
+    result.latency_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+def fetch_many(
+    client: FredClient,
+    jobs: list[tuple[str, str | None, bool]],
+    workers: int = 8,
+):
+    """Fetch (series_id, observation_start, with_releases) jobs concurrently.
+
+    Yields FetchResult as each series completes; the shared limiter in the
+    client keeps the combined request rate within FRED's limit.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fetch_one, client, *req) for req in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def init_fetch_log_table(conn: sqlite3.Connection):
+    """Create fred_fetch_log table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fred_fetch_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            series_id TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            latency_ms REAL NOT NULL,
+            retries INTEGER NOT NULL,
+            observations INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fred_fetch_log_series ON fred_fetch_log (series_id, started_at)"
+    )
+
+
+def store_fetch_log(conn: sqlite3.Connection, results: list[FetchResult]):
+    """Record per-series latency, retries and outcome."""
+    init_fetch_log_table(conn)
+    conn.executemany(
+        """INSERT INTO fred_fetch_log
+           (series_id, started_at, latency_ms, retries, observations, status, error)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (
+                r.series_id, r.started_at, round(r.latency_ms, 1), r.retries,
+                0 if r.data is None else len(r.data),
+                "success" if r.ok else "failed", r.error,
+            )
+            for r in results
+        ],
+    )
@@ -2,7 +2,8 @@
 
 import sqlite3
 from datetime import datetime
-from config import DB_PATH, REGIME_ALLOCATIONS
+from config import DB_PATH
+from allocation_weights import get_weight_table
 
 # Default asset universe — global market cap proportions
 # Stocks: US ~63%, EU ~15%, JP ~6%, CN ~3%, IN ~2%, KR ~1.5%
@@ -34,46 +35,6 @@ def generate_allocation(regime_name: str, total_amount: float, risk_level: int =
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    # Get allocation template for the regime
-    template = dict(REGIME_ALLOCATIONS.get(regime_name, REGIME_ALLOCATIONS["goldilocks"]))
-
-    # Apply user regime overrides if any exist
-    try:
-        cursor.execute(
-            "SELECT asset_class, weight_pct FROM user_regime_overrides WHERE regime_name = ?",
-            (regime_name,),
-        )
-        overrides = cursor.fetchall()
-        if overrides:
-            for asset_class, weight_pct in overrides:
-                template[asset_class] = weight_pct
-            print(f"  Applied {len(overrides)} user override(s) for regime '{regime_name}'")
-    except Exception as e:
-        print(f"  Warning: Could not read user_regime_overrides: {e}")
-
-    # Apply risk adjustment (1=conservative, 5=aggressive)
-    risk_multiplier = {
-        1: {"stocks": 0.6, "bonds": 1.4, "realestate": 0.7, "commodities": 0.8, "crypto": 0.3, "cash": 1.5},
-        2: {"stocks": 0.8, "bonds": 1.2, "realestate": 0.85, "commodities": 0.9, "crypto": 0.6, "cash": 1.3},
-        3: {"stocks": 1.0, "bonds": 1.0, "realestate": 1.0, "commodities": 1.0, "crypto": 1.0, "cash": 1.0},
-        4: {"stocks": 1.2, "bonds": 0.8, "realestate": 1.15, "commodities": 1.1, "crypto": 1.4, "cash": 0.7},
-        5: {"stocks": 1.4, "bonds": 0.6, "realestate": 1.3, "commodities": 1.2, "crypto": 1.8, "cash": 0.5},
-    }
-
-    multipliers = risk_multiplier.get(risk_level, risk_multiplier[3])
-
-    # Apply multipliers and normalize to 100%
-    adjusted = {}
-    total_pct = 0
-    for asset_class, pct in template.items():
-        adj_pct = pct * multipliers.get(asset_class, 1.0)
-        adjusted[asset_class] = adj_pct
-        total_pct += adj_pct
-
-    # Normalize
-    for asset_class in adjusted:
-        adjusted[asset_class] = (adjusted[asset_class] / total_pct) * 100
-
     # Get latest regime ID
     cursor.execute(
         "SELECT id FROM regimes WHERE regime_name = ? ORDER BY date DESC LIMIT 1",
@@ -96,6 +57,7 @@ def generate_allocation(regime_name: str, total_amount: float, risk_level: int =
     user_assets = cursor.fetchall()
 
     if user_assets:
+        # No within-class weight → equal split within class (same as backtest)
         assets = [
             {"ticker": r[0], "name": r[1], "asset_class": r[2], "country": r[3]}
             for r in user_assets
@@ -103,23 +65,21 @@ def generate_allocation(regime_name: str, total_amount: float, risk_level: int =
     else:
         assets = DEFAULT_ASSETS
 
+    # Regime template + user overrides + risk adjustment (shared with backtest)
+    weight_table = get_weight_table(conn, assets)
+    overrides = weight_table.overrides.get(regime_name, {})
+    if overrides:
+        print(f"  Applied {len(overrides)} user override(s) for regime '{regime_name}'")
+    weights = weight_table.weights(regime_name, risk_level)
+
     # Calculate individual allocations
     items = []
     for asset in assets:
         asset_class = asset["asset_class"]
-        class_pct = adjusted.get(asset_class, 0)
-
-        if class_pct == 0:
+        if asset["ticker"] not in weights:
             continue
 
-        # Weight within class
-        weight_within = asset.get("weight_within_class", 1.0)
-        # Count assets in same class
-        same_class = [a for a in assets if a["asset_class"] == asset_class]
-        if not weight_within:
-            weight_within = 1.0 / len(same_class)
-
-        final_pct = class_pct * weight_within
+        final_pct = weights[asset["ticker"]] * 100
         amount = total_amount * (final_pct / 100)
 
         cursor.execute(
@@ -0,0 +1,208 @@
+"""On-disk response cache for the FRED, Yahoo and RSS fetchers.
+
+Entries live under <DB_DIR>/cache/http/<source>/ as a JSON metadata file
+plus the raw body, keyed by a hash of the request (method, URL and sorted
+params; secret params such as api_key are left out so recordings are
+portable). Each source has its own TTL (SOURCE_TTL).
+
+- CachedSession: requests.Session for FRED and RSS. Fresh entries are
+  served from disk; stale ones are revalidated with If-None-Match /
+  If-Modified-Since when the server sent an ETag / Last-Modified, and a
+  304 renews the entry. Only 200 responses are stored.
+- ResponseCache: the entry store itself, also used directly by fetchers
+  whose HTTP layer can't be swapped (yf.download in fetch_prices.py), which
+  store their parsed result with the range it covers.
+
+HTTP_CACHE_MODE selects the behaviour:
+- "normal" (default): TTL plus revalidation
+- "record": always hit the network and store every response
+- "replay": serve only from the cache, never the network (misses raise
+  CacheMiss), to reproduce a run offline
+- "off": bypass the cache
+
+Used by: fred_client.py, fetch_prices.py, fetch_news.py
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config import DB_PATH
+
+HTTP_CACHE_DIR = Path(DB_PATH).parent / "cache" / "http"
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "normal")
+MODES = ("normal", "record", "replay", "off")
+
+# Seconds an entry is served without asking the server
+SOURCE_TTL = {
+    "fred": 12 * 3600,   # daily series update once a day, most others monthly or less
+    "yahoo": 6 * 3600,   # end-of-day prices
+    "rss": 15 * 60,
+}
+
+# Query params that never become part of a cache key or stored URL
+SECRET_PARAMS = {"api_key"}
+
+# Response headers kept with an entry
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+class CacheMiss(requests.RequestException):
+    """A request had no cache entry in replay mode."""
+
+
+def count_outcome(source: str, outcome: str):
+    """Record a cache outcome (hit, revalidated, fetched) of a source."""
+    with _stats_lock:
+        counts = _stats.setdefault(source, {"hit": 0, "revalidated": 0, "fetched": 0})
+        counts[outcome] += 1
+
+
+def cache_stats(source: str) -> dict[str, int]:
+    """Cache outcomes (hit, revalidated, fetched) of a source in this process."""
+    with _stats_lock:
+        return dict(_stats.get(source, {"hit": 0, "revalidated": 0, "fetched": 0}))
+
+
+def request_key(method: str, url: str, params: dict | None = None) -> str:
+    """Stable hash of a request, ignoring secret params."""
+    public = sorted((k, str(v)) for k, v in (params or {}).items() if k not in SECRET_PARAMS)
+    return hashlib.sha256(f"{method.upper()} {url}?{urlencode(public)}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """Entry storage of one source: <dir>/<key>.json (metadata) and <key>.body."""
+
+    def __init__(self, source: str, ttl: float | None = None, mode: str | None = None,
+                 cache_dir: Path = HTTP_CACHE_DIR):
+        self.source = source
+        self.ttl = SOURCE_TTL.get(source, 3600) if ttl is None else ttl
+        self.mode = mode or HTTP_CACHE_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown HTTP_CACHE_MODE {self.mode!r}; expected one of {MODES}")
+        self.dir = Path(cache_dir) / source
+
+    def load(self, key: str) -> tuple[dict, bytes] | None:
+        try:
+            meta = json.loads((self.dir / f"{key}.json").read_text())
+            return meta, (self.dir / f"{key}.body").read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key: str, meta: dict, body: bytes | None = None):
+        """Write an entry atomically (body first, so metadata never points at a partial body)."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta = {**meta, "stored_at": time.time()}
+        suffix = f".tmp{os.getpid()}.{threading.get_ident()}"
+        if body is not None:
+            tmp = self.dir / f"{key}.body{suffix}"
+            tmp.write_bytes(body)
+            tmp.replace(self.dir / f"{key}.body")
+        tmp = self.dir / f"{key}.json{suffix}"
+        tmp.write_text(json.dumps(meta))
+        tmp.replace(self.dir / f"{key}.json")
+
+    def is_fresh(self, meta: dict) -> bool:
+        return time.time() - meta.get("stored_at", 0) < self.ttl
+
+    def lookup(self, key: str) -> tuple[dict, bytes] | None:
+        """Entry to serve without the network (replay: any entry; normal: fresh ones)."""
+        if self.mode in ("off", "record"):
+            return None
+        entry = self.load(key)
+        if entry is None:
+            if self.mode == "replay":
+                raise CacheMiss(f"{self.source}: no cached response for request {key[:12]} (replay mode)")
+            return None
+        if self.mode == "replay" or self.is_fresh(entry[0]):
+            return entry
+        return None
+
+
+def _public_url(url: str, params: dict | None) -> str:
+    public = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+    return f"{url}?{urlencode(public)}" if public else url
+
+
+def _cached_response(meta: dict, body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.reason = meta.get("reason", "OK")
+    response.url = meta["url"]
+    response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+    response._content = body
+    response.encoding = meta.get("encoding")
+    response.from_cache = True
+    return response
+
+
+class CachedSession(requests.Session):
+    """requests.Session whose GETs go through a ResponseCache.
+
+    before_network, if given, is called right before each network request
+    (e.g. a rate limiter's acquire), so cache hits don't consume it.
+    """
+
+    def __init__(self, source: str, ttl: float | None = None, mode: str | None = None,
+                 cache_dir: Path = HTTP_CACHE_DIR, before_network: Callable[[], None] | None = None):
+        super().__init__()
+        self.cache = ResponseCache(source, ttl, mode, cache_dir)
+        self.before_network = before_network
+
+    def _network(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.before_network:
+            self.before_network()
+        response = super().request(method, url, **kwargs)
+        response.from_cache = False
+        return response
+
+    def request(self, method: str, url: str, params: dict | None = None, data=None,
+                headers: dict | None = None, **kwargs):
+        if method.upper() != "GET" or self.cache.mode == "off":
+            return self._network(method, url, params=params, data=data, headers=headers, **kwargs)
+
+        key = request_key(method, url, params)
+        entry = self.cache.lookup(key)
+        if entry is not None:
+            count_outcome(self.cache.source, "hit")
+            return _cached_response(*entry)
+
+        # Stale entry: revalidate when the server gave us a validator
+        stale = self.cache.load(key) if self.cache.mode == "normal" else None
+        headers = dict(headers or {})
+        if stale is not None:
+            validators = stale[0].get("headers", {})
+            if validators.get("ETag"):
+                headers["If-None-Match"] = validators["ETag"]
+            if validators.get("Last-Modified"):
+                headers["If-Modified-Since"] = validators["Last-Modified"]
+
+        response = self._network(method, url, params=params, data=data, headers=headers, **kwargs)
+        if response.status_code == 304 and stale is not None:
+            meta, body = stale
+            self.cache.store(key, meta)  # renews stored_at; body unchanged
+            count_outcome(self.cache.source, "revalidated")
+            return _cached_response(meta, body)
+
+        if response.status_code == 200:
+            self.cache.store(key, {
+                "url": _public_url(url, params),
+                "status": response.status_code,
+                "reason": response.reason,
+                "encoding": response.encoding,
+                "headers": {h: response.headers[h] for h in STORED_HEADERS if h in response.headers},
+            }, response.content)
+        count_outcome(self.cache.source, "fetched")
+        return response
+
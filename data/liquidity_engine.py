@@ -0,0 +1,119 @@
+"""Liquidity signal engine — the "3-of-5" rule driven by LIQUIDITY_SIGNALS.
+
+Each signal's easing/tightening direction is computed for every observation
+of its series in one pass (latest vs. the first of the trailing `lookback`
+observations). Directions are then as-of joined onto any date grid with a
+binary search, so the live state (determine_regime) and the monthly
+history (compute_historical_regimes) come from the same code.
+
+liquidity_signals holds one full snapshot per date: every signal's
+direction as known on that date, for each date any signal has a new
+observation.
+"""
+
+import sqlite3
+
+import numpy as np
+
+from macro_panel import load_panel
+from regime_utils import LIQUIDITY_SIGNALS, MIN_EASING_FOR_EXPANDING
+
+
+def signal_easing(values: np.ndarray, signal: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Easing flag and validity for each observation of one signal's series."""
+    i = np.arange(len(values))
+    recent = values
+    older = values[np.maximum(i - signal["lookback"] + 1, 0)]
+    rule = signal["easing"]
+    if rule == "negative":
+        return recent < 0, i >= 0
+    if rule == "not_falling":
+        easing = recent >= older * (1 - signal.get("tolerance", 0.0))
+    elif rule == "falling":
+        easing = recent <= older
+    else:
+        raise ValueError(f"Unknown easing rule {rule!r} for {signal['name']}")
+    return easing, i >= 1
+
+
+class LiquidityEngine:
+    """Direction history of every configured liquidity signal."""
+
+    def __init__(self, series: dict[str, tuple[np.ndarray, np.ndarray]], signals: list[dict] = LIQUIDITY_SIGNALS):
+        """series: {series_id: (dates as datetime64[D], values)}, sorted by date."""
+        self.signals = []
+        for signal in signals:
+            if signal["series_id"] not in series:
+                continue
+            dates, values = series[signal["series_id"]]
+            easing, valid = signal_easing(values, signal)
+            self.signals.append((signal["name"], dates, values, easing, valid))
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, signals: list[dict] = LIQUIDITY_SIGNALS) -> "LiquidityEngine":
+        """Load all signal series from the cached macro panel."""
+        return cls(load_panel(conn).series([s["series_id"] for s in signals]), signals)
+
+    def snapshot(self, grid: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-signal state on each grid date.
+
+        Returns (available, easing, raw_value), each shaped (signals, dates).
+        """
+        grid = np.asarray(grid, dtype="datetime64[D]")
+        shape = (len(self.signals), len(grid))
+        available = np.zeros(shape, dtype=bool)
+        easing = np.zeros(shape, dtype=bool)
+        raw = np.full(shape, np.nan)
+        for k, (_, dates, values, flags, valid) in enumerate(self.signals):
+            n = np.searchsorted(dates, grid, side="right")
+            j = np.maximum(n - 1, 0)
+            available[k] = (n > 0) & valid[j]
+            easing[k] = available[k] & flags[j]
+            raw[k] = np.where(n > 0, values[j], np.nan)
+        return available, easing, raw
+
+    def states(self, grid: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Liquidity state on each grid date, with easing and available signal counts.
+
+        3-of-5 rule: expanding with MIN_EASING_FOR_EXPANDING easing signals,
+        or when no signal has data yet.
+        """
+        available, easing, _ = self.snapshot(grid)
+        total = available.sum(axis=0)
+        easing_count = easing.sum(axis=0)
+        expanding = (total == 0) | (easing_count >= MIN_EASING_FOR_EXPANDING)
+        return np.where(expanding, "expanding", "contracting").astype(object), easing_count, total
+
+    def history_dates(self, since: str | None = None, extra_dates=()) -> np.ndarray:
+        """Dates with a new observation of any signal (on or after since), plus extra_dates."""
+        dates = [d for _, d, _, _, _ in self.signals]
+        dates.append(np.asarray(extra_dates, dtype="datetime64[D]"))
+        grid = np.unique(np.concatenate(dates))
+        if since is not None:
+            grid = grid[grid >= np.datetime64(since, "D")]
+        return grid
+
+    def store(self, conn: sqlite3.Connection, since: str | None = None, extra_dates=()) -> int:
+        """Upsert signal snapshots for history_dates(since, extra_dates) into liquidity_signals.
+
+        Returns the number of rows written.
+        """
+        grid = self.history_dates(since, extra_dates)
+        available, easing, raw = self.snapshot(grid)
+        date_strs = np.datetime_as_string(grid, unit="D")
+        direction = np.where(easing, "easing", "tightening")
+        rows = []
+        for k, (name, *_) in enumerate(self.signals):
+            ok = available[k]
+            rows.extend(zip(date_strs[ok], [name] * int(ok.sum()), direction[k][ok], raw[k][ok].tolist()))
+        conn.executemany(
+            """INSERT OR REPLACE INTO liquidity_signals (date, signal_name, direction, raw_value)
+               VALUES (?, ?, ?, ?)""",
+            rows,
+        )
+        return len(rows)
+
+
+def last_stored_date(conn: sqlite3.Connection) -> str | None:
+    """Latest date in liquidity_signals, if any."""
+    return conn.execute("SELECT MAX(date) FROM liquidity_signals").fetchone()[0]
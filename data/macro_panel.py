@@ -0,0 +1,246 @@
+"""Aligned mixed-frequency macro panel with an on-disk cache.
+
+Builds a dense (date × series) panel over the union of all observation
+dates in economic_data:
+- values:   forward-filled levels (NaN before a series' first observation)
+- observed: True where the series has an observation on that date
+- yoy:      frequency-correct year-over-year change (%), forward-filled
+
+Raw observations are also kept series by series in flat arrays (obs_dates,
+obs_values, obs_yoy, with obs_offsets marking each series' slice), so
+MacroPanel.series() / observations() return slices (views of the
+memory-mapped files, no copies).
+
+Each series' frequency is detected from the spacing of its observations.
+Monthly, quarterly and annual YoY compare with 12, 4 or 1 observations
+back. Daily and weekly YoY compare with the last observation on or before
+the same date a year earlier, since their observation counts per year vary.
+
+The panel is cached under <DB_DIR>/cache/macro_panel/<fingerprint>/ as one
+.npy file per array (memory-mapped on load, unlike .npz members). The
+fingerprint hashes every series' row count, date range and value sum, so
+any new, revised or deleted row builds a new panel.
+
+Used by: compute_historical_regimes.py, liquidity_engine.py, compute_indicators.py
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import DB_PATH
+
+PANEL_DIR = Path(DB_PATH).parent / "cache" / "macro_panel"
+
+# Observations per year for frequencies whose YoY is an observation-count shift
+YOY_PERIODS = {"monthly": 12, "quarterly": 4, "annual": 1}
+
+_ARRAYS = ("dates", "values", "observed", "yoy", "obs_dates", "obs_values", "obs_yoy", "obs_offsets")
+
+# Bumped when the cached layout changes, so older caches are rebuilt
+PANEL_FORMAT = 2
+
+
+# Largest median observation gap (days) of each frequency
+FREQUENCY_MAX_GAP = {"daily": 4, "weekly": 10, "monthly": 45, "quarterly": 135}
+
+
+def frequency_from_gap(median_gap_days) -> np.ndarray:
+    """Frequency names for an array of median observation gaps (days)."""
+    gap = np.asarray(median_gap_days, dtype=np.float64)
+    conditions = [gap <= limit for limit in FREQUENCY_MAX_GAP.values()]
+    return np.select(conditions, list(FREQUENCY_MAX_GAP), default="annual")
+
+
+def detect_frequency(dates) -> str:
+    """"daily", "weekly", "monthly", "quarterly" or "annual" from the median observation gap."""
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    if len(days) < 2:
+        return "monthly"
+    return str(frequency_from_gap(np.median(np.diff(days))))
+
+
+def compute_yoy(dates, values: np.ndarray, frequency: str | None = None) -> np.ndarray:
+    """Year-over-year change (%) of each observation, NaN without a year of history."""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    values = np.asarray(values, dtype=np.float64)
+    frequency = frequency or detect_frequency(dates)
+    yoy = np.full(len(values), np.nan)
+
+    if frequency in YOY_PERIODS:
+        periods = YOY_PERIODS[frequency]
+        prev_idx = np.arange(len(values)) - periods
+    else:
+        year_ago = (pd.DatetimeIndex(dates) - pd.DateOffset(years=1)).to_numpy(dtype="datetime64[D]")
+        prev_idx = np.searchsorted(dates, year_ago, side="right") - 1
+    ok = prev_idx >= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yoy[ok] = (values[ok] / values[prev_idx[ok]] - 1) * 100
+    return yoy
+
+
+def data_fingerprint(conn: sqlite3.Connection) -> str:
+    """Hash of per-series row counts, date ranges and value sums in economic_data."""
+    rows = conn.execute(
+        """SELECT series_id, COUNT(*), MIN(date), MAX(date), ROUND(SUM(value), 6)
+           FROM economic_data GROUP BY series_id ORDER BY series_id"""
+    ).fetchall()
+    return hashlib.sha1(repr((PANEL_FORMAT, rows)).encode()).hexdigest()[:16]
+
+
+class MacroPanel:
+    """Dense forward-filled (date × series) panel of all economic series."""
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        series_ids: list[str],
+        values: np.ndarray,
+        observed: np.ndarray,
+        yoy: np.ndarray,
+        obs_dates: np.ndarray,
+        obs_values: np.ndarray,
+        obs_yoy: np.ndarray,
+        obs_offsets: np.ndarray,
+        frequencies: dict[str, str],
+        fingerprint: str = "",
+    ):
+        self.dates = dates
+        self.series_ids = series_ids
+        self.values = values
+        self.observed = observed
+        self.yoy = yoy
+        self.obs_dates = obs_dates
+        self.obs_values = obs_values
+        self.obs_yoy = obs_yoy
+        self.obs_offsets = obs_offsets
+        self.frequencies = frequencies
+        self.fingerprint = fingerprint
+        self.index = {s: i for i, s in enumerate(series_ids)}
+
+    def __contains__(self, series_id: str) -> bool:
+        return series_id in self.index
+
+    def observations(self, series_id: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Raw (dates as datetime64[D], values, YoY %) of one series, as views."""
+        col = self.index[series_id]
+        rows = slice(int(self.obs_offsets[col]), int(self.obs_offsets[col + 1]))
+        return self.obs_dates[rows], self.obs_values[rows], self.obs_yoy[rows]
+
+    def series(self, series_ids) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        """Raw observations {series_id: (dates, values)} as views; missing ids omitted."""
+        return {
+            series_id: self.observations(series_id)[:2]
+            for series_id in series_ids
+            if series_id in self.index
+        }
+
+    def asof(self, grid) -> np.ndarray:
+        """Panel row in effect on each grid date (-1 before the first date)."""
+        return np.searchsorted(self.dates, np.asarray(grid, dtype="datetime64[D]"), side="right") - 1
+
+
+def build_panel(conn: sqlite3.Connection, fingerprint: str = "") -> MacroPanel:
+    """Build the panel from economic_data with one query."""
+    df = pd.read_sql_query(
+        "SELECT series_id, date, value FROM economic_data ORDER BY series_id, date",
+        conn,
+    )
+    df["date"] = pd.to_datetime(df["date"].str[:10])
+    dates = np.unique(df["date"].to_numpy(dtype="datetime64[D]"))
+    series_ids = list(df["series_id"].unique())
+
+    shape = (len(dates), len(series_ids))
+    values = np.full(shape, np.nan)
+    yoy = np.full(shape, np.nan)
+    observed = np.zeros(shape, dtype=bool)
+    frequencies = {}
+    # Rows are sorted by series_id, so each series is one contiguous slice
+    obs_dates = df["date"].to_numpy(dtype="datetime64[D]")
+    obs_values = df["value"].to_numpy(dtype=np.float64)
+    obs_yoy = np.full(len(df), np.nan)
+    obs_offsets = np.zeros(len(series_ids) + 1, dtype=np.int64)
+    for col, (series_id, rows_in_df) in enumerate(df.groupby("series_id", sort=False).indices.items()):
+        sl = slice(rows_in_df[0], rows_in_df[-1] + 1)
+        obs_offsets[col + 1] = sl.stop
+        frequencies[series_id] = detect_frequency(obs_dates[sl])
+        obs_yoy[sl] = compute_yoy(obs_dates[sl], obs_values[sl], frequencies[series_id])
+        rows = np.searchsorted(dates, obs_dates[sl])
+        values[rows, col] = obs_values[sl]
+        yoy[rows, col] = obs_yoy[sl]
+        observed[rows, col] = True
+
+    # Forward-fill along dates: index of the last observation per column
+    last = np.where(observed, np.arange(len(dates))[:, None], -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    cols = np.arange(len(series_ids))
+    has = last >= 0
+    values = np.where(has, values[np.maximum(last, 0), cols], np.nan)
+    yoy = np.where(has, yoy[np.maximum(last, 0), cols], np.nan)
+
+    return MacroPanel(
+        dates, series_ids, values, observed, yoy, obs_dates, obs_values, obs_yoy, obs_offsets,
+        frequencies, fingerprint,
+    )
+
+
+def save_panel(panel: MacroPanel, cache_dir: Path = PANEL_DIR):
+    """Write the panel to cache_dir/<fingerprint>/ and drop older panels."""
+    target = Path(cache_dir) / panel.fingerprint
+    tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+    for name in _ARRAYS:
+        np.save(tmp / f"{name}.npy", getattr(panel, name))
+    (tmp / "meta.json").write_text(json.dumps({
+        "series_ids": panel.series_ids,
+        "frequencies": panel.frequencies,
+    }))
+    if target.exists():
+        shutil.rmtree(tmp)
+    else:
+        tmp.rename(target)
+    for old in Path(cache_dir).iterdir():
+        if old.name != panel.fingerprint and ".tmp" not in old.name:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def read_panel(path: Path, fingerprint: str) -> MacroPanel:
+    """Memory-map a cached panel."""
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+    meta = json.loads((path / "meta.json").read_text())
+    return MacroPanel(
+        arrays["dates"], meta["series_ids"], arrays["values"], arrays["observed"], arrays["yoy"],
+        arrays["obs_dates"], arrays["obs_values"], arrays["obs_yoy"], arrays["obs_offsets"],
+        meta["frequencies"], fingerprint,
+    )
+
+
+def load_panel(conn: sqlite3.Connection, cache_dir: Path = PANEL_DIR, rebuild: bool = False) -> MacroPanel:
+    """Cached panel for the current economic_data, built and saved on a miss."""
+    fingerprint = data_fingerprint(conn)
+    path = Path(cache_dir) / fingerprint
+    if not rebuild and (path / "meta.json").exists():
+        return read_panel(path, fingerprint)
+
+    panel = build_panel(conn, fingerprint)
+    try:
+        save_panel(panel, cache_dir)
+    except OSError as e:
+        print(f"  WARNING: Could not cache macro panel: {e}")
+    return panel
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DB_PATH)
+    panel = load_panel(conn, rebuild=True)
+    conn.close()
+    print(f"=== Macro Panel {panel.fingerprint} ===")
+    print(f"  {len(panel.dates)} dates × {len(panel.series_ids)} series")
+    for series_id in panel.series_ids:
+        print(f"  {series_id}: {panel.frequencies[series_id]}")
@@ -0,0 +1,255 @@
+"""Materialized per-country regime statistics.
+
+Computes from `regimes` and `historical_prices`:
+- regime_transitions: count and probability of each regime → regime step
+  between consecutive regime entries
+- regime_durations: spells (runs of the same regime) with average, median
+  and longest duration; the current spell counts up to the latest entry
+- regime_asset_returns: per regime and ticker, daily return statistics over
+  the trading days that regime was in effect (annualized return, volatility,
+  hit rate)
+
+Transitions and spells come from shifted-array comparisons, returns from one
+groupby over (regime, ticker). A country is only recomputed when its regime
+rows or the price rows changed since the last refresh (regime_stats_state).
+
+Usage:
+    python regime_stats.py [--force]
+"""
+
+import argparse
+import hashlib
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import DB_PATH
+from backtest_metrics import TRADING_DAYS
+from regime_timeline import RegimeTimeline
+from regime_utils import COUNTRIES
+
+
+def init_stats_tables(conn: sqlite3.Connection):
+    """Create regime statistics tables if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regime_transitions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            country TEXT NOT NULL,
+            from_regime TEXT NOT NULL,
+            to_regime TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            probability REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regime_durations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            country TEXT NOT NULL,
+            regime_name TEXT NOT NULL,
+            spells INTEGER NOT NULL,
+            avg_duration_days REAL NOT NULL,
+            median_duration_days REAL NOT NULL,
+            max_duration_days INTEGER NOT NULL,
+            total_days INTEGER NOT NULL,
+            share_pct REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regime_asset_returns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            country TEXT NOT NULL,
+            regime_name TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            trading_days INTEGER NOT NULL,
+            avg_daily_return_pct REAL,
+            annualized_return_pct REAL,
+            volatility_pct REAL,
+            hit_rate_pct REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regime_stats_state (
+            country TEXT PRIMARY KEY,
+            source_fingerprint TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    for table, columns in (
+        ("regime_transitions", "country, from_regime, to_regime"),
+        ("regime_durations", "country, regime_name"),
+        ("regime_asset_returns", "country, regime_name, ticker"),
+    ):
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_unique ON {table} ({columns})")
+    conn.commit()
+
+
+def source_fingerprints(conn: sqlite3.Connection, countries: list[str]) -> dict[str, str]:
+    """Per-country hash of the regime and price row counts, max ids and max dates."""
+    prices = conn.execute("SELECT COUNT(*), MAX(id), MAX(date) FROM historical_prices").fetchone()
+    regimes = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT country, COUNT(*), MAX(id), MAX(date) FROM regimes GROUP BY country"
+        )
+    }
+    return {
+        country: hashlib.sha1(repr((regimes.get(country), prices)).encode()).hexdigest()
+        for country in countries
+    }
+
+
+def load_regime_history(conn: sqlite3.Connection, country: str) -> pd.DataFrame:
+    """Regime entries (date, regime_name) sorted by date; the last row wins per date."""
+    df = pd.read_sql_query(
+        "SELECT substr(date, 1, 10) AS date, regime_name FROM regimes WHERE country = ? ORDER BY date, id",
+        conn,
+        params=(country,),
+    )
+    return df.drop_duplicates("date", keep="last").reset_index(drop=True)
+
+
+def transition_stats(names: np.ndarray) -> pd.DataFrame:
+    """Counts and row-normalized probabilities of consecutive regime pairs."""
+    if len(names) < 2:
+        return pd.DataFrame(columns=["from_regime", "to_regime", "count", "probability"])
+    pairs = pd.DataFrame({"from_regime": names[:-1], "to_regime": names[1:]})
+    counts = pairs.value_counts().rename("count").reset_index()
+    counts["probability"] = counts["count"] / counts.groupby("from_regime")["count"].transform("sum")
+    return counts.sort_values(["from_regime", "to_regime"]).reset_index(drop=True)
+
+
+def duration_stats(dates: np.ndarray, names: np.ndarray) -> pd.DataFrame:
+    """Spell statistics per regime; a spell ends where the next regime starts."""
+    if len(names) == 0:
+        return pd.DataFrame(columns=[
+            "regime_name", "spells", "avg_duration_days", "median_duration_days",
+            "max_duration_days", "total_days", "share_pct",
+        ])
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+    ends = np.append(days[starts[1:]], days[-1])
+    spells = pd.DataFrame({"regime_name": names[starts], "days": ends - days[starts]})
+
+    stats = spells.groupby("regime_name")["days"].agg(
+        spells="size",
+        avg_duration_days="mean",
+        median_duration_days="median",
+        max_duration_days="max",
+        total_days="sum",
+    ).reset_index()
+    total = stats["total_days"].sum()
+    stats["share_pct"] = stats["total_days"] / total * 100 if total > 0 else 0.0
+    return stats
+
+
+def load_daily_returns(conn: sqlite3.Connection) -> pd.DataFrame:
+    """Daily adj_close returns of every ticker (date, ticker, ret)."""
+    df = pd.read_sql_query(
+        "SELECT ticker, date, adj_close FROM historical_prices ORDER BY ticker, date",
+        conn,
+    )
+    prev = df.groupby("ticker", sort=False)["adj_close"].shift()
+    df["ret"] = df["adj_close"] / prev - 1
+    return df.loc[prev > 0, ["date", "ticker", "ret"]].reset_index(drop=True)
+
+
+def asset_return_stats(returns: pd.DataFrame, timeline: RegimeTimeline, country: str, first_date: str) -> pd.DataFrame:
+    """Per (regime, ticker) daily return statistics over days on or after first_date."""
+    returns = returns[returns["date"] >= first_date]
+    if returns.empty:
+        return pd.DataFrame(columns=[
+            "regime_name", "ticker", "trading_days", "avg_daily_return_pct",
+            "annualized_return_pct", "volatility_pct", "hit_rate_pct",
+        ])
+    dates, inverse = np.unique(returns["date"].to_numpy(), return_inverse=True)
+    frame = pd.DataFrame({
+        "regime_name": timeline.resolve(dates.astype(str), country)[inverse],
+        "ticker": returns["ticker"].to_numpy(),
+        "ret": returns["ret"].to_numpy(),
+        "log_ret": np.log1p(returns["ret"].to_numpy()),
+        "up": returns["ret"].to_numpy() > 0,
+    })
+    stats = frame.groupby(["regime_name", "ticker"]).agg(
+        trading_days=("ret", "size"),
+        avg_daily_return=("ret", "mean"),
+        volatility=("ret", "std"),
+        mean_log=("log_ret", "mean"),
+        hit_rate=("up", "mean"),
+    ).reset_index()
+    return pd.DataFrame({
+        "regime_name": stats["regime_name"],
+        "ticker": stats["ticker"],
+        "trading_days": stats["trading_days"],
+        "avg_daily_return_pct": stats["avg_daily_return"] * 100,
+        "annualized_return_pct": np.expm1(stats["mean_log"] * TRADING_DAYS) * 100,
+        "volatility_pct": stats["volatility"] * np.sqrt(TRADING_DAYS) * 100,
+        "hit_rate_pct": stats["hit_rate"] * 100,
+    })
+
+
+def _replace_rows(conn: sqlite3.Connection, table: str, country: str, df: pd.DataFrame):
+    conn.execute(f"DELETE FROM {table} WHERE country = ?", (country,))
+    if df.empty:
+        return
+    columns = list(df.columns)
+    conn.executemany(
+        f"INSERT INTO {table} (country, {', '.join(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+        [(country, *row) for row in df.astype(object).where(df.notna(), None).itertuples(index=False)],
+    )
+
+
+def refresh_regime_stats(countries: list[str] | None = None, force: bool = False) -> list[str]:
+    """Recompute statistics for countries whose regimes or prices changed.
+
+    Returns the countries that were refreshed.
+    """
+    countries = countries or COUNTRIES
+    conn = sqlite3.connect(DB_PATH)
+    init_stats_tables(conn)
+
+    fingerprints = source_fingerprints(conn, countries)
+    stored = dict(conn.execute("SELECT country, source_fingerprint FROM regime_stats_state").fetchall())
+    stale = [c for c in countries if force or stored.get(c) != fingerprints[c]]
+    if not stale:
+        print("  Regime statistics up to date")
+        conn.close()
+        return []
+
+    returns = load_daily_returns(conn)
+    timeline = RegimeTimeline.load(conn, stale)
+    now = datetime.now().isoformat()
+
+    for country in stale:
+        history = load_regime_history(conn, country)
+        names = history["regime_name"].to_numpy(dtype=object)
+        transitions = transition_stats(names)
+        durations = duration_stats(history["date"].to_numpy(dtype=str), names)
+        # Only days covered by the country's regime history
+        first_date = history["date"].iloc[0] if len(history) else "9999-12-31"
+        asset_returns = asset_return_stats(returns, timeline, country, first_date)
+
+        with conn:
+            _replace_rows(conn, "regime_transitions", country, transitions)
+            _replace_rows(conn, "regime_durations", country, durations)
+            _replace_rows(conn, "regime_asset_returns", country, asset_returns)
+            conn.execute(
+                "INSERT OR REPLACE INTO regime_stats_state (country, source_fingerprint, updated_at) VALUES (?, ?, ?)",
+                (country, fingerprints[country], now),
+            )
+        print(f"  {country}: {len(history)} regime entries, {len(transitions)} transitions, "
+              f"{len(asset_returns)} regime × ticker return rows")
+
+    conn.close()
+    return stale
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh materialized regime statistics")
+    parser.add_argument("--force", action="store_true", help="Recompute even if no new data arrived")
+    parser.add_argument("--countries", nargs="+", default=None)
+    args = parser.parse_args()
+
+    print("=== Refreshing Regime Statistics ===")
+    refresh_regime_stats(args.countries, force=args.force)
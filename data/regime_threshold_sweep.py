@@ -0,0 +1,402 @@
+"""Sensitivity sweep over the regime classification thresholds.
+
+Evaluates every combination of growth threshold × inflation threshold ×
+MIN_EASING_FOR_EXPANDING without touching regime_utils.py. The growth,
+inflation and liquidity inputs are computed once per country and month
+(the same as-of data compute_historical_regimes uses). Labels for all
+combinations × countries × months then come from one broadcasted comparison,
+as an array of regime codes.
+
+For each combination and country it reports:
+- Stability: regime switches per year, average regime duration, regimes used,
+  and agreement with the current thresholds' labels
+- Backtest: monthly-rebalanced portfolio return driven by that country's labels.
+  Each regime's growth factor over every rebalance segment is precomputed
+  (the same buy/hold rules as backtest_engine.simulate_portfolio), so a
+  combination's value path is a gather and a cumulative product.
+
+Per-country grids may have different lengths; missing entries are skipped.
+Results are stored in threshold_sweeps / threshold_sweep_results.
+
+Usage:
+    python regime_threshold_sweep.py 2015-01-01 --growth-offsets -1 -0.5 0 0.5 1 --min-easing 2 3 4
+    python regime_threshold_sweep.py 2015-01-01 --growth US=1,1.5,2,2.5 --inflation US=2,2.5,3
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import DB_PATH
+from allocation_weights import get_weight_table
+from backtest_engine import load_price_matrix, rebalance_mask, benchmark_series
+from compute_historical_regimes import load_all_series, growth_metric, inflation_metric
+from liquidity_engine import LiquidityEngine
+from regime_timeline import DEFAULT_REGIME
+from regime_utils import (
+    derive_regime_name,
+    GROWTH_SERIES,
+    CPI_SERIES,
+    GROWTH_THRESHOLDS,
+    INFLATION_THRESHOLDS,
+    LIQUIDITY_SIGNALS,
+    MIN_EASING_FOR_EXPANDING,
+    COUNTRIES,
+)
+from run_backtest import init_backtest_tables, load_assets, select_available_assets
+
+DEFAULT_OFFSETS = tuple(np.round(np.arange(-2.0, 2.01, 0.5), 2))
+DEFAULT_MIN_EASING = (2, 3, 4)
+
+# Regime code = 4 * growth_high + 2 * inflation_high + contracting
+REGIME_CODES = [
+    derive_regime_name(g, i, l)
+    for g in ("low", "high")
+    for i in ("low", "high")
+    for l in ("expanding", "contracting")
+]
+
+
+def init_sweep_tables(conn: sqlite3.Connection):
+    """Create threshold_sweeps and threshold_sweep_results tables if they don't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS threshold_sweeps (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            risk_level INTEGER NOT NULL,
+            combinations INTEGER NOT NULL,
+            months INTEGER NOT NULL,
+            benchmark_ticker TEXT NOT NULL,
+            benchmark_return_pct REAL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS threshold_sweep_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sweep_id INTEGER REFERENCES threshold_sweeps(id),
+            country TEXT NOT NULL,
+            growth_threshold REAL NOT NULL,
+            inflation_threshold REAL NOT NULL,
+            min_easing INTEGER NOT NULL,
+            is_current INTEGER NOT NULL DEFAULT 0,
+            switches_per_year REAL,
+            avg_duration_months REAL,
+            regimes_used INTEGER,
+            agreement_pct REAL,
+            total_return_pct REAL,
+            annualized_return_pct REAL,
+            sharpe_ratio REAL,
+            max_drawdown_pct REAL
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_threshold_sweep_results_sweep ON threshold_sweep_results(sweep_id, country)"
+    )
+    conn.commit()
+
+
+def threshold_grid(base: dict[str, float], offsets, explicit: dict[str, list[float]]) -> np.ndarray:
+    """(countries, K) thresholds: base + offsets, or a country's explicit list; NaN-padded."""
+    rows = [explicit.get(c, [base.get(c, 0.0) + o for o in offsets]) for c in COUNTRIES]
+    grid = np.full((len(COUNTRIES), max(len(r) for r in rows)), np.nan)
+    for k, row in enumerate(rows):
+        grid[k, :len(row)] = row
+    return grid
+
+
+def label_codes(
+    growth: tuple[np.ndarray, np.ndarray],
+    inflation: tuple[np.ndarray, np.ndarray],
+    easing: tuple[np.ndarray, np.ndarray],
+    growth_grid: np.ndarray,
+    inflation_grid: np.ndarray,
+    min_easing: np.ndarray,
+) -> np.ndarray:
+    """Regime codes for every threshold combination, country and month.
+
+    growth, inflation: (ok, value), each (countries, months)
+    easing: (easing signal count, available signal count), each (months,)
+    growth_grid, inflation_grid: (countries, G) and (countries, I) thresholds
+    min_easing: (E,) easing signals required for "expanding"
+
+    Returns uint8 codes shaped (G, I, E, countries, months).
+    """
+    g_ok, g_val = growth
+    i_ok, i_val = inflation
+    easing_count, total = easing
+    with np.errstate(invalid="ignore"):
+        growth_high = g_ok & (g_val > growth_grid.T[:, :, None])           # (G, C, M)
+        inflation_high = i_ok & (i_val > inflation_grid.T[:, :, None])     # (I, C, M)
+    contracting = (total > 0) & (easing_count < min_easing[:, None])      # (E, M)
+
+    return (
+        4 * growth_high[:, None, None].astype(np.uint8)
+        + 2 * inflation_high[None, :, None].astype(np.uint8)
+        + contracting[None, None, :, None, :].astype(np.uint8)
+    )
+
+
+def stability(codes: np.ndarray, baseline: np.ndarray) -> dict[str, np.ndarray]:
+    """Switches per year, average duration (months), regimes used and agreement (%) with baseline.
+
+    codes: (..., months); baseline: (countries, months) broadcastable against codes.
+    """
+    months = codes.shape[-1]
+    switches = (codes[..., 1:] != codes[..., :-1]).sum(axis=-1)
+    used = (codes[..., None] == np.arange(len(REGIME_CODES), dtype=np.uint8)).any(axis=-2).sum(axis=-1)
+    return {
+        "switches_per_year": switches / max(months - 1, 1) * 12,
+        "avg_duration_months": months / (switches + 1),
+        "regimes_used": used,
+        "agreement_pct": (codes == baseline).mean(axis=-1) * 100,
+    }
+
+
+def segment_factors(matrix, weight_rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Growth factor of each regime's portfolio over each monthly rebalance segment.
+
+    weight_rows: (regimes, tickers) target weights aligned with matrix.tickers.
+    Returns (segment start row indices, (regimes, segments) factors). Weight of
+    tickers without a price on the rebalance date is not invested, and a
+    non-positive valuation keeps the previous value, as in simulate_portfolio.
+    """
+    starts = np.flatnonzero(rebalance_mask(matrix.dates, "monthly"))
+    ends = np.append(starts[1:], len(matrix) - 1)
+    prices = np.nan_to_num(matrix.values, nan=0.0)
+    p0, p1 = prices[starts], prices[ends]
+    buyable = matrix.observed[starts] & (p0 > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(buyable, p1 / p0, 0.0)
+    factors = weight_rows @ ratio.T
+    return starts, np.where(factors > 0, factors, 1.0)
+
+
+def path_returns(
+    factors: np.ndarray,
+    seg_codes: np.ndarray,
+    years: float,
+    risk_free_rate: float = 0.04,
+) -> dict[str, np.ndarray]:
+    """Total/annualized return, Sharpe and max drawdown (%) of segment label paths.
+
+    factors: (regimes, segments); seg_codes: (..., segments) regime code per segment.
+    Sharpe and drawdown are measured on the monthly (segment) values.
+    """
+    growth = factors[seg_codes, np.arange(seg_codes.shape[-1])]
+    values = np.cumprod(growth, axis=-1)
+    final = values[..., -1]
+
+    returns = growth - 1
+    std = returns.std(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, (returns.mean(axis=-1) - risk_free_rate / 12) / std * np.sqrt(12), 0.0)
+
+    peak = np.maximum(np.maximum.accumulate(values, axis=-1), 1.0)
+    return {
+        "total_return_pct": (final - 1) * 100,
+        "annualized_return_pct": (final ** (1 / max(years, 0.01)) - 1) * 100,
+        "sharpe_ratio": sharpe,
+        "max_drawdown_pct": np.max((peak - values) / peak, axis=-1) * 100,
+    }
+
+
+def run_threshold_sweep(
+    start_date: str = "2015-01-01",
+    end_date: str | None = None,
+    growth_offsets=DEFAULT_OFFSETS,
+    inflation_offsets=DEFAULT_OFFSETS,
+    min_easing=DEFAULT_MIN_EASING,
+    growth_explicit: dict[str, list[float]] | None = None,
+    inflation_explicit: dict[str, list[float]] | None = None,
+    risk_level: int = 3,
+    benchmark_ticker: str = "SPY",
+    top: int = 5,
+    store: bool = True,
+) -> dict:
+    """Sweep threshold combinations; returns sweep_id (if stored) and a results DataFrame."""
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    conn = sqlite3.connect(DB_PATH)
+    init_backtest_tables(conn)
+    init_sweep_tables(conn)
+
+    # Monthly grid over the backtest period (first of each month)
+    grid = pd.date_range(pd.Timestamp(start_date).replace(day=1), end_date, freq="MS").to_numpy(dtype="datetime64[D]")
+
+    series = load_all_series(
+        conn,
+        [*GROWTH_SERIES.values(), *CPI_SERIES.values(), *(s["series_id"] for s in LIQUIDITY_SIGNALS)],
+    )
+    shape = (len(COUNTRIES), len(grid))
+    g_ok, g_val = np.zeros(shape, dtype=bool), np.full(shape, np.nan)
+    i_ok, i_val = np.zeros(shape, dtype=bool), np.full(shape, np.nan)
+    for c, country in enumerate(COUNTRIES):
+        metric = growth_metric(series, country, grid)
+        if metric is not None:
+            g_ok[c], g_val[c] = metric
+        metric = inflation_metric(series, country, grid)
+        if metric is not None:
+            i_ok[c], i_val[c] = metric
+    _, easing_count, total = LiquidityEngine(series).states(grid)
+
+    growth_grid = threshold_grid(GROWTH_THRESHOLDS, growth_offsets, growth_explicit or {})
+    inflation_grid = threshold_grid(INFLATION_THRESHOLDS, inflation_offsets, inflation_explicit or {})
+    easing_grid = np.asarray(min_easing, dtype=np.int64)
+    n_combos = growth_grid.shape[1] * inflation_grid.shape[1] * len(easing_grid)
+
+    # Portfolio growth of each regime over each monthly rebalance segment
+    assets = load_assets(conn)
+    tickers = list(dict.fromkeys([a["ticker"] for a in assets] + [benchmark_ticker]))
+    matrix = load_price_matrix(conn, tickers, start_date, end_date)
+    assets = select_available_assets(assets, set(matrix.tickers))
+    if not assets or len(matrix) < 2:
+        conn.close()
+        raise ValueError("No price data available for any portfolio asset")
+    weight_table = get_weight_table(conn, assets)
+    columns = [matrix.index[t] for t in weight_table.tickers]
+    weight_rows = np.zeros((len(REGIME_CODES), len(matrix.tickers)))
+    for code, name in enumerate(REGIME_CODES):
+        weight_rows[code, columns] = weight_table.row(name, risk_level)
+    seg_starts, factors = segment_factors(matrix, weight_rows)
+    years = (pd.Timestamp(matrix.dates[-1]) - pd.Timestamp(matrix.dates[0])).days / 365.25
+
+    # Label month in effect on each segment start (regime_timeline default before the grid)
+    seg_month = np.searchsorted(grid, np.array(matrix.dates, dtype="datetime64[D]")[seg_starts], side="right") - 1
+    default_code = REGIME_CODES.index(DEFAULT_REGIME)
+
+    print(f"=== Threshold Sweep: {n_combos} combinations × {len(COUNTRIES)} countries × {len(grid)} months ===")
+    print(f"  Backtest: {matrix.dates[0]} ~ {matrix.dates[-1]}, {len(seg_starts)} monthly rebalances, risk {risk_level}")
+
+    t0 = time.perf_counter()
+    codes = label_codes(
+        (g_ok, g_val), (i_ok, i_val), (easing_count, total), growth_grid, inflation_grid, easing_grid,
+    )
+    baseline = label_codes(
+        (g_ok, g_val), (i_ok, i_val), (easing_count, total),
+        np.array([[GROWTH_THRESHOLDS.get(c, 2.0)] for c in COUNTRIES]),
+        np.array([[INFLATION_THRESHOLDS.get(c, 2.5)] for c in COUNTRIES]),
+        np.array([MIN_EASING_FOR_EXPANDING]),
+    ).reshape(len(COUNTRIES), len(grid))
+    codes = codes.reshape(n_combos, len(COUNTRIES), len(grid))
+
+    stats = stability(codes, baseline)
+    seg_codes = np.where(seg_month >= 0, codes[..., np.maximum(seg_month, 0)], default_code)
+    returns = path_returns(factors, seg_codes, years)
+    elapsed = time.perf_counter() - t0
+    print(f"  Computed in {elapsed:.2f}s")
+
+    # One row per valid (combination, country)
+    g_idx, i_idx, e_idx = (a.ravel() for a in np.meshgrid(
+        np.arange(growth_grid.shape[1]), np.arange(inflation_grid.shape[1]), np.arange(len(easing_grid)),
+        indexing="ij",
+    ))
+    combo, country_idx = (a.ravel() for a in np.meshgrid(np.arange(n_combos), np.arange(len(COUNTRIES)), indexing="ij"))
+    results = pd.DataFrame({
+        "country": np.array(COUNTRIES)[country_idx],
+        "growth_threshold": growth_grid[country_idx, g_idx[combo]],
+        "inflation_threshold": inflation_grid[country_idx, i_idx[combo]],
+        "min_easing": easing_grid[e_idx[combo]],
+        **{k: v.ravel() for k, v in stats.items()},
+        **{k: v.ravel() for k, v in returns.items()},
+    })
+    results = results.dropna(subset=["growth_threshold", "inflation_threshold"]).reset_index(drop=True)
+    results["is_current"] = (
+        np.isclose(results["growth_threshold"], results["country"].map(GROWTH_THRESHOLDS))
+        & np.isclose(results["inflation_threshold"], results["country"].map(INFLATION_THRESHOLDS))
+        & (results["min_easing"] == MIN_EASING_FOR_EXPANDING)
+    )
+
+    benchmark = benchmark_series(matrix, benchmark_ticker, 1.0)
+    benchmark_return = float((benchmark[-1] - 1) * 100) if len(benchmark) else None
+
+    current_returns = path_returns(
+        factors, np.where(seg_month >= 0, baseline[:, np.maximum(seg_month, 0)], default_code), years,
+    )
+    for c, country in enumerate(COUNTRIES):
+        rows = results[results["country"] == country]
+        print(f"\n  {country}: current thresholds → return {current_returns['total_return_pct'][c]:.2f}%, "
+              f"{stability(baseline[c], baseline[c])['switches_per_year']:.1f} switches/yr")
+        for _, r in rows.nlargest(top, "total_return_pct").iterrows():
+            print(f"    G>{r['growth_threshold']:.2f} I>{r['inflation_threshold']:.2f} easing>={r['min_easing']}: "
+                  f"return {r['total_return_pct']:.2f}%, sharpe {r['sharpe_ratio']:.2f}, "
+                  f"{r['switches_per_year']:.1f} switches/yr, {r['agreement_pct']:.0f}% agree")
+        spread = rows["total_return_pct"]
+        print(f"    return range across {len(rows)} combinations: {spread.min():.2f}% ~ {spread.max():.2f}%")
+    if benchmark_return is not None:
+        print(f"\n  Benchmark ({benchmark_ticker}): {benchmark_return:.2f}%")
+
+    sweep_id = None
+    if store:
+        with conn:
+            cursor = conn.execute(
+                """INSERT INTO threshold_sweeps
+                   (start_date, end_date, risk_level, combinations, months, benchmark_ticker,
+                    benchmark_return_pct, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (matrix.dates[0], matrix.dates[-1], risk_level, n_combos, len(grid), benchmark_ticker,
+                 benchmark_return, datetime.now().isoformat()),
+            )
+            sweep_id = cursor.lastrowid
+            columns = [
+                "country", "growth_threshold", "inflation_threshold", "min_easing", "is_current",
+                "switches_per_year", "avg_duration_months", "regimes_used", "agreement_pct",
+                "total_return_pct", "annualized_return_pct", "sharpe_ratio", "max_drawdown_pct",
+            ]
+            conn.executemany(
+                f"""INSERT INTO threshold_sweep_results (sweep_id, {", ".join(columns)})
+                    VALUES (?, {", ".join("?" * len(columns))})""",
+                [(sweep_id, *row) for row in results[columns].itertuples(index=False)],
+            )
+    conn.close()
+
+    return {"sweep_id": sweep_id, "results": results}
+
+
+def _parse_explicit(items: list[str] | None) -> dict[str, list[float]]:
+    """["US=1,1.5,2", ...] → {"US": [1.0, 1.5, 2.0], ...}"""
+    grids = {}
+    for item in items or []:
+        country, _, values = item.partition("=")
+        grids[country.upper()] = [float(v) for v in values.split(",") if v]
+    return grids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regime threshold sensitivity sweep")
+    parser.add_argument("start", nargs="?", default="2015-01-01", help="Backtest start (YYYY-MM-DD)")
+    parser.add_argument("end", nargs="?", default=None, help="Backtest end (default: today)")
+    parser.add_argument("--growth-offsets", type=float, nargs="+", default=list(DEFAULT_OFFSETS),
+                        help="Offsets added to each country's GROWTH_THRESHOLDS entry")
+    parser.add_argument("--inflation-offsets", type=float, nargs="+", default=list(DEFAULT_OFFSETS),
+                        help="Offsets added to each country's INFLATION_THRESHOLDS entry")
+    parser.add_argument("--growth", nargs="+", metavar="CC=v1,v2", help="Explicit growth grid for a country")
+    parser.add_argument("--inflation", nargs="+", metavar="CC=v1,v2", help="Explicit inflation grid for a country")
+    parser.add_argument("--min-easing", type=int, nargs="+", default=list(DEFAULT_MIN_EASING))
+    parser.add_argument("--risk-level", type=int, default=3)
+    parser.add_argument("--benchmark", default="SPY")
+    parser.add_argument("--top", type=int, default=5, help="Best combinations to print per country")
+    parser.add_argument("--no-store", action="store_true")
+    args = parser.parse_args()
+
+    result = run_threshold_sweep(
+        start_date=args.start,
+        end_date=args.end,
+        growth_offsets=args.growth_offsets,
+        inflation_offsets=args.inflation_offsets,
+        min_easing=args.min_easing,
+        growth_explicit=_parse_explicit(args.growth),
+        inflation_explicit=_parse_explicit(args.inflation),
+        risk_level=args.risk_level,
+        benchmark_ticker=args.benchmark,
+        top=args.top,
+        store=not args.no_store,
+    )
+    if result["sweep_id"] is not None:
+        print(f"\nSweep ID: {result['sweep_id']}")
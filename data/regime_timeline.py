@@ -0,0 +1,65 @@
+"""In-memory as-of regime lookup for backtests.
+
+Loads the `regimes` table once and answers "which regime was in effect on
+date D for country C" with a binary search, for single dates or whole date
+vectors. Replaces one `SELECT ... WHERE date <= ? ORDER BY date DESC LIMIT 1`
+per trading day.
+"""
+
+import sqlite3
+
+import numpy as np
+
+DEFAULT_REGIME = "goldilocks"
+
+
+class RegimeTimeline:
+    """Per-country sorted regime history with as-of resolution."""
+
+    def __init__(self, rows: list[tuple[str, str, str]]):
+        """rows: (country, date, regime_name), sorted by country, date."""
+        self._dates: dict[str, np.ndarray] = {}
+        self._names: dict[str, np.ndarray] = {}
+
+        by_country: dict[str, list[tuple[str, str]]] = {}
+        for country, date, regime_name in rows:
+            by_country.setdefault(country, []).append((date, regime_name))
+
+        for country, entries in by_country.items():
+            self._dates[country] = np.array([d[:10] for d, _ in entries], dtype="datetime64[D]")
+            self._names[country] = np.array([n for _, n in entries], dtype=object)
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, countries: list[str] | None = None) -> "RegimeTimeline":
+        """Load the regime history for all (or the given) countries in one query."""
+        query = "SELECT country, date, regime_name FROM regimes"
+        params: tuple = ()
+        if countries:
+            query += f" WHERE country IN ({','.join('?' * len(countries))})"
+            params = tuple(countries)
+        # Ties on (country, date) resolve to the most recently inserted row
+        query += " ORDER BY country, date, id"
+        try:
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        return cls(rows)
+
+    @property
+    def countries(self) -> list[str]:
+        return sorted(self._dates)
+
+    def resolve(self, dates, country: str = "US", default: str = DEFAULT_REGIME) -> np.ndarray:
+        """As-of join: regime in effect on each date (latest entry with date <= D)."""
+        targets = np.asarray(dates, dtype="datetime64[D]")
+        history = self._dates.get(country)
+        if history is None or history.size == 0:
+            return np.full(targets.shape, default, dtype=object)
+
+        pos = np.searchsorted(history, targets, side="right") - 1
+        names = self._names[country][np.maximum(pos, 0)]
+        return np.where(pos >= 0, names, default)
+
+    def at(self, date: str, country: str = "US", default: str = DEFAULT_REGIME) -> str:
+        """Regime in effect on a single date."""
+        return self.resolve([date], country, default)[0]
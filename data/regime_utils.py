@@ -1,7 +1,8 @@
 """Shared regime utilities — single source of truth for Python data pipeline.
 
 All regime name mappings, thresholds, and series configurations live here.
-Used by: compute_indicators.py, determine_regime.py, compute_historical_regimes.py
+Used by: compute_indicators.py, determine_regime.py, compute_historical_regimes.py,
+liquidity_engine.py
 """
 
 # ─── Regime name mapping ────────────────────────────────────────────────────
@@ -92,12 +93,18 @@ INFLATION_THRESHOLDS = {
 
 # ─── Liquidity signal configs ───────────────────────────────────────────────
 
+# easing rule, comparing the latest observation with the first of the
+# trailing `lookback` observations:
+#   "not_falling": latest >= older * (1 - tolerance)
+#   "falling":     latest <= older
+#   "negative":    latest < 0 (level only, needs a single observation)
+
 LIQUIDITY_SIGNALS = [
-    {"series_id": "WALCL",         "name": "fed_balance_sheet", "lookback": 12},
-    {"series_id": "RRPONTSYD",     "name": "reverse_repo",     "lookback": 12},
-    {"series_id": "NFCI",          "name": "nfci",             "lookback": 4},
-    {"series_id": "BAMLH0A0HYM2",  "name": "hy_spread",        "lookback": 12},
-    {"series_id": "SOFR",          "name": "sofr",             "lookback": 12},
+    {"series_id": "WALCL",         "name": "fed_balance_sheet", "lookback": 12, "easing": "not_falling", "tolerance": 0.01},
+    {"series_id": "RRPONTSYD",     "name": "reverse_repo",     "lookback": 12, "easing": "falling"},
+    {"series_id": "NFCI",          "name": "nfci",             "lookback": 4,  "easing": "negative"},
+    {"series_id": "BAMLH0A0HYM2",  "name": "hy_spread",        "lookback": 12, "easing": "falling"},
+    {"series_id": "SOFR",          "name": "sofr",             "lookback": 12, "easing": "falling"},
 ]
 
 MIN_EASING_FOR_EXPANDING = 3  # 3-of-5 rule
@@ -11,11 +11,34 @@ Flow:
 """
 
 import sqlite3
-import math
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
-from config import DB_PATH, REGIME_ALLOCATIONS
+import numpy as np
+from config import DB_PATH
+from allocation_weights import get_weight_table
+from regime_timeline import RegimeTimeline
+from backtest_cache import (
+    init_cache_table,
+    data_version,
+    cache_key,
+    lookup_cached_result,
+    store_cache_entry,
+)
+from backtest_metrics import compute_metrics, extend_metrics_state, ROLLING_WINDOWS
+from backtest_storage import (
+    init_series_table,
+    init_state_table,
+    store_snapshots,
+    store_backtest_series,
+    save_backtest_state,
+)
+from backtest_engine import (
+    PriceMatrix,
+    load_price_matrix,
+    rebalance_mask,
+    simulate_portfolio,
+    benchmark_series,
+)
 
 # Default asset weights within class — global market cap proportions
 # Stocks: US ~63%, EU ~15%, JP ~6%, CN ~3%, IN ~2%, KR ~1.5%
@@ -41,14 +64,6 @@ DEFAULT_ASSETS = [
     {"ticker": "BITO", "asset_class": "crypto", "weight_within_class": 0.30},
 ]
 
-RISK_MULTIPLIERS = {
-    1: {"stocks": 0.6, "bonds": 1.4, "realestate": 0.7, "commodities": 0.8, "crypto": 0.3, "cash": 1.5},
-    2: {"stocks": 0.8, "bonds": 1.2, "realestate": 0.85, "commodities": 0.9, "crypto": 0.6, "cash": 1.3},
-    3: {"stocks": 1.0, "bonds": 1.0, "realestate": 1.0, "commodities": 1.0, "crypto": 1.0, "cash": 1.0},
-    4: {"stocks": 1.2, "bonds": 0.8, "realestate": 1.15, "commodities": 1.1, "crypto": 1.4, "cash": 0.7},
-    5: {"stocks": 1.4, "bonds": 0.6, "realestate": 1.3, "commodities": 1.2, "crypto": 1.8, "cash": 0.5},
-}
-
 
 def init_backtest_tables(conn: sqlite3.Connection):
     """Create backtest tables if they don't exist."""
@@ -88,9 +103,64 @@ def init_backtest_tables(conn: sqlite3.Connection):
             drawdown_pct REAL
         )
     """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_backtest_snapshots_run ON backtest_snapshots(run_id, date)"
+    )
+    init_series_table(conn)
+    init_state_table(conn)
+    init_cache_table(conn)
     conn.commit()
 
 
+def load_assets(conn: sqlite3.Connection) -> list[dict]:
+    """Get the asset universe: active user assets (equal within-class weights) or defaults."""
+    assets = DEFAULT_ASSETS
+    try:
+        rows = conn.execute(
+            "SELECT ticker, asset_class FROM user_assets WHERE is_active = 1"
+        ).fetchall()
+        if rows:
+            # Build from user assets with equal within-class weights
+            user_tickers = {}
+            for ticker, ac in rows:
+                if ac not in user_tickers:
+                    user_tickers[ac] = []
+                user_tickers[ac].append(ticker)
+
+            assets = []
+            for ac, tickers_list in user_tickers.items():
+                w = 1.0 / len(tickers_list)
+                for t in tickers_list:
+                    assets.append({
+                        "ticker": t,
+                        "asset_class": ac,
+                        "weight_within_class": w,
+                    })
+    except Exception:
+        pass
+    return assets
+
+
+def select_available_assets(assets: list[dict], available_tickers: set[str]) -> list[dict]:
+    """Keep assets with price data and recalculate within-class weights among them.
+
+    Returns copies, so DEFAULT_ASSETS is never modified.
+    """
+    assets = [dict(a) for a in assets if a["ticker"] in available_tickers]
+
+    class_counts = defaultdict(list)
+    for a in assets:
+        class_counts[a["asset_class"]].append(a)
+
+    for ac, ac_assets in class_counts.items():
+        total_w = sum(a["weight_within_class"] for a in ac_assets)
+        if total_w > 0:
+            for a in ac_assets:
+                a["weight_within_class"] = a["weight_within_class"] / total_w
+
+    return assets
+
+
 def load_prices(conn: sqlite3.Connection, tickers: list[str], start_date: str, end_date: str):
     """Load historical prices into a dict: {ticker: {date: adj_close}}."""
     prices = defaultdict(dict)
@@ -117,13 +187,16 @@ def get_all_dates(prices: dict[str, dict[str, float]]) -> list[str]:
     return sorted(all_dates)
 
 
-def get_regime_for_date(conn: sqlite3.Connection, date: str) -> str:
-    """Look up the regime for a given date from the regimes table.
+def get_regime_for_date(conn: sqlite3.Connection, date: str, country: str = "US") -> str:
+    """Look up the regime for a given date and country from the regimes table.
     Falls back to the most recent regime before the date, or 'goldilocks' default.
+
+    Single ad-hoc lookup; backtests resolve all dates at once via RegimeTimeline.
     """
     row = conn.execute(
-        "SELECT regime_name FROM regimes WHERE date <= ? ORDER BY date DESC LIMIT 1",
-        (date,),
+        """SELECT regime_name FROM regimes WHERE country = ? AND date <= ?
+           ORDER BY date DESC, id DESC LIMIT 1""",
+        (country, date),
     ).fetchone()
     return row[0] if row else "goldilocks"
 
@@ -134,49 +207,11 @@ def get_allocation_weights(
     risk_level: int,
     assets: list[dict],
 ) -> dict[str, float]:
-    """Calculate per-ticker weight percentages for a given regime and risk level."""
-    # Base template
-    template = dict(REGIME_ALLOCATIONS.get(regime_name, REGIME_ALLOCATIONS["goldilocks"]))
+    """Calculate per-ticker weight percentages for a given regime and risk level.
 
-    # Apply user overrides
-    try:
-        rows = conn.execute(
-            "SELECT asset_class, weight_pct FROM user_regime_overrides WHERE regime_name = ?",
-            (regime_name,),
-        ).fetchall()
-        for ac, wp in rows:
-            template[ac] = wp
-    except Exception:
-        pass
-
-    # Apply risk multiplier
-    multipliers = RISK_MULTIPLIERS.get(risk_level, RISK_MULTIPLIERS[3])
-    adjusted = {}
-    total_pct = 0
-    for ac, pct in template.items():
-        adj = pct * multipliers.get(ac, 1.0)
-        adjusted[ac] = adj
-        total_pct += adj
-
-    # Normalize to 100%
-    if total_pct > 0:
-        for ac in adjusted:
-            adjusted[ac] = (adjusted[ac] / total_pct) * 100
-
-    # Calculate per-ticker weights
-    ticker_weights = {}
-    for asset in assets:
-        ac = asset["asset_class"]
-        class_pct = adjusted.get(ac, 0)
-        if class_pct == 0:
-            continue
-        weight_within = asset.get("weight_within_class", 0)
-        if not weight_within:
-            same_class = [a for a in assets if a["asset_class"] == ac]
-            weight_within = 1.0 / len(same_class) if same_class else 0
-        ticker_weights[asset["ticker"]] = class_pct * weight_within / 100.0
-
-    return ticker_weights
+    Lookup into the cached regime × risk weight table (see allocation_weights).
+    """
+    return get_weight_table(conn, assets).weights(regime_name, risk_level)
 
 
 def is_rebalance_date(date: str, prev_date: str | None, period: str) -> bool:
@@ -200,187 +235,27 @@ def is_rebalance_date(date: str, prev_date: str | None, period: str) -> bool:
     return False
 
 
-def compute_metrics(
-    daily_values: list[float],
-    dates: list[str],
+def simulate_loop(
+    conn: sqlite3.Connection,
+    prices: dict[str, dict[str, float]],
+    all_dates: list[str],
+    assets: list[dict],
     initial_capital: float,
-    risk_free_rate: float = 0.04,
-):
-    """Compute performance metrics from daily portfolio values."""
-    if len(daily_values) < 2:
-        return {}
-
-    final_value = daily_values[-1]
-    total_return = (final_value / initial_capital - 1) * 100
-
-    # Annualized return
-    days = (datetime.strptime(dates[-1], "%Y-%m-%d") - datetime.strptime(dates[0], "%Y-%m-%d")).days
-    years = max(days / 365.25, 0.01)
-    annualized_return = ((final_value / initial_capital) ** (1 / years) - 1) * 100
-
-    # Daily returns for volatility/Sharpe
-    daily_returns = []
-    for i in range(1, len(daily_values)):
-        if daily_values[i - 1] > 0:
-            daily_returns.append(daily_values[i] / daily_values[i - 1] - 1)
-
-    if not daily_returns:
-        return {
-            "final_value": final_value,
-            "total_return_pct": total_return,
-            "annualized_return_pct": annualized_return,
-        }
-
-    # Annualized volatility
-    mean_daily = sum(daily_returns) / len(daily_returns)
-    variance = sum((r - mean_daily) ** 2 for r in daily_returns) / len(daily_returns)
-    daily_vol = math.sqrt(variance)
-    annualized_vol = daily_vol * math.sqrt(252) * 100
-
-    # Sharpe ratio
-    daily_rf = risk_free_rate / 252
-    excess_returns = [r - daily_rf for r in daily_returns]
-    mean_excess = sum(excess_returns) / len(excess_returns)
-    sharpe = (mean_excess / daily_vol * math.sqrt(252)) if daily_vol > 0 else 0
-
-    # Max Drawdown
-    peak = daily_values[0]
-    max_dd = 0
-    max_dd_start = dates[0]
-    max_dd_end = dates[0]
-    current_dd_start = dates[0]
-
-    drawdowns = []
-    for i, val in enumerate(daily_values):
-        if val > peak:
-            peak = val
-            current_dd_start = dates[i]
-        dd = (peak - val) / peak * 100 if peak > 0 else 0
-        drawdowns.append(dd)
-        if dd > max_dd:
-            max_dd = dd
-            max_dd_start = current_dd_start
-            max_dd_end = dates[i]
-
-    return {
-        "final_value": round(final_value, 2),
-        "total_return_pct": round(total_return, 2),
-        "annualized_return_pct": round(annualized_return, 2),
-        "volatility_pct": round(annualized_vol, 2),
-        "sharpe_ratio": round(sharpe, 4),
-        "max_drawdown_pct": round(max_dd, 2),
-        "max_drawdown_start": max_dd_start,
-        "max_drawdown_end": max_dd_end,
-        "drawdowns": drawdowns,
-    }
-
-
-def run_backtest(
-    start_date: str = "2015-01-01",
-    end_date: str | None = None,
-    initial_capital: float = 100_000_000,
-    risk_level: int = 3,
-    rebalance_period: str = "monthly",
-    benchmark_ticker: str = "SPY",
-    name: str | None = None,
-) -> dict:
-    """Run a full backtest simulation.
-
-    Returns dict with run_id and metrics.
+    risk_level: int,
+    rebalance_period: str,
+    benchmark_ticker: str,
+    timeline: RegimeTimeline,
+    country: str = "US",
+) -> tuple[list[float], list[float], list[str], dict[str, float]]:
+    """Day-by-day reference simulation.
+
+    Returns (daily portfolio values, daily benchmark values, daily regimes, final holdings).
     """
-    if end_date is None:
-        end_date = datetime.now().strftime("%Y-%m-%d")
-
-    if name is None:
-        name = f"Backtest {start_date} ~ {end_date}"
-
-    conn = sqlite3.connect(DB_PATH)
-    init_backtest_tables(conn)
-
-    # Get asset universe
-    assets = DEFAULT_ASSETS
-    try:
-        rows = conn.execute(
-            "SELECT ticker, asset_class FROM user_assets WHERE is_active = 1"
-        ).fetchall()
-        if rows:
-            # Build from user assets with equal within-class weights
-            user_tickers = {}
-            for ticker, ac in rows:
-                if ac not in user_tickers:
-                    user_tickers[ac] = []
-                user_tickers[ac].append(ticker)
-
-            assets = []
-            for ac, tickers_list in user_tickers.items():
-                w = 1.0 / len(tickers_list)
-                for t in tickers_list:
-                    assets.append({
-                        "ticker": t,
-                        "asset_class": ac,
-                        "weight_within_class": w,
-                    })
-    except Exception:
-        pass
-
-    all_tickers = [a["ticker"] for a in assets]
-    if benchmark_ticker not in all_tickers:
-        all_tickers.append(benchmark_ticker)
-
-    # Load prices
-    prices = load_prices(conn, all_tickers, start_date, end_date)
-
-    # Filter tickers with actual price data
-    available_tickers = set(prices.keys())
-    assets = [a for a in assets if a["ticker"] in available_tickers]
-
-    if not assets:
-        conn.close()
-        raise ValueError("No price data available for any portfolio asset")
-
-    # Recalculate within-class weights for available assets
-    class_counts = defaultdict(list)
-    for a in assets:
-        class_counts[a["asset_class"]].append(a)
-
-    for ac, ac_assets in class_counts.items():
-        total_w = sum(a["weight_within_class"] for a in ac_assets)
-        if total_w > 0:
-            for a in ac_assets:
-                a["weight_within_class"] = a["weight_within_class"] / total_w
-
-    # Get all trading dates
-    all_dates = get_all_dates(prices)
-    if not all_dates:
-        conn.close()
-        raise ValueError("No trading dates found in price data")
-
-    print(f"=== Running Backtest: {name} ===")
-    print(f"  Period: {all_dates[0]} ~ {all_dates[-1]}")
-    print(f"  Assets: {len(assets)} tickers")
-    print(f"  Trading days: {len(all_dates)}")
-    print(f"  Rebalance: {rebalance_period}")
-    print(f"  Risk level: {risk_level}")
-
-    # Create backtest run record
-    now = datetime.now().isoformat()
-    cursor = conn.execute(
-        """INSERT INTO backtest_runs
-           (name, start_date, end_date, initial_capital, risk_level,
-            rebalance_period, benchmark_ticker, status, created_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?, 'running', ?)""",
-        (name, all_dates[0], all_dates[-1], initial_capital, risk_level,
-         rebalance_period, benchmark_ticker, now),
-    )
-    run_id = cursor.lastrowid
-    conn.commit()
-
-    # === Simulation ===
+    weight_table = get_weight_table(conn, assets)
     portfolio_value = initial_capital
     holdings = {}  # ticker -> shares
     prev_date = None
     daily_values = []
-    daily_dates = []
     daily_regimes = []
 
     # Benchmark tracking
@@ -421,8 +296,8 @@ def run_backtest(
                 portfolio_value = pv if pv > 0 else portfolio_value
 
             # Determine regime and get weights
-            regime = get_regime_for_date(conn, date)
-            weights = get_allocation_weights(conn, regime, risk_level, assets)
+            regime = timeline.at(date, country)
+            weights = weight_table.weights(regime, risk_level)
 
             # Rebalance: convert portfolio value to new holdings
             holdings = {}
@@ -450,13 +325,176 @@ def run_backtest(
             portfolio_value = pv
 
         daily_values.append(portfolio_value)
-        daily_dates.append(date)
-        regime = get_regime_for_date(conn, date)
-        daily_regimes.append(regime)
+        daily_regimes.append(timeline.at(date, country))
         prev_date = date
 
+    return daily_values, benchmark_values, daily_regimes, holdings
+
+
+def simulate_vectorized(
+    conn: sqlite3.Connection,
+    matrix: PriceMatrix,
+    assets: list[dict],
+    initial_capital: float,
+    risk_level: int,
+    rebalance_period: str,
+    benchmark_ticker: str,
+    timeline: RegimeTimeline,
+    country: str = "US",
+) -> tuple[list[float], list[float], list[str], dict[str, float]]:
+    """Array-based simulation on a forward-filled price matrix (see backtest_engine).
+
+    Produces the same results as simulate_loop.
+    """
+    rebalance_idx = np.flatnonzero(rebalance_mask(matrix.dates, rebalance_period))
+    daily_regimes = timeline.resolve(matrix.dates, country)
+
+    # Weights only change on rebalance dates: one table row per rebalance
+    weight_table = get_weight_table(conn, assets)
+    columns = [matrix.index[t] for t in weight_table.tickers]
+    weights = np.zeros((len(rebalance_idx), len(matrix.tickers)))
+    for k, i in enumerate(rebalance_idx):
+        weights[k, columns] = weight_table.row(daily_regimes[i], risk_level)
+
+    daily_values, shares = simulate_portfolio(matrix, rebalance_idx, weights, initial_capital)
+    bench = benchmark_series(matrix, benchmark_ticker, initial_capital)
+    holdings = {t: float(shares[i]) for i, t in enumerate(matrix.tickers) if shares[i] != 0}
+
+    return daily_values.tolist(), bench.tolist(), daily_regimes.tolist(), holdings
+
+
+def run_backtest(
+    start_date: str = "2015-01-01",
+    end_date: str | None = None,
+    initial_capital: float = 100_000_000,
+    risk_level: int = 3,
+    rebalance_period: str = "monthly",
+    benchmark_ticker: str = "SPY",
+    name: str | None = None,
+    engine: str = "loop",
+    country: str = "US",
+    snapshot_every: int = 1,
+    store_series: bool = False,
+    use_cache: bool = True,
+) -> dict:
+    """Run a full backtest simulation.
+
+    engine: "loop" (day-by-day reference) or "vectorized" (NumPy price matrix).
+    country: whose regime history drives the allocation.
+    snapshot_every: store every N-th day in backtest_snapshots (1 = every day).
+    store_series: also store the full daily curves as one compressed backtest_series row.
+    use_cache: return the stored run when the same parameters already ran on unchanged data.
+    Returns dict with run_id and metrics.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    if name is None:
+        name = f"Backtest {start_date} ~ {end_date}"
+
+    conn = sqlite3.connect(DB_PATH)
+    init_backtest_tables(conn)
+
+    # Get asset universe
+    assets = load_assets(conn)
+
+    all_tickers = [a["ticker"] for a in assets]
+    if benchmark_ticker not in all_tickers:
+        all_tickers.append(benchmark_ticker)
+
+    # Same parameters on unchanged data: return the stored run
+    key = None
+    if use_cache:
+        params = {
+            "name": name,
+            "engine": engine,
+            "start_date": start_date,
+            "end_date": end_date,
+            "initial_capital": initial_capital,
+            "risk_level": risk_level,
+            "rebalance_period": rebalance_period,
+            "benchmark_ticker": benchmark_ticker,
+            "country": country,
+            "snapshot_every": snapshot_every,
+            "store_series": store_series,
+        }
+        key = cache_key(params, data_version(conn, all_tickers, start_date, end_date, country))
+        cached = lookup_cached_result(conn, key)
+        if cached is not None:
+            print(f"=== Backtest cache hit: run {cached['run_id']} ===")
+            conn.close()
+            return cached
+
+    # Load prices
+    if engine == "vectorized":
+        matrix = load_price_matrix(conn, all_tickers, start_date, end_date)
+        available_tickers = set(matrix.tickers)
+        all_dates = matrix.dates
+    else:
+        prices = load_prices(conn, all_tickers, start_date, end_date)
+        available_tickers = set(prices.keys())
+        all_dates = get_all_dates(prices)
+
+    # Filter tickers with actual price data
+    assets = select_available_assets(assets, available_tickers)
+
+    if not assets:
+        conn.close()
+        raise ValueError("No price data available for any portfolio asset")
+
+    if not all_dates:
+        conn.close()
+        raise ValueError("No trading dates found in price data")
+
+    print(f"=== Running Backtest: {name} ===")
+    print(f"  Period: {all_dates[0]} ~ {all_dates[-1]}")
+    print(f"  Assets: {len(assets)} tickers")
+    print(f"  Trading days: {len(all_dates)}")
+    print(f"  Rebalance: {rebalance_period}")
+    print(f"  Risk level: {risk_level}")
+    print(f"  Engine: {engine}")
+    print(f"  Regime country: {country}")
+
+    # Create backtest run record
+    now = datetime.now().isoformat()
+    cursor = conn.execute(
+        """INSERT INTO backtest_runs
+           (name, start_date, end_date, initial_capital, risk_level,
+            rebalance_period, benchmark_ticker, status, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, 'running', ?)""",
+        (name, all_dates[0], all_dates[-1], initial_capital, risk_level,
+         rebalance_period, benchmark_ticker, now),
+    )
+    run_id = cursor.lastrowid
+    conn.commit()
+
+    # === Simulation ===
+    timeline = RegimeTimeline.load(conn, [country])
+    if engine == "vectorized":
+        daily_values, benchmark_values, daily_regimes, holdings = simulate_vectorized(
+            conn, matrix, assets, initial_capital, risk_level, rebalance_period, benchmark_ticker,
+            timeline, country,
+        )
+    else:
+        daily_values, benchmark_values, daily_regimes, holdings = simulate_loop(
+            conn, prices, all_dates, assets, initial_capital, risk_level, rebalance_period, benchmark_ticker,
+            timeline, country,
+        )
+    daily_dates = list(all_dates)
+
+    # Last known prices and benchmark base, for continue_backtest
+    if engine == "vectorized":
+        last_prices = {t: float(matrix.values[-1, i]) for t, i in matrix.index.items()}
+        bench_col = matrix.column(benchmark_ticker)
+        seen = np.flatnonzero(matrix.observed[:, bench_col]) if bench_col is not None else []
+        benchmark_base = float(matrix.values[seen[0], bench_col]) if len(seen) else None
+    else:
+        last_prices = {t: p[max(p)] for t, p in prices.items()}
+        bench_prices = prices.get(benchmark_ticker)
+        benchmark_base = bench_prices[min(bench_prices)] if bench_prices else None
+
     # === Compute Metrics ===
-    metrics = compute_metrics(daily_values, daily_dates, initial_capital)
+    metrics = compute_metrics(daily_values, daily_dates, initial_capital, rolling_windows=ROLLING_WINDOWS)
     benchmark_metrics = compute_metrics(benchmark_values, daily_dates, initial_capital)
 
     print(f"\n  === Results ===")
@@ -465,35 +503,40 @@ def run_backtest(
     print(f"  Annualized Return: {metrics.get('annualized_return_pct', 0):.2f}%")
     print(f"  Volatility: {metrics.get('volatility_pct', 0):.2f}%")
     print(f"  Sharpe Ratio: {metrics.get('sharpe_ratio', 0):.4f}")
+    print(f"  Sortino Ratio: {metrics.get('sortino_ratio', 0):.4f}")
+    print(f"  Calmar Ratio: {metrics.get('calmar_ratio', 0):.4f}")
     print(f"  Max Drawdown: {metrics.get('max_drawdown_pct', 0):.2f}%")
+    print(f"  Longest Drawdown: {metrics.get('longest_drawdown_days', 0)} days")
     print(f"\n  === Benchmark ({benchmark_ticker}) ===")
     print(f"  Benchmark Return: {benchmark_metrics.get('total_return_pct', 0):.2f}%")
     print(f"  Benchmark Sharpe: {benchmark_metrics.get('sharpe_ratio', 0):.4f}")
     print(f"  Benchmark MDD: {benchmark_metrics.get('max_drawdown_pct', 0):.2f}%")
 
-    # Store snapshots (sample every 5th day to keep DB small)
+    # Store snapshots in one batch (full resolution unless snapshot_every > 1)
     drawdowns = metrics.get("drawdowns", [])
-    for i in range(0, len(daily_dates), 5):
-        dd = drawdowns[i] if i < len(drawdowns) else 0
-        bv = benchmark_values[i] if i < len(benchmark_values) else None
-        conn.execute(
-            """INSERT INTO backtest_snapshots
-               (run_id, date, portfolio_value, benchmark_value, regime_name, drawdown_pct)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (run_id, daily_dates[i], daily_values[i], bv, daily_regimes[i], dd),
+    store_snapshots(
+        conn, run_id, daily_dates, daily_values, benchmark_values, daily_regimes, drawdowns,
+        every=snapshot_every,
+    )
+    if store_series:
+        store_backtest_series(
+            conn, run_id, daily_dates, daily_values, benchmark_values, drawdowns, daily_regimes,
         )
 
-    # Also store the last date if not already included
-    if len(daily_dates) % 5 != 1 and len(daily_dates) > 0:
-        i = len(daily_dates) - 1
-        dd = drawdowns[i] if i < len(drawdowns) else 0
-        bv = benchmark_values[i] if i < len(benchmark_values) else None
-        conn.execute(
-            """INSERT INTO backtest_snapshots
-               (run_id, date, portfolio_value, benchmark_value, regime_name, drawdown_pct)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (run_id, daily_dates[i], daily_values[i], bv, daily_regimes[i], dd),
-        )
+    save_backtest_state(conn, run_id, {
+        "as_of_date": daily_dates[-1],
+        "country": country,
+        "assets": assets,
+        "holdings": holdings,
+        "last_prices": last_prices,
+        "portfolio_value": daily_values[-1],
+        "benchmark_base_price": benchmark_base,
+        "benchmark_value": benchmark_values[-1],
+        "metrics_state": extend_metrics_state(None, daily_values, daily_dates)[0],
+        "benchmark_metrics_state": extend_metrics_state(None, benchmark_values, daily_dates)[0],
+        "n_days": len(daily_dates),
+        "snapshot_every": snapshot_every,
+    })
 
     # Update run with metrics
     conn.execute(
@@ -519,17 +562,20 @@ def run_backtest(
             run_id,
         ),
     )
-    conn.commit()
-    conn.close()
-
-    return {
+    result = {
         "run_id": run_id,
         "name": name,
         **metrics,
         "benchmark_return_pct": benchmark_metrics.get("total_return_pct"),
         "benchmark_sharpe": benchmark_metrics.get("sharpe_ratio"),
         "benchmark_mdd_pct": benchmark_metrics.get("max_drawdown_pct"),
+        "cached": False,
     }
+    if key is not None:
+        store_cache_entry(conn, key, run_id, result)
+    conn.commit()
+    conn.close()
+    return result
 
 
 if __name__ == "__main__":
@@ -537,6 +583,8 @@ if __name__ == "__main__":
 
     start = sys.argv[1] if len(sys.argv) > 1 else "2020-01-01"
     end = sys.argv[2] if len(sys.argv) > 2 else None
+    engine = sys.argv[3] if len(sys.argv) > 3 else "loop"
+    country = sys.argv[4] if len(sys.argv) > 4 else "US"
 
     result = run_backtest(
         start_date=start,
@@ -544,5 +592,7 @@ if __name__ == "__main__":
         initial_capital=100_000_000,
         risk_level=3,
         rebalance_period="monthly",
+        engine=engine,
+        country=country,
     )
     print(f"\nBacktest run ID: {result['run_id']}")
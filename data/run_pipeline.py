@@ -28,7 +28,7 @@ def run_full_pipeline():
     conn = sqlite3.connect(DB_PATH)
 
     # Step 1: Fetch FRED data
-    print("\n[1/5] Fetching FRED economic data...")
+    print("\n[1/7] Fetching FRED economic data...")
     try:
         from fetch_fred import fetch_all_series
         records = fetch_all_series()
@@ -37,8 +37,18 @@ def run_full_pipeline():
         print(f"  FAILED: {e}")
         log_pipeline(conn, "fetch_fred", "failed")
 
-    # Step 2: Compute indicators
-    print("\n[2/5] Computing indicators...")
+    # Step 2: Validate data quality (staleness, gaps, outliers, duplicates)
+    print("\n[2/7] Validating data quality...")
+    try:
+        from validate_data import run_validation
+        quality = run_validation()
+        log_pipeline(conn, "validate_data", "success", sum(quality.values()))
+    except Exception as e:
+        print(f"  FAILED: {e}")
+        log_pipeline(conn, "validate_data", "failed")
+
+    # Step 3: Compute indicators
+    print("\n[3/7] Computing indicators...")
     try:
         from compute_indicators import compute_all
         indicator_results = compute_all()
@@ -48,8 +58,8 @@ def run_full_pipeline():
         log_pipeline(conn, "compute_indicators", "failed")
         indicator_results = {}
 
-    # Step 3: Determine regimes
-    print("\n[3/5] Determining regimes...")
+    # Step 4: Determine regimes
+    print("\n[4/7] Determining regimes...")
     try:
         from determine_regime import determine_all_regimes
         regimes = determine_all_regimes(indicator_results)
@@ -59,8 +69,18 @@ def run_full_pipeline():
         log_pipeline(conn, "determine_regime", "failed")
         regimes = {"US": "goldilocks"}
 
-    # Step 4: Fetch news
-    print("\n[4/5] Fetching news...")
+    # Step 5: Refresh regime statistics (only when regimes or prices changed)
+    print("\n[5/7] Refreshing regime statistics...")
+    try:
+        from regime_stats import refresh_regime_stats
+        refreshed = refresh_regime_stats()
+        log_pipeline(conn, "regime_stats", "success", len(refreshed))
+    except Exception as e:
+        print(f"  FAILED: {e}")
+        log_pipeline(conn, "regime_stats", "failed")
+
+    # Step 6: Fetch news
+    print("\n[6/7] Fetching news...")
     try:
         from fetch_news import fetch_all_news
         news_count = fetch_all_news()
@@ -69,8 +89,8 @@ def run_full_pipeline():
         print(f"  FAILED: {e}")
         log_pipeline(conn, "fetch_news", "failed")
 
-    # Step 5: Summarize news with Gemini
-    print("\n[5/5] Summarizing news with AI...")
+    # Step 7: Summarize news with Gemini
+    print("\n[7/7] Summarizing news with AI...")
     try:
         from summarize_news import summarize_articles
         summaries = summarize_articles(limit=10)
@@ -0,0 +1,234 @@
+"""Data-quality validation for economic_data and historical_prices.
+
+Checks every series (FRED series and price tickers) in one vectorized pass
+over all rows, sorted by series and date, with grouped aggregations:
+- Staleness: days since the last observation vs. the allowance for the
+  series' detected frequency, one period plus publication lag (e.g. a
+  discontinued monthly series)
+- Gaps: spacing between consecutive observations beyond the frequency's
+  allowance (missing periods)
+- Outliers: |z-score| of the series' period-over-period changes above
+  ZSCORE_LIMIT (first differences for economic series, which may cross
+  zero; % returns for prices)
+- Duplicates: more than one row for the same series and date
+- Bad values: missing, non-finite, or non-positive prices
+
+The latest result per series is kept in data_quality with a status:
+"fail" (stale or duplicates), "warn" (gaps, outliers, bad values) or "ok".
+
+Usage:
+    python validate_data.py [--as-of YYYY-MM-DD]
+"""
+
+import argparse
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import DB_PATH
+from macro_panel import frequency_from_gap
+
+# Days since the last observation date before a series counts as stale. FRED dates
+# observations at the start of their period, so a current series is up to one
+# full period plus the publication lag old (e.g. Q2 GDP, dated April 1, is
+# replaced by Q3 only at the end of October; OECD/World Bank data lag months)
+STALE_AFTER_DAYS = {"daily": 10, "weekly": 21, "monthly": 100, "quarterly": 220, "annual": 800}
+
+# Spacing between consecutive observations that counts as a missing period
+GAP_DAYS = {"daily": 6, "weekly": 12, "monthly": 45, "quarterly": 135, "annual": 550}
+
+ZSCORE_LIMIT = 6.0
+
+
+def init_quality_table(conn: sqlite3.Connection):
+    """Create data_quality table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_quality (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            series_id TEXT NOT NULL,
+            frequency TEXT NOT NULL,
+            observations INTEGER NOT NULL,
+            first_date TEXT,
+            last_date TEXT,
+            days_since_last INTEGER,
+            is_stale INTEGER NOT NULL,
+            gap_count INTEGER NOT NULL,
+            max_gap_days INTEGER,
+            max_gap_end TEXT,
+            outlier_count INTEGER NOT NULL,
+            max_abs_zscore REAL,
+            max_zscore_date TEXT,
+            duplicate_count INTEGER NOT NULL,
+            bad_value_count INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            checked_at TEXT NOT NULL
+        )
+    """)
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_data_quality_unique ON data_quality (source, series_id)"
+    )
+    conn.commit()
+
+
+def load_observations(conn: sqlite3.Connection) -> pd.DataFrame:
+    """All rows of economic_data and historical_prices as (source, series_id, date, value)."""
+    economic = pd.read_sql_query(
+        "SELECT 'economic_data' AS source, series_id, substr(date, 1, 10) AS date, value FROM economic_data",
+        conn,
+    )
+    prices = pd.read_sql_query(
+        """SELECT 'historical_prices' AS source, ticker AS series_id, substr(date, 1, 10) AS date,
+                  adj_close AS value
+           FROM historical_prices""",
+        conn,
+    )
+    return pd.concat([economic, prices], ignore_index=True)
+
+
+def validate(df: pd.DataFrame, as_of: str) -> pd.DataFrame:
+    """One quality row per (source, series_id) from all observations."""
+    df = df.sort_values(["source", "series_id", "date"], kind="stable").reset_index(drop=True)
+    keys = [df["source"], df["series_id"]]
+    days = pd.to_datetime(df["date"], errors="coerce").to_numpy(dtype="datetime64[D]").astype(np.int64)
+    values = pd.to_numeric(df["value"], errors="coerce").to_numpy(dtype=np.float64)
+
+    # Row-over-row comparisons within a series (first row of each series has no predecessor)
+    same = np.zeros(len(df), dtype=bool)
+    same[1:] = (df["source"].to_numpy()[1:] == df["source"].to_numpy()[:-1]) & (
+        df["series_id"].to_numpy()[1:] == df["series_id"].to_numpy()[:-1]
+    )
+    gap = np.full(len(df), np.nan)
+    gap[1:] = np.where(same[1:], days[1:] - days[:-1], np.nan)
+    duplicate = same & (gap == 0)
+    is_price = (df["source"] == "historical_prices").to_numpy()
+    bad = ~np.isfinite(values) | (is_price & (values <= 0))
+
+    # Period-over-period change z-scores, ignoring duplicates and bad values
+    prev = np.full(len(df), np.nan)
+    prev[1:] = np.where(same[1:] & ~duplicate[1:], values[:-1], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(is_price, values / np.where(prev > 0, prev, np.nan) - 1, values - prev)
+    change[bad] = np.nan
+    change[~np.isfinite(change)] = np.nan
+    change_s = pd.Series(change)
+    mean = change_s.groupby(keys).transform("mean").to_numpy()
+    std = change_s.groupby(keys).transform("std").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.abs(np.where(std > 0, (change - mean) / std, np.nan))
+
+    rows = pd.DataFrame({
+        "source": df["source"],
+        "series_id": df["series_id"],
+        "date": df["date"],
+        "gap": np.where(duplicate, np.nan, gap),
+        "duplicate": duplicate,
+        "bad": bad,
+        "z": z,
+    })
+    grouped = rows.groupby(["source", "series_id"], sort=False)
+    result = grouped.agg(
+        observations=("date", "size"),
+        first_date=("date", "first"),
+        last_date=("date", "last"),
+        median_gap=("gap", "median"),
+        max_gap_days=("gap", "max"),
+        duplicate_count=("duplicate", "sum"),
+        bad_value_count=("bad", "sum"),
+        max_abs_zscore=("z", "max"),
+    ).reset_index()
+
+    result["frequency"] = frequency_from_gap(result["median_gap"].fillna(np.inf))
+    result.loc[result["median_gap"].isna(), "frequency"] = "monthly"
+    gap_limit = result["frequency"].map(GAP_DAYS).to_numpy()
+    stale_limit = result["frequency"].map(STALE_AFTER_DAYS).to_numpy()
+
+    # Per-row thresholds broadcast from the series' frequency
+    series_idx = grouped.ngroup().to_numpy()
+    is_gap = rows["gap"].to_numpy() > gap_limit[series_idx]
+    is_outlier = rows["z"].to_numpy() > ZSCORE_LIMIT
+    result["gap_count"] = np.bincount(series_idx, weights=is_gap, minlength=len(result)).astype(int)
+    result["outlier_count"] = np.bincount(series_idx, weights=is_outlier, minlength=len(result)).astype(int)
+
+    # Dates of the largest gap and the largest z-score per series
+    result["max_gap_end"] = _date_of_max(rows, series_idx, rows["gap"].to_numpy(), len(result))
+    result["max_zscore_date"] = _date_of_max(rows, series_idx, rows["z"].to_numpy(), len(result))
+
+    last_days = pd.to_datetime(result["last_date"], errors="coerce").to_numpy(dtype="datetime64[D]")
+    result["days_since_last"] = (np.datetime64(as_of, "D") - last_days).astype(np.int64)
+    result["is_stale"] = result["days_since_last"].to_numpy() > stale_limit
+
+    fail = result["is_stale"] | (result["duplicate_count"] > 0)
+    warn = (result["gap_count"] > 0) | (result["outlier_count"] > 0) | (result["bad_value_count"] > 0)
+    result["status"] = np.where(fail, "fail", np.where(warn, "warn", "ok"))
+    return result
+
+
+def _date_of_max(rows: pd.DataFrame, series_idx: np.ndarray, values: np.ndarray, n_series: int) -> np.ndarray:
+    """Date of each series' largest non-NaN value (None when all NaN)."""
+    order = np.lexsort((np.nan_to_num(values, nan=-np.inf), series_idx))
+    last = np.full(n_series, -1)
+    last[series_idx[order]] = order  # sorted ascending: the last write is the maximum
+    dates = rows["date"].to_numpy(dtype=object)
+    has = (last >= 0) & ~np.isnan(values[np.maximum(last, 0)])
+    return np.where(has, dates[np.maximum(last, 0)], None)
+
+
+def run_validation(as_of: str | None = None) -> dict[str, int]:
+    """Validate all series and store results; returns counts per status."""
+    as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+    conn = sqlite3.connect(DB_PATH)
+    init_quality_table(conn)
+
+    df = load_observations(conn)
+    if df.empty:
+        print("  No data to validate")
+        conn.close()
+        return {}
+    result = validate(df, as_of)
+
+    now = datetime.now().isoformat()
+    columns = [
+        "source", "series_id", "frequency", "observations", "first_date", "last_date",
+        "days_since_last", "is_stale", "gap_count", "max_gap_days", "max_gap_end",
+        "outlier_count", "max_abs_zscore", "max_zscore_date", "duplicate_count",
+        "bad_value_count", "status",
+    ]
+    out = result[columns].astype(object).where(result[columns].notna(), None)
+    with conn:
+        conn.execute("DELETE FROM data_quality")
+        conn.executemany(
+            f"""INSERT INTO data_quality ({", ".join(columns)}, checked_at)
+                VALUES ({", ".join("?" * len(columns))}, ?)""",
+            [(*row, now) for row in out.itertuples(index=False)],
+        )
+    conn.close()
+
+    counts = result["status"].value_counts().to_dict()
+    print(f"  Checked {len(result)} series ({len(df)} rows): "
+          + ", ".join(f"{counts.get(s, 0)} {s}" for s in ("ok", "warn", "fail")))
+    for r in result[result["status"] != "ok"].itertuples():
+        issues = []
+        if r.is_stale:
+            issues.append(f"stale {r.days_since_last}d (last {r.last_date}, {r.frequency})")
+        if r.duplicate_count:
+            issues.append(f"{r.duplicate_count} duplicate dates")
+        if r.gap_count:
+            issues.append(f"{r.gap_count} gaps (max {r.max_gap_days:.0f}d to {r.max_gap_end})")
+        if r.outlier_count:
+            issues.append(f"{r.outlier_count} outliers (max z {r.max_abs_zscore:.1f} on {r.max_zscore_date})")
+        if r.bad_value_count:
+            issues.append(f"{r.bad_value_count} bad values")
+        print(f"  [{r.status.upper()}] {r.source}/{r.series_id}: " + "; ".join(issues))
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate economic and price data quality")
+    parser.add_argument("--as-of", default=None, help="Reference date for staleness (default: today)")
+    args = parser.parse_args()
+
+    print("=== Validating Data Quality ===")
+    run_validation(args.as_of)
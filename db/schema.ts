@@ -1,4 +1,4 @@
-import { sqliteTable, text, integer, real } from "drizzle-orm/sqlite-core";
+import { sqliteTable, text, integer, real, blob, primaryKey } from "drizzle-orm/sqlite-core";
 
 export const economicData = sqliteTable("economic_data", {
   id: integer("id").primaryKey({ autoIncrement: true }),
@@ -19,6 +19,16 @@ export const computedIndicators = sqliteTable("computed_indicators", {
   axis: text("axis").notNull(),
 });
 
+export const indicatorHistory = sqliteTable("indicator_history", {
+  id: integer("id").primaryKey({ autoIncrement: true }),
+  indicatorName: text("indicator_name").notNull(),
+  country: text("country").notNull(),
+  axis: text("axis").notNull(),
+  date: text("date").notNull(),
+  value: real("value").notNull(),
+  updatedAt: text("updated_at").notNull(),
+});
+
 export const liquiditySignals = sqliteTable("liquidity_signals", {
   id: integer("id").primaryKey({ autoIncrement: true }),
   date: text("date").notNull(),
@@ -35,6 +45,7 @@ export const regimes = sqliteTable("regimes", {
   liquidityState: text("liquidity_state").notNull(),
   regimeName: text("regime_name").notNull(),
   country: text("country").notNull().default("US"),
+  source: text("source").notNull().default("live"), // live: determine_regime, historical: compute_historical_regimes
 });
 
 export const allocations = sqliteTable("allocations", {
@@ -200,3 +211,77 @@ export const backtestSnapshots = sqliteTable("backtest_snapshots", {
   regimeName: text("regime_name"),
   drawdownPct: real("drawdown_pct"),
 });
+
+// Backtest: Full-resolution daily curves, one compressed row per run (written by data/backtest_storage.py)
+// dates: zlib(int32 LE days since 1970-01-01); values: zlib(float64 LE); regimes: JSON [[startIndex, regime], ...]
+export const backtestSeries = sqliteTable("backtest_series", {
+  runId: integer("run_id").primaryKey().references(() => backtestRuns.id),
+  nDays: integer("n_days").notNull(),
+  encoding: text("encoding").notNull(),
+  dates: blob("dates", { mode: "buffer" }).notNull(),
+  portfolioValues: blob("portfolio_values", { mode: "buffer" }).notNull(),
+  benchmarkValues: blob("benchmark_values", { mode: "buffer" }),
+  drawdowns: blob("drawdowns", { mode: "buffer" }),
+  regimes: text("regimes"),
+});
+
+// Backtest: Days appended to a run's series (data/backtest_continue.py), one row per append in the
+// same encoding as backtest_series; full curves = backtest_series row + chunks in chunk order
+export const backtestSeriesChunks = sqliteTable(
+  "backtest_series_chunks",
+  {
+    runId: integer("run_id").notNull().references(() => backtestRuns.id),
+    chunk: integer("chunk").notNull(),
+    nDays: integer("n_days").notNull(),
+    dates: blob("dates", { mode: "buffer" }).notNull(),
+    portfolioValues: blob("portfolio_values", { mode: "buffer" }).notNull(),
+    benchmarkValues: blob("benchmark_values", { mode: "buffer" }),
+    drawdowns: blob("drawdowns", { mode: "buffer" }),
+    regimes: text("regimes"),
+  },
+  (t) => [primaryKey({ columns: [t.runId, t.chunk] })]
+);
+
+// Backtest: Content-addressed result cache; key = hash of run params + data versions
+// (shared with data/backtest_cache.py; "ts-" and "py-" keys never collide)
+export const backtestCache = sqliteTable("backtest_cache", {
+  cacheKey: text("cache_key").primaryKey(),
+  runId: integer("run_id").notNull().references(() => backtestRuns.id),
+  createdAt: text("created_at").notNull(),
+  hitCount: integer("hit_count").notNull().default(0),
+  lastHitAt: text("last_hit_at"),
+  resultJson: text("result_json"), // Python run_backtest 결과 (TS 항목은 null)
+});
+
+export const regimeTransitions = sqliteTable("regime_transitions", {
+  id: integer("id").primaryKey({ autoIncrement: true }),
+  country: text("country").notNull(),
+  fromRegime: text("from_regime").notNull(),
+  toRegime: text("to_regime").notNull(),
+  count: integer("count").notNull(),
+  probability: real("probability").notNull(),
+});
+
+export const regimeDurations = sqliteTable("regime_durations", {
+  id: integer("id").primaryKey({ autoIncrement: true }),
+  country: text("country").notNull(),
+  regimeName: text("regime_name").notNull(),
+  spells: integer("spells").notNull(),
+  avgDurationDays: real("avg_duration_days").notNull(),
+  medianDurationDays: real("median_duration_days").notNull(),
+  maxDurationDays: integer("max_duration_days").notNull(),
+  totalDays: integer("total_days").notNull(),
+  sharePct: real("share_pct").notNull(),
+});
+
+export const regimeAssetReturns = sqliteTable("regime_asset_returns", {
+  id: integer("id").primaryKey({ autoIncrement: true }),
+  country: text("country").notNull(),
+  regimeName: text("regime_name").notNull(),
+  ticker: text("ticker").notNull(),
+  tradingDays: integer("trading_days").notNull(),
+  avgDailyReturnPct: real("avg_daily_return_pct"),
+  annualizedReturnPct: real("annualized_return_pct"),
+  volatilityPct: real("volatility_pct"),
+  hitRatePct: real("hit_rate_pct"),
+});
@@ -1,7 +1,12 @@
 import { NextRequest, NextResponse } from "next/server";
 import { db } from "@db/index";
+import { inflateSync } from "zlib";
+import { createHash } from "crypto";
 import {
+  backtestCache,
   backtestRuns,
+  backtestSeries,
+  backtestSeriesChunks,
   backtestSnapshots,
   historicalPrices,
   userRegimeOverrides,
@@ -25,8 +30,11 @@ const RISK_MULTIPLIERS: Record<
   5: { stocks: 1.4, bonds: 0.6, realestate: 1.3, commodities: 1.2, crypto: 1.8, cash: 0.5 },
 };
 
+type PortfolioAsset = { ticker: string; assetClass: string; weightWithinClass: number };
+
 // Global market cap weights: US ~63%, EU ~15%, JP ~6%, CN ~3%, IN ~2%, KR ~1.5%
-const DEFAULT_ASSETS = [
+// 요청마다 복사해서 재정규화하므로 상수는 동결 (캐시 키가 상수에 의존)
+const DEFAULT_ASSETS: ReadonlyArray<Readonly<PortfolioAsset>> = Object.freeze([
   // Stocks — weighted by global market cap
   { ticker: "SPY", assetClass: "stocks", weightWithinClass: 0.44 },  // US large cap (S&P500)
   { ticker: "QQQ", assetClass: "stocks", weightWithinClass: 0.19 },  // US tech (Nasdaq100)
@@ -51,8 +59,195 @@ const DEFAULT_ASSETS = [
   // Crypto
   { ticker: "IBIT", assetClass: "crypto", weightWithinClass: 0.70 },
   { ticker: "BITO", assetClass: "crypto", weightWithinClass: 0.30 },
+].map((a) => Object.freeze(a)));
+
+function decodeFloat64(buf: Buffer | null): number[] | null {
+  if (!buf) return null;
+  // Copy into a fresh ArrayBuffer: typed array views need an aligned offset
+  const bytes = new Uint8Array(inflateSync(buf));
+  return Array.from(new Float64Array(bytes.buffer));
+}
+
+type SeriesRow = {
+  nDays: number;
+  dates: Buffer;
+  portfolioValues: Buffer;
+  benchmarkValues: Buffer | null;
+  drawdowns: Buffer | null;
+  regimes: string | null;
+};
+
+// Decode one backtest_series / backtest_series_chunks row (see data/backtest_storage.py)
+function decodeSeriesRow(row: SeriesRow) {
+  const dayOffsets = new Int32Array(new Uint8Array(inflateSync(row.dates)).buffer);
+  const dates = Array.from(dayOffsets, (d) => new Date(d * 86400000).toISOString().split("T")[0]);
+
+  const regimes: string[] = [];
+  if (row.regimes) {
+    const runs = JSON.parse(row.regimes) as [number, string][];
+    runs.forEach(([start, regime], k) => {
+      const stop = k + 1 < runs.length ? runs[k + 1][0] : row.nDays;
+      for (let i = start; i < stop; i++) regimes.push(regime);
+    });
+  }
+
+  return {
+    dates,
+    portfolioValues: decodeFloat64(row.portfolioValues),
+    benchmarkValues: decodeFloat64(row.benchmarkValues),
+    drawdowns: decodeFloat64(row.drawdowns),
+    regimes: row.regimes ? regimes : null,
+  };
+}
+
+// 기본 행 + 이어붙인 청크(continue_backtest) 순서대로 합침
+async function loadBacktestSeries(runId: number) {
+  let row;
+  try {
+    row = await db
+      .select()
+      .from(backtestSeries)
+      .where(eq(backtestSeries.runId, runId))
+      .then((rows) => rows[0]);
+  } catch {
+    return null; // table not created yet
+  }
+  if (!row || row.encoding !== "zlib-le-v1") return null;
+
+  let chunks: SeriesRow[] = [];
+  try {
+    chunks = await db
+      .select()
+      .from(backtestSeriesChunks)
+      .where(eq(backtestSeriesChunks.runId, runId))
+      .orderBy(backtestSeriesChunks.chunk);
+  } catch {
+    // 청크 테이블이 없으면 기본 행만 사용
+  }
+
+  const parts = [row, ...chunks].map(decodeSeriesRow);
+  const join = (values: (number[] | null)[]) => (values[0] ? values.flatMap((v) => v ?? []) : null);
+  return {
+    dates: parts.flatMap((p) => p.dates),
+    portfolioValues: join(parts.map((p) => p.portfolioValues)),
+    benchmarkValues: join(parts.map((p) => p.benchmarkValues)),
+    drawdowns: join(parts.map((p) => p.drawdowns)),
+    regimes: parts[0].regimes ? parts.flatMap((p) => p.regimes ?? []) : null,
+  };
+}
+
+// === Result cache ===
+// Key = hash of the run parameters plus the data they read: max price date, row
+// count and adj_close sum per ticker in range, US regime history checksum,
+// regime overrides and the asset list. Changed data gives a new key, so stale entries never hit.
+
+const CACHE_VERSION = "ts-v1";
+
+// Tables written by data/*.py that reference backtest_runs(id)
+const RUN_DEPENDENT_TABLES = [
+  "backtest_cache",
+  "backtest_series",
+  "backtest_series_chunks",
+  "backtest_state",
+  "backtest_windows",
 ];
 
+let cacheTableReady = false;
+
+async function ensureCacheTable() {
+  if (cacheTableReady) return;
+  await db.run(sql`
+    CREATE TABLE IF NOT EXISTS backtest_cache (
+      cache_key TEXT PRIMARY KEY,
+      run_id INTEGER NOT NULL REFERENCES backtest_runs(id),
+      created_at TEXT NOT NULL,
+      hit_count INTEGER NOT NULL DEFAULT 0,
+      last_hit_at TEXT,
+      result_json TEXT
+    )
+  `);
+  // result_json 이전에 만들어진 테이블 (data/backtest_cache.py와 같은 마이그레이션)
+  const columns = await db.all<{ name: string }>(sql`PRAGMA table_info(backtest_cache)`);
+  if (!columns.some((c) => c.name === "result_json")) {
+    await db.run(sql`ALTER TABLE backtest_cache ADD COLUMN result_json TEXT`);
+  }
+  await db.run(sql`CREATE INDEX IF NOT EXISTS idx_backtest_cache_run ON backtest_cache(run_id)`);
+  cacheTableReady = true;
+}
+
+// JSON with sorted object keys, so equal params always hash the same
+function stableStringify(value: unknown): string {
+  if (Array.isArray(value)) return `[${value.map(stableStringify).join(",")}]`;
+  if (value && typeof value === "object") {
+    const entries = Object.entries(value as Record<string, unknown>)
+      .filter(([, v]) => v !== undefined)
+      .sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0));
+    return `{${entries.map(([k, v]) => `${JSON.stringify(k)}:${stableStringify(v)}`).join(",")}}`;
+  }
+  return JSON.stringify(value ?? null);
+}
+
+async function backtestCacheKey(params: Record<string, unknown>, startDate: string, endDate: string) {
+  const prices = await db
+    .select({
+      ticker: historicalPrices.ticker,
+      maxDate: sql<string>`max(${historicalPrices.date})`,
+      count: sql<number>`count(*)`,
+      priceSum: sql<number>`round(sum(${historicalPrices.adjClose}), 6)`,
+    })
+    .from(historicalPrices)
+    .where(and(gte(historicalPrices.date, startDate), lte(historicalPrices.date, endDate)))
+    .groupBy(historicalPrices.ticker)
+    .orderBy(historicalPrices.ticker);
+
+  const regimeRows = await db
+    .select({ date: regimes.date, regimeName: regimes.regimeName })
+    .from(regimes)
+    .where(eq(regimes.country, "US"))
+    .orderBy(regimes.date, regimes.id);
+  const regimeHash = createHash("sha1");
+  for (const r of regimeRows) regimeHash.update(`${r.date}|${r.regimeName}\n`);
+
+  const overrides = await db
+    .select({
+      regimeName: userRegimeOverrides.regimeName,
+      assetClass: userRegimeOverrides.assetClass,
+      weightPct: userRegimeOverrides.weightPct,
+    })
+    .from(userRegimeOverrides)
+    .orderBy(userRegimeOverrides.id);
+
+  const payload = stableStringify({
+    v: CACHE_VERSION,
+    params,
+    data: { prices, regimes: regimeHash.digest("hex"), overrides, assets: DEFAULT_ASSETS },
+  });
+  return `${CACHE_VERSION}:${createHash("sha256").update(payload).digest("hex")}`;
+}
+
+// Completed run stored under key, with its snapshots; null on a miss
+async function loadCachedRun(cacheKey: string) {
+  const hit = await db
+    .select()
+    .from(backtestCache)
+    .innerJoin(backtestRuns, eq(backtestRuns.id, backtestCache.runId))
+    .where(and(eq(backtestCache.cacheKey, cacheKey), eq(backtestRuns.status, "completed")))
+    .then((rows) => rows[0]);
+  if (!hit) return null;
+
+  await db
+    .update(backtestCache)
+    .set({ hitCount: sql`${backtestCache.hitCount} + 1`, lastHitAt: new Date().toISOString() })
+    .where(eq(backtestCache.cacheKey, cacheKey));
+
+  const snapshots = await db
+    .select()
+    .from(backtestSnapshots)
+    .where(eq(backtestSnapshots.runId, hit.backtest_runs.id))
+    .orderBy(backtestSnapshots.date);
+  return { run: hit.backtest_runs, snapshots };
+}
+
 // GET: Fetch backtest runs list, or a specific run with snapshots
 export async function GET(request: NextRequest) {
   try {
@@ -71,6 +266,14 @@ export async function GET(request: NextRequest) {
         return NextResponse.json({ error: "Run not found" }, { status: 404 });
       }
 
+      // Full-resolution curves from the compact series row, if the run stored one
+      if (searchParams.get("series") === "1") {
+        const series = await loadBacktestSeries(Number(runId));
+        if (series) {
+          return NextResponse.json({ run, series });
+        }
+      }
+
       const snapshots = await db
         .select()
         .from(backtestSnapshots)
@@ -129,6 +332,47 @@ export async function POST(request: NextRequest) {
     const finalEndDate = endDate || new Date().toISOString().split("T")[0];
     const finalName = name || `백테스트 ${startDate} ~ ${finalEndDate}`;
 
+    // Same parameters on unchanged data: return the stored run
+    await ensureCacheTable();
+    const cacheKey = await backtestCacheKey(
+      {
+        startDate,
+        endDate: finalEndDate,
+        initialCapital,
+        riskLevel,
+        rebalancePeriod,
+        benchmarkTicker,
+        customAllocations: customAllocations ?? null,
+      },
+      startDate,
+      finalEndDate
+    );
+    const cached = await loadCachedRun(cacheKey);
+    if (cached) {
+      const { run, snapshots } = cached;
+      return NextResponse.json({
+        success: true,
+        cached: true,
+        result: {
+          runId: run.id,
+          name: run.name,
+          startDate: run.startDate,
+          endDate: run.endDate,
+          initialCapital: run.initialCapital,
+          finalValue: run.finalValue,
+          totalReturnPct: run.totalReturnPct,
+          annualizedReturnPct: run.annualizedReturnPct,
+          volatilityPct: run.volatilityPct,
+          sharpeRatio: run.sharpeRatio,
+          maxDrawdownPct: run.maxDrawdownPct,
+          benchmarkReturnPct: run.benchmarkReturnPct,
+          benchmarkSharpe: run.benchmarkSharpe,
+          benchmarkMddPct: run.benchmarkMddPct,
+        },
+        snapshots,
+      });
+    }
+
     // Check if we have price data
     const priceCount = await db
       .select({ count: sql<number>`count(*)` })
@@ -185,7 +429,7 @@ export async function POST(request: NextRequest) {
 
     // Filter assets to only those with available prices
     const availableTickers = new Set(Object.keys(priceLookup));
-    const assets = DEFAULT_ASSETS.filter((a) => availableTickers.has(a.ticker));
+    const assets = DEFAULT_ASSETS.filter((a) => availableTickers.has(a.ticker)).map((a) => ({ ...a }));
 
     if (assets.length === 0) {
       return NextResponse.json(
@@ -492,6 +736,14 @@ export async function POST(request: NextRequest) {
       await db.insert(backtestSnapshots).values(snapshotValues);
     }
 
+    await db
+      .insert(backtestCache)
+      .values({ cacheKey, runId, createdAt: now })
+      .onConflictDoUpdate({
+        target: backtestCache.cacheKey,
+        set: { runId, createdAt: now, hitCount: 0, lastHitAt: null },
+      });
+
     // Return result
     const result = {
       runId,
@@ -530,6 +782,14 @@ export async function DELETE(request: NextRequest) {
       return NextResponse.json({ error: "runId required" }, { status: 400 });
     }
 
+    // Rows in Python-written tables (cache, series, state, windows) reference the run
+    const existing = await db.all<{ name: string }>(
+      sql`SELECT name FROM sqlite_master WHERE type = 'table'`
+    );
+    const tableNames = new Set(existing.map((t) => t.name));
+    for (const table of RUN_DEPENDENT_TABLES.filter((t) => tableNames.has(t))) {
+      await db.run(sql`DELETE FROM ${sql.identifier(table)} WHERE run_id = ${Number(runId)}`);
+    }
     await db.delete(backtestSnapshots).where(eq(backtestSnapshots.runId, Number(runId)));
     await db.delete(backtestRuns).where(eq(backtestRuns.id, Number(runId)));
 
@@ -598,7 +858,7 @@ async function handleOptimize(body: {
 
   // Load assets
   const availableTickers = new Set(Object.keys(priceLookup));
-  const assets = DEFAULT_ASSETS.filter((a) => availableTickers.has(a.ticker));
+  const assets = DEFAULT_ASSETS.filter((a) => availableTickers.has(a.ticker)).map((a) => ({ ...a }));
   // Renormalize
   const classGroups: Record<string, typeof assets> = {};
   for (const a of assets) {
@@ -1,6 +1,6 @@
 import { GlassCard } from "@/components/shared/glass-card";
 import { SectionHeader } from "@/components/shared/section-header";
-import { getComputedIndicators, getLiquiditySignals, getAllRegimes, getDistinctSeries } from "@/lib/db";
+import { getComputedIndicators, getLiquiditySignals, getAllRegimes, getDistinctSeries, getIndicatorHistory } from "@/lib/db";
 import { REGIMES } from "@/lib/regimes";
 import { DEFAULT_COUNTRIES, COUNTRY_NAMES_KO } from "@/lib/constants";
 import type { RegimeId } from "@/types/regime";
@@ -56,6 +56,17 @@ export default async function EconomyPage() {
   const seriesMap = new Map<string, { date: string; value: number }[]>();
   seriesIds.forEach((id, i) => seriesMap.set(id, seriesResults[i]));
 
+  // Computed indicator history (growth %, CPI YoY %) for sparklines
+  const historyKeys = DEFAULT_COUNTRIES.flatMap((c) => [`${c.code}:growth`, `${c.code}:inflation`]);
+  const historyResults = await Promise.all(
+    historyKeys.map((key) => {
+      const [code, axis] = key.split(":");
+      return getIndicatorHistory(code, axis, 12);
+    }),
+  );
+  const historyMap = new Map<string, number[]>();
+  historyKeys.forEach((key, i) => historyMap.set(key, historyResults[i].map((d) => d.value)));
+
   const easingCount = liquiditySignals.filter((s) => s.direction === "easing").length;
   const totalSignals = liquiditySignals.length;
 
@@ -73,6 +84,10 @@ export default async function EconomyPage() {
     const data = seriesMap.get(seriesId) ?? [];
     return [...data].reverse().map((d) => d.value);
   }
+  function indicatorSpark(code: string, axis: string, fallbackSeriesId: string): number[] {
+    const history = historyMap.get(`${code}:${axis}`) ?? [];
+    return history.length > 0 ? history : sparkValues(fallbackSeriesId);
+  }
   function latestVal(seriesId: string): number | null {
     return (seriesMap.get(seriesId) ?? [])[0]?.value ?? null;
   }
@@ -117,7 +132,7 @@ export default async function EconomyPage() {
       // Raw series may be GDP level (trillions) rather than growth rate
       const computedGrowth = indData?.growth;
       if (computedGrowth != null) {
-        series.push({ title: "GDP 성장률", value: computedGrowth, date: latestDate(config.gdp), unit: "%", color: "#22c55e", sparkData: sparkValues(config.gdp) });
+        series.push({ title: "GDP 성장률", value: computedGrowth, date: latestDate(config.gdp), unit: "%", color: "#22c55e", sparkData: indicatorSpark(country.code, "growth", config.gdp) });
       } else if (growthRateSeries.has(config.gdp)) {
         // Series is already in % — safe to show raw value
         series.push({ title: "GDP 성장률", value: latestVal(config.gdp), date: latestDate(config.gdp), unit: "%", color: "#22c55e", sparkData: sparkValues(config.gdp) });
@@ -130,7 +145,7 @@ export default async function EconomyPage() {
       // Use computed indicator value (CPI YoY %) instead of raw CPI index
       const computedInflation = indData?.inflation;
       if (computedInflation != null) {
-        series.push({ title: "소비자물가 (CPI YoY)", value: computedInflation, date: latestDate(config.cpi), unit: "%", color: "#f59e0b", sparkData: sparkValues(config.cpi) });
+        series.push({ title: "소비자물가 (CPI YoY)", value: computedInflation, date: latestDate(config.cpi), unit: "%", color: "#f59e0b", sparkData: indicatorSpark(country.code, "inflation", config.cpi) });
       } else {
         series.push({ title: "소비자물가지수 (CPI)", value: latestVal(config.cpi), date: latestDate(config.cpi), unit: "index", color: "#f59e0b", sparkData: sparkValues(config.cpi) });
       }
@@ -5,11 +5,12 @@ import {
   allocationItems,
   economicData,
   computedIndicators,
+  indicatorHistory,
   liquiditySignals,
   newsArticles,
   pipelineRuns,
 } from "@db/schema";
-import { desc, eq } from "drizzle-orm";
+import { and, desc, eq } from "drizzle-orm";
 import { deriveRegimeName } from "@/lib/regimes";
 
 // ─── Real-time liquidity correction ─────────────────────────────────────────
@@ -113,6 +114,23 @@ export async function getComputedIndicators() {
     .orderBy(desc(computedIndicators.date));
 }
 
+/**
+ * 지표 이력 (최신 limit개, 날짜 오름차순). indicator_history (country, axis, date) 인덱스 범위 스캔.
+ */
+export async function getIndicatorHistory(country: string, axis: string, limit: number = 12) {
+  try {
+    const rows = await db
+      .select({ date: indicatorHistory.date, value: indicatorHistory.value })
+      .from(indicatorHistory)
+      .where(and(eq(indicatorHistory.country, country), eq(indicatorHistory.axis, axis)))
+      .orderBy(desc(indicatorHistory.date))
+      .limit(limit);
+    return rows.reverse();
+  } catch {
+    return [];
+  }
+}
+
 export async function getLiquiditySignals() {
   const all = await db
     .select()
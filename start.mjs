@@ -51,7 +51,8 @@ if (!tableCheck || tableCheck.cnt === 0) {
     CREATE TABLE IF NOT EXISTS regimes (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
       date TEXT NOT NULL, growth_state TEXT NOT NULL, inflation_state TEXT NOT NULL,
-      liquidity_state TEXT NOT NULL, regime_name TEXT NOT NULL, country TEXT NOT NULL DEFAULT 'US'
+      liquidity_state TEXT NOT NULL, regime_name TEXT NOT NULL, country TEXT NOT NULL DEFAULT 'US',
+      source TEXT NOT NULL DEFAULT 'live'
     );
     CREATE TABLE IF NOT EXISTS allocations (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -142,6 +143,22 @@ if (!tableCheck || tableCheck.cnt === 0) {
   console.log("[start] Tables already exist, skipping schema creation");
 }
 
+// Tables added after the initial schema: also created on existing DBs
+db.exec(`
+  CREATE TABLE IF NOT EXISTS indicator_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    indicator_name TEXT NOT NULL, country TEXT NOT NULL, axis TEXT NOT NULL,
+    date TEXT NOT NULL, value REAL NOT NULL, updated_at TEXT NOT NULL
+  );
+  CREATE UNIQUE INDEX IF NOT EXISTS idx_indicator_history_unique ON indicator_history (country, axis, date);
+`);
+
+// Columns added after the initial schema (historical rows are marked by data/compute_historical_regimes.py)
+const regimeColumns = db.prepare("PRAGMA table_info(regimes)").all().map((c) => c.name);
+if (!regimeColumns.includes("source")) {
+  db.exec("ALTER TABLE regimes ADD COLUMN source TEXT NOT NULL DEFAULT 'live'");
+}
+
 db.close();
 
 console.log("[start] Starting Next.js server...");